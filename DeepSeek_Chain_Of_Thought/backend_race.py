@@ -0,0 +1,159 @@
+"""
+Race several reasoning backends and keep the first usable think block.
+
+Each backend is an async stream of text deltas (LM Studio, OpenRouter, a
+Gemini call run in a thread, ...). All of them are fed through a
+ThinkStreamParser; the first one whose </think> closes a non-empty block
+wins and every other stream is cancelled. A backend that is down simply
+fails its stream, so no availability round-trip is needed up front.
+
+LatencyStats keeps an exponentially weighted average of each backend's time
+to a usable think block in a JSON file. Backends within slack of the best
+expected time start immediately; slower ones are hedges that only start if
+nothing has won after the best backend's expected time, so consistently
+slow or failing backends stop costing requests.
+
+Usage:
+    stats = LatencyStats("race_stats.json")
+    result = await race({"local": lambda: local_deltas(q), "openrouter": lambda: openrouter_deltas(q)}, stats)
+    print(result.backend, result.seconds, result.reasoning)
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import namedtuple
+from contextlib import aclosing
+
+from think_parser import ThinkStreamParser
+
+RaceResult = namedtuple("RaceResult", ["backend", "reasoning", "seconds", "cancelled", "errors"])
+
+
+class RaceError(Exception):
+    """Raised when no backend produced any reasoning; errors maps backend to exception."""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(f"{name}: {error}" for name, error in errors.items()) or "No backends")
+        self.errors = errors
+
+
+class LatencyStats:
+    """Per-backend EWMA of the time to a usable think block, persisted as JSON."""
+
+    def __init__(self, path=None, alpha=0.3, failure_penalty=60.0, loss_factor=2.0):
+        self.path = path
+        self.alpha = alpha
+        self.failure_penalty = failure_penalty
+        self.loss_factor = loss_factor
+        self.expected = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.expected = json.load(f)
+
+    def observe(self, name, seconds):
+        previous = self.expected.get(name)
+        self.expected[name] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+
+    def censored(self, name, seconds):
+        """
+        A cancelled loser took more than seconds. It is counted as
+        loss_factor times that, and only ever raises the estimate, so a
+        backend that keeps losing falls behind the winner.
+        """
+        seconds *= self.loss_factor
+        if self.expected.get(name) is None or seconds > self.expected[name]:
+            self.observe(name, seconds)
+
+    def failed(self, name):
+        self.observe(name, self.failure_penalty)
+
+    def schedule(self, names, slack=1.5):
+        """Start delay per backend: 0 for unknown or competitive ones, the best expected time for the rest."""
+        known = [self.expected[name] for name in names if name in self.expected]
+        best = min(known) if known else None
+        delays = {}
+        for name in names:
+            expected = self.expected.get(name)
+            delays[name] = 0.0 if expected is None or expected <= slack * best else best
+        return delays
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.expected, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+async def _run_backend(open_stream, delay, started):
+    """Stream one backend; returns ("think" | "fallback", reasoning, seconds since it started)."""
+    if delay:
+        await asyncio.sleep(delay)
+    start = time.perf_counter()
+    started.append(start)
+    parser = ThinkStreamParser()
+    async with aclosing(open_stream()) as deltas:
+        async for delta in deltas:
+            parser.feed(delta)
+            if parser.think_closed and parser.reasoning:
+                return "think", parser.reasoning, time.perf_counter() - start
+    parser.finish()
+    return "fallback", parser.reasoning or parser.text.strip(), time.perf_counter() - start
+
+
+async def race(backends, stats=None, slack=1.5):
+    """
+    Race backends (name -> zero-argument callable returning an async
+    iterator of text deltas) and return a RaceResult.
+
+    If no backend closes a think block, the first one that produced any
+    text is used; if none did, RaceError is raised.
+    """
+    stats = stats or LatencyStats()
+    delays = stats.schedule(list(backends), slack)
+    started = {name: [] for name in backends}
+    tasks = {
+        asyncio.create_task(_run_backend(open_stream, delays[name], started[name])): name
+        for name, open_stream in backends.items()
+    }
+    errors, fallback, winner = {}, None, None
+    pending = set(tasks)
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = tasks[task]
+                try:
+                    kind, reasoning, seconds = task.result()
+                except Exception as e:
+                    errors[name] = e
+                    stats.failed(name)
+                    continue
+                if kind == "think":
+                    stats.observe(name, seconds)
+                    if winner is None:
+                        winner = (name, reasoning, seconds)
+                else:
+                    stats.failed(name)
+                    if reasoning and fallback is None:
+                        fallback = (name, reasoning, seconds)
+    finally:
+        now = time.perf_counter()
+        for task in pending:
+            task.cancel()
+            name = tasks[task]
+            if started[name]:
+                stats.censored(name, now - started[name][0])
+        await asyncio.gather(*pending, return_exceptions=True)
+        stats.save()
+
+    cancelled = sorted(tasks[task] for task in pending)
+    if winner is None:
+        winner = fallback
+    if winner is None:
+        raise RaceError(errors)
+    name, reasoning, seconds = winner
+    return RaceResult(name, reasoning, seconds, cancelled, errors)
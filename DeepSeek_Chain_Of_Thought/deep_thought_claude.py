@@ -1,18 +1,29 @@
-import requests
+"""
+Chain of thought with DeepSeek R1 reasoning and a Claude or O1 final answer.
+
+Run it as a script (python deep_thought_claude.py ...) or import it and call
+main(argv), or configure(args) to use the pipeline functions directly. The
+heavy SDKs are imported only on the path that needs them: anthropic or
+openai for the selected final-answer model, requests for the synchronous
+reasoning stream, httpx (sse_client) and asyncio for batch and race mode.
+"""
+
 import os
 import json
 import time
 import argparse
 import re
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import threading
+from contextlib import AsyncExitStack, aclosing, closing
 from termcolor import colored
-from anthropic import Anthropic
-from openai import OpenAI
+from llm_metrics import MetricsRecorder, retry_count
+from response_cache import DEFAULT_PATH as DEFAULT_CACHE_PATH, ResponseCache, cache_key
+from think_parser import ThinkStreamParser
 
-def check_lm_studio_available():
+def check_lm_studio_available(base_url):
+    import requests
     try:
-        response = requests.get("http://localhost:1234/v1/models")
+        response = requests.get(f"{base_url}/models", timeout=5)
         return response.status_code == 200
     except requests.exceptions.RequestException:
         return False
@@ -20,18 +31,35 @@ def check_lm_studio_available():
 def create_parser():
     parser = argparse.ArgumentParser(description='Chain of Thought with OpenRouter or Local LM Studio')
     parser.add_argument('--local', action='store_true', help='Use local LM Studio instead of OpenRouter')
+    parser.add_argument('--lm-studio-url', default=LM_STUDIO_URL, help=f'LM Studio (or compatible) API base URL, also set by LM_STUDIO_URL (default: {LM_STUDIO_URL})')
     parser.add_argument('--verbose', action='store_true', help='Show detailed debug information')
     parser.add_argument('--o1', action='store_true', help='Use OpenAI O1 model for final answer instead of Claude')
+    parser.add_argument('--batch', metavar='QUESTIONS_JSONL', help='Answer every question in a JSONL file ({"question": ...} per line) instead of prompting')
+    parser.add_argument('--output', metavar='RESULTS_JSONL', default='results.jsonl', help='Where batch mode appends its results (default: results.jsonl)')
+    parser.add_argument('--reasoning-concurrency', type=int, default=4, help='Max concurrent DeepSeek reasoning streams in batch mode')
+    parser.add_argument('--final-concurrency', type=int, default=4, help='Max concurrent Claude/O1 final-answer calls in batch mode')
+    parser.add_argument('--speculate', action='store_true', help='Start the final answer while reasoning is still streaming, as soon as </think> arrives')
+    parser.add_argument('--speculate-tokens', type=int, metavar='N', help='With --speculate, also start after N streamed reasoning tokens')
+    parser.add_argument('--speculate-tolerance', type=float, default=0.1, help='Restart the speculative final answer when more than this fraction of the reasoning is new or rewritten (default: 0.1)')
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_PATH, metavar='PATH', help=f'Cache reasoning and final answers in a local SQLite file (default: {DEFAULT_CACHE_PATH})')
+    parser.add_argument('--cache-ttl', type=float, default=168, help='Hours a cached response stays valid (default: 168)')
+    parser.add_argument('--cache-max-mb', type=float, default=256, help='Evict least recently used responses beyond this size (default: 256)')
+    parser.add_argument('--metrics-log', metavar='PATH', help='Append per-call latency, throughput and cost records to this JSONL file')
+    parser.add_argument('--metrics-prom', metavar='PATH', help='Keep Prometheus text-format metrics for all LLM calls in this file')
+    parser.add_argument('--race', action='store_true', help='Send the reasoning request to several backends at once and keep the first usable think block')
+    parser.add_argument('--race-backends', default='local,openrouter,gemini', help='Comma-separated backends to race; ones without an API key are skipped (default: local,openrouter,gemini)')
+    parser.add_argument('--race-stats', default='race_stats.json', metavar='PATH', help='Where learned per-backend latencies are kept (default: race_stats.json)')
+    parser.add_argument('--race-slack', type=float, default=1.5, help='Backends expected to be slower than this multiple of the fastest start only as late hedges (default: 1.5)')
     return parser
 
-def get_api_client(use_local):
+def get_api_client(use_local, lm_studio_url=None):
     if use_local:
-        if not check_lm_studio_available():
-            print(colored("Error: LM Studio is not running on http://localhost:1234", "red"))
-            print(colored("Please start LM Studio and make sure it's running on port 1234", "red"))
+        base_url = (lm_studio_url or LM_STUDIO_URL).rstrip("/")
+        if not check_lm_studio_available(base_url):
+            print(colored(f"Error: LM Studio is not running on {base_url}", "red"))
+            print(colored("Please start LM Studio, or point --lm-studio-url / LM_STUDIO_URL at its server", "red"))
             exit(1)
-        print(colored("Using local LM Studio mode", "cyan"))
-        base_url = "http://localhost:1234/v1"  # Added /v1 to match OpenAI format
+        print(colored(f"Using local LM Studio mode ({base_url})", "cyan"))
         headers = {
             "Content-Type": "application/json"
         }
@@ -51,46 +79,86 @@ def get_api_client(use_local):
         return base_url, headers
 
 # Constants
+LM_STUDIO_URL = os.getenv('LM_STUDIO_URL', "http://localhost:1234/v1")  # /v1 to match the OpenAI format
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
 ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+CLAUDE_MODEL = "claude-3-5-sonnet-20241022"
+STREAM_READ_TIMEOUT = 30  # seconds without data before a reasoning stream is abandoned, as in sse_client
 
-# Parse arguments
-parser = create_parser()
-args = parser.parse_args()
+# Run state, set up by configure()
+args = None
+session = None
+metrics = None
+response_cache = None
+_final_client = {}
+_final_client_ready = threading.Event()
 
-print(colored(f"Running in {'local' if args.local else 'OpenRouter'} mode", "cyan"))
+def create_session(pool_maxsize=10):
+    """requests session with the retry strategy, for the synchronous reasoning stream."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
 
-# Check required API keys
-if not args.local and not OPENROUTER_API_KEY:
-    print(colored("Error: OPENROUTER_API_KEY environment variable is not set", "red"))
-    exit(1)
+    # Configure retry strategy
+    retry_strategy = Retry(
+        total=3,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504]
+    )
 
-if args.o1:
-    if not OPENAI_API_KEY:
-        print(colored("Error: OPENAI_API_KEY environment variable is not set", "red"))
-        exit(1)
-    print(colored("Using OpenAI O1 for final answer", "cyan"))
-    openai_client = OpenAI(api_key=OPENAI_API_KEY)
-else:
-    if not ANTHROPIC_API_KEY:
-        print(colored("Error: ANTHROPIC_API_KEY environment variable is not set", "red"))
-        exit(1)
-    print(colored("Using Claude for final answer", "cyan"))
-    anthropic_client = Anthropic(api_key=ANTHROPIC_API_KEY)
-
-# Configure retry strategy
-retry_strategy = Retry(
-    total=3,
-    backoff_factor=1,
-    status_forcelist=[429, 500, 502, 503, 504]
-)
-
-# Create session with retry strategy
-session = requests.Session()
-adapter = HTTPAdapter(max_retries=retry_strategy)
-session.mount("https://", adapter)
-session.mount("http://", adapter)
+    # Create session with retry strategy
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=retry_strategy, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def _create_final_answer_client(use_o1):
+    """Import the one SDK the final answer needs and build its client (runs on a background thread)."""
+    try:
+        if use_o1:
+            from openai import OpenAI
+            _final_client["client"] = OpenAI(api_key=OPENAI_API_KEY)
+        else:
+            from anthropic import Anthropic
+            _final_client["client"] = Anthropic(api_key=ANTHROPIC_API_KEY)
+    except Exception as e:
+        _final_client["error"] = e
+    finally:
+        _final_client_ready.set()
+
+def final_answer_client():
+    """The OpenAI or Anthropic client, waiting for configure()'s background import if needed."""
+    _final_client_ready.wait()
+    if "error" in _final_client:
+        raise _final_client["error"]
+    return _final_client["client"]
+
+def configure(parsed_args):
+    """
+    Set up the run state from parsed arguments: metrics, the optional cache
+    and, when the synchronous reasoning stream will be used, the requests
+    session. The final-answer SDK (anthropic or openai, about half a second
+    to import) is imported and its client built on a background thread, so
+    that cost overlaps the reasoning stream instead of delaying it.
+    """
+    global args, session, metrics, response_cache
+    args = parsed_args
+    _final_client.clear()
+    _final_client_ready.clear()
+    threading.Thread(target=_create_final_answer_client, args=(args.o1,), daemon=True).start()
+
+    if not args.batch and not args.race:
+        session = create_session(pool_maxsize=max(10, args.reasoning_concurrency))
+
+    # Per-call latency/throughput/cost instrumentation
+    metrics = MetricsRecorder(args.metrics_log, args.metrics_prom)
+
+    # Optional persistent response cache
+    response_cache = None
+    if args.cache:
+        response_cache = ResponseCache(args.cache, max_bytes=int(args.cache_max_mb * 1024 * 1024), ttl=args.cache_ttl * 3600)
 
 def extract_think_content(text):
     """Extract content between <think> and </think> tags."""
@@ -115,28 +183,25 @@ def extract_think_content(text):
     # If no structured thinking found, return the original text
     return text
 
-try:
-    # Get API configuration based on mode
-    base_url, headers = get_api_client(args.local)
-    
-    # Get user input and print it for verification
-    user_question = input("Enter your question: ")
-    print(colored(f"You asked: {user_question}", "cyan"))
-    
-    # Prepare the request data
+class ReasoningError(Exception):
+    """Raised when the reasoning stream fails without producing any content."""
+
+
+def build_reasoning_request(question, use_local):
+    """Build the chat completion request for the DeepSeek reasoning stage."""
     data = {
-        "model": "deepseek-r1-distill-llama-8b" if args.local else "deepseek/deepseek-r1",
+        "model": "deepseek-r1-distill-llama-8b" if use_local else "deepseek/deepseek-r1",
         "messages": [
             {
                 "role": "system",
                 "content": "You are a helpful assistant that thinks step by step. Always enclose your thinking process within <think></think> tags. After your thinking, provide a clear, concise answer."
-            } if args.local else {
+            } if use_local else {
                 "role": "system",
                 "content": "You are a helpful assistant that thinks step by step."
             },
             {
                 "role": "user",
-                "content": user_question
+                "content": question
             }
         ],
         "stream": True,
@@ -144,171 +209,703 @@ try:
         "max_tokens": 2048
     }
 
-    if not args.local:
+    if not use_local:
         data["include_reasoning"] = True
+    return data
+
+
+def reasoning_from_parser(think_parser):
+    """
+    Finish a ThinkStreamParser and return the reasoning.
+
+    Uses the think block when the stream had one, otherwise falls back to
+    extract_think_content's structured-thinking patterns on the raw text.
+    """
+    think_parser.finish()
+    if think_parser.think_started:
+        return think_parser.reasoning
+    return extract_think_content(think_parser.text)
+
+
+def reasoning_cache_key(data):
+    return cache_key(data["model"], data["messages"], data["temperature"], data["max_tokens"],
+                     include_reasoning=data.get("include_reasoning"))
+
+
+def reasoning_provider():
+    return "lmstudio" if args.local else "openrouter"
+
+
+def reasoning_deltas(response, call=None):
+    """
+    Yield the content deltas of a streamed reasoning response, reporting token usage to call.
+
+    A stalled stream is ended by the session's read timeout (STREAM_READ_TIMEOUT).
+    """
+    for line in response.iter_lines():
+        if line:
+            # Debug raw line
+            decoded_line = line.decode('utf-8')
+            if args.verbose:
+                print(colored(f"\nDebug - Raw line: {decoded_line}", "yellow"))
+
+            # Remove "data: " prefix if present
+            if decoded_line.startswith("data: "):
+                json_str = decoded_line[6:]
+            else:
+                json_str = decoded_line
+
+            if json_str == "[DONE]":
+                break
+
+            try:
+                chunk = json.loads(json_str)
+                if args.verbose:
+                    print(colored(f"Debug - Parsed chunk: {json.dumps(chunk, indent=2)}", "yellow"))
+                if call is not None and chunk.get('usage'):
+                    call.usage(chunk['usage'].get('prompt_tokens'), chunk['usage'].get('completion_tokens'))
+
+                content = ''
+                if args.local:
+                    # Local LM Studio format
+                    if 'choices' in chunk and chunk['choices']:
+                        choice = chunk['choices'][0]
+                        if 'delta' in choice:
+                            content = choice['delta'].get('content', '')
+                        else:
+                            content = choice.get('text', '')
+                else:
+                    # OpenRouter format
+                    content = chunk['choices'][0]['delta'].get('content', '')
+
+                if content:
+                    yield content
+            except json.JSONDecodeError as e:
+                if args.verbose:
+                    print(colored(f"\nJSON decode error: {str(e)} for line: {json_str}", "red"))
+                continue
+            except (KeyError, IndexError) as e:
+                if args.verbose:
+                    print(colored(f"\nKey error: {str(e)} in chunk: {chunk}", "red"))
+                continue
+
+
+def current_reasoning(think_parser):
+    """The reasoning stream_reasoning would return if the stream ended now."""
+    if args.local:
+        return think_parser.reasoning if think_parser.think_started else extract_think_content(think_parser.text)
+    return think_parser.text
+
+
+def stream_reasoning(question, base_url, headers, echo=True, marks=None, on_delta=None):
+    """
+    Stream the DeepSeek reasoning for a question and return it.
+
+    With echo the stream is printed as it arrives (interactive mode); batch
+    mode runs quietly. marks, if given, receives perf_counter times for the
+    request start, first token and end; on_delta is called with the
+    ThinkStreamParser after every delta. Raises requests exceptions when the
+    request fails and ReasoningError when nothing usable was received.
+    """
+    marks = {} if marks is None else marks
+    data = build_reasoning_request(question, args.local)
+    key = reasoning_cache_key(data)
+    cached = response_cache.get(key) if response_cache else None
+    if cached is not None:
+        marks["start"] = time.perf_counter()
+        if echo:
+            print(colored("\nReplaying cached response:", "green"))
+        return consume_reasoning(iter(cached), echo, marks, on_delta)
 
     endpoint = f"{base_url}/chat/completions"
-    print(colored(f"Sending request to {endpoint}...", "cyan"))
+    if echo:
+        print(colored(f"Sending request to {endpoint}...", "cyan"))
     if args.verbose:
         print(colored("Request details:", "cyan"))
         print(colored(f"- URL: {endpoint}", "cyan"))
         print(colored(f"- Headers: {json.dumps({k: v for k, v in headers.items() if k != 'Authorization'}, indent=2)}", "cyan"))
         print(colored(f"- Data: {json.dumps(data, indent=2)}", "cyan"))
-    
+
+    marks["start"] = time.perf_counter()
+    call = metrics.start(reasoning_provider(), data["model"], "reasoning")
     try:
         response = session.post(
             endpoint,
             headers=headers,
             json=data,
             stream=True,
-            timeout=(10, 90)  # (connect timeout, read timeout)
+            # The read timeout bounds every socket read, i.e. the gap between streamed chunks
+            timeout=(10, STREAM_READ_TIMEOUT)
         )
-        
+    except Exception as e:
+        call.finish(type(e).__name__)
+        raise
+    call.connected(retries=retry_count(response))
+
+    if echo:
         print(colored(f"Response status code: {response.status_code}", "cyan"))
-        if args.verbose:
-            print(colored(f"Response headers: {dict(response.headers)}", "cyan"))
-        response.raise_for_status()
-        
-    except requests.exceptions.Timeout:
-        print(colored("Error: Request timed out", "red"))
-        exit(1)
-    except requests.exceptions.RequestException as e:
-        print(colored(f"Error making request: {str(e)}", "red"))
-        if args.verbose and hasattr(e, 'response') and e.response is not None:
-            print(colored(f"Response text: {e.response.text}", "red"))
-        exit(1)
+    if args.verbose:
+        print(colored(f"Response headers: {dict(response.headers)}", "cyan"))
+    if not response.ok:
+        call.finish(f"http_{response.status_code}")
+    response.raise_for_status()
 
-    print(colored("\nStreaming response:", "green"))
-    
-    full_response = ""
-    raw_response = ""  # Store the complete raw response for think tag extraction
-    last_received = time.time()
+    if echo:
+        print(colored("\nStreaming response:", "green"))
+
+    deltas = call.wrap(reasoning_deltas(response, call))
+    if response_cache:
+        deltas = response_cache.record(key, deltas, data["model"])
+    return consume_reasoning(deltas, echo, marks, on_delta)
+
+
+def consume_reasoning(deltas, echo, marks, on_delta=None):
+    """Feed reasoning deltas (live or replayed from the cache) through the think parser and return the reasoning."""
+    response_parts = []  # Joined once at the end, keeping the stream linear in its length
+    think_parser = ThinkStreamParser()  # Splits think/answer segments as the deltas arrive
     try:
-        for line in response.iter_lines():
-            if line:
-                # Update last received time
-                last_received = time.time()
-                
-                # Debug raw line
-                decoded_line = line.decode('utf-8')
-                if args.verbose:
-                    print(colored(f"\nDebug - Raw line: {decoded_line}", "yellow"))
-                
-                # Remove "data: " prefix if present
-                if decoded_line.startswith("data: "):
-                    json_str = decoded_line[6:]
-                else:
-                    json_str = decoded_line
-                
-                if json_str == "[DONE]":
-                    break
-                    
-                try:
-                    chunk = json.loads(json_str)
-                    if args.verbose:
-                        print(colored(f"Debug - Parsed chunk: {json.dumps(chunk, indent=2)}", "yellow"))
-                    
-                    if args.local:
-                        # Local LM Studio format
-                        if 'choices' in chunk and chunk['choices']:
-                            choice = chunk['choices'][0]
-                            if 'delta' in choice:
-                                content = choice['delta'].get('content', '')
-                            else:
-                                content = choice.get('text', '')
-                    else:
-                        # OpenRouter format
-                        content = chunk['choices'][0]['delta'].get('content', '')
-                    
-                    if content:
-                        if args.local:
-                            raw_response += content  # Accumulate raw response
-                            # Only print content between think tags if we have them
-                            if '<think>' in content or '</think>' in content or '<think>' in raw_response:
-                                print(content, end='', flush=True)
-                        else:
-                            print(content, end='', flush=True)
-                        full_response += content
-                except json.JSONDecodeError as e:
-                    if args.verbose:
-                        print(colored(f"\nJSON decode error: {str(e)} for line: {json_str}", "red"))
-                    continue
-                except KeyError as e:
-                    if args.verbose:
-                        print(colored(f"\nKey error: {str(e)} in chunk: {chunk}", "red"))
-                    continue
-            
-            # Check for timeout between chunks
-            if time.time() - last_received > 30:  # 30 seconds timeout between chunks
-                raise TimeoutError("No data received for 30 seconds")
-                
-    except TimeoutError as e:
-        print(colored(f"\nError: {str(e)}", "red"))
-        if full_response:
-            print(colored("\nUsing partial response...", "yellow"))
-        else:
-            print(colored("No response received", "red"))
-            exit(1)
+        for content in deltas:
+            marks.setdefault("first_token", time.perf_counter())
+            think_parser.feed(content)
+            if args.local:
+                # Only print content once the think block has started
+                if echo and think_parser.think_started:
+                    print(content, end='', flush=True)
+            elif echo:
+                print(content, end='', flush=True)
+            response_parts.append(content)
+            if on_delta is not None:
+                on_delta(think_parser)
     except Exception as e:
-        print(colored(f"\nError while streaming response: {str(e)}", "red"))
-        if full_response:
+        if not response_parts:
+            raise ReasoningError(f"No response received: {str(e)}") from e
+        if echo:
+            print(colored(f"\nError: {str(e)}", "red"))
             print(colored("\nUsing partial response...", "yellow"))
-        else:
-            print(colored("No response received", "red"))
-            exit(1)
 
+    marks["end"] = time.perf_counter()
+    full_response = "".join(response_parts)
     if not full_response.strip():
-        print(colored("Error: Empty response received", "red"))
-        exit(1)
+        raise ReasoningError("Empty response received")
 
-    print("\n")
+    if echo:
+        print("\n")
     # Extract reasoning from the full response
     if args.local:
-        reasoning = extract_think_content(raw_response)
-        if reasoning != raw_response:
+        reasoning = reasoning_from_parser(think_parser)
+        if echo and reasoning != full_response:
             print(colored("\nExtracted thinking process:", "cyan"))
             print(reasoning)
-    else:
-        reasoning = full_response
+        return reasoning
+    return full_response
 
-    # Pass to final answer model (Claude or O1)
-    if args.verbose:
-        print(colored(f"\nSending to {'OpenAI O1' if args.o1 else 'Claude'} for final answer...", "cyan"))
-    
-    try:
-        if args.o1:
-            response = openai_client.chat.completions.create(
+
+def final_answer_messages(reasoning):
+    return [
+        {
+            "role": "user",
+            "content": f"Given this reasoning about the technical problem:\n\n{reasoning}\n\nWhat is the correct answer?"
+        }
+    ]
+
+
+def final_answer_cache_key(reasoning):
+    if args.o1:
+        return cache_key("o1", final_answer_messages(reasoning), reasoning_effort="high")
+    return cache_key(CLAUDE_MODEL, final_answer_messages(reasoning), max_tokens=8000)
+
+
+def get_final_answer(reasoning):
+    """Pass the reasoning to the final answer model (Claude or O1) and return its answer."""
+    if response_cache:
+        key = final_answer_cache_key(reasoning)
+        cached = response_cache.get(key)
+        if cached is not None:
+            return "".join(cached)
+        answer = request_final_answer(reasoning)
+        response_cache.put(key, [answer], "o1" if args.o1 else "claude")
+        return answer
+    return request_final_answer(reasoning)
+
+
+def request_final_answer(reasoning):
+    if args.o1:
+        call = metrics.start("openai", "o1", "final")
+        try:
+            response = final_answer_client().chat.completions.create(
                 model="o1",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": f"Given this reasoning about the technical problem:\n\n{reasoning}\n\nWhat is the correct answer?"
-                    }
-                ],
+                messages=final_answer_messages(reasoning),
                 reasoning_effort="high"
             )
-            final_answer = response.choices[0].message.content
+        except Exception as e:
+            call.finish(type(e).__name__)
+            raise
+        call.usage(response.usage.prompt_tokens, response.usage.completion_tokens)
+        call.finish()
+        return response.choices[0].message.content
+    call = metrics.start("anthropic", CLAUDE_MODEL, "final")
+    try:
+        claude_response = final_answer_client().messages.create(
+            model=CLAUDE_MODEL,
+            max_tokens=8000,
+            messages=final_answer_messages(reasoning)
+        )
+    except Exception as e:
+        call.finish(type(e).__name__)
+        raise
+    call.usage(claude_response.usage.input_tokens, claude_response.usage.output_tokens)
+    call.finish()
+    return claude_response.content[0].text
+
+
+def final_answer_deltas(reasoning):
+    """
+    Yield the final answer model's text as it streams; closing the generator
+    closes the stream and records the call as cancelled.
+    """
+    if args.o1:
+        call = metrics.start("openai", "o1", "final")
+        yield from call.wrap(o1_deltas(reasoning, call), closed_status="cancelled")
+    else:
+        call = metrics.start("anthropic", CLAUDE_MODEL, "final")
+        yield from call.wrap(claude_deltas(reasoning, call), closed_status="cancelled")
+
+
+def o1_deltas(reasoning, call):
+    stream = final_answer_client().chat.completions.create(
+        model="o1",
+        messages=final_answer_messages(reasoning),
+        reasoning_effort="high",
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    call.connected()
+    try:
+        for chunk in stream:
+            if chunk.usage:
+                call.usage(chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
+
+
+def claude_deltas(reasoning, call):
+    with final_answer_client().messages.stream(
+        model=CLAUDE_MODEL,
+        max_tokens=8000,
+        messages=final_answer_messages(reasoning)
+    ) as stream:
+        call.connected()
+        yield from stream.text_stream
+        usage = stream.get_final_message().usage
+        call.usage(usage.input_tokens, usage.output_tokens)
+
+
+def stream_final_answer(reasoning, cancel=None):
+    """
+    Stream the final answer and return (answer, marks).
+
+    marks holds perf_counter times for the call's start, first token and
+    end. Returns None as soon as the cancel event is set.
+    """
+    marks = {"start": time.perf_counter()}
+    parts = []
+    if response_cache:
+        stream = response_cache.stream(final_answer_cache_key(reasoning), lambda: final_answer_deltas(reasoning),
+                                       "o1" if args.o1 else "claude")
+    else:
+        stream = final_answer_deltas(reasoning)
+    with closing(stream) as deltas:
+        for text in deltas:
+            if cancel is not None and cancel.is_set():
+                return None
+            marks.setdefault("first_token", time.perf_counter())
+            parts.append(text)
+    marks["end"] = time.perf_counter()
+    return "".join(parts), marks
+
+
+class SpeculativeAnswer:
+    """
+    Runs the final-answer call while the reasoning is still streaming.
+
+    The call starts on the reasoning seen so far when the think block
+    closes or after token_budget reasoning deltas, whichever comes first.
+    When </think> arrives and again when the stream ends, the reasoning is
+    compared with what the call was started on; if it no longer extends it,
+    or more than tolerance of it is new, the running call is cancelled and
+    restarted on the newer reasoning. At most three calls are launched, so
+    the pool never queues one behind a cancelled call.
+    """
+
+    def __init__(self, token_budget=None, tolerance=0.1):
+        self.token_budget = token_budget
+        self.tolerance = tolerance
+        from concurrent.futures import ThreadPoolExecutor
+        self.executor = ThreadPoolExecutor(max_workers=3)
+        self.deltas = 0
+        self.restarts = 0
+        self.future = None
+        self.cancel = None
+        self.started_with = None
+        self._close_checked = False
+
+    def on_delta(self, think_parser):
+        """stream_reasoning callback: launch or revise the call as the reasoning grows."""
+        self.deltas += 1
+        if self.future is None:
+            if think_parser.think_closed or (self.token_budget and self.deltas >= self.token_budget):
+                self._close_checked = think_parser.think_closed
+                self._launch(current_reasoning(think_parser))
+        elif think_parser.think_closed and not self._close_checked:
+            self._close_checked = True
+            self._revise(current_reasoning(think_parser))
+
+    def result(self, reasoning):
+        """Return (answer, marks) for the final reasoning, restarting the call if it changed."""
+        if self.future is None:
+            self._launch(reasoning)
         else:
-            claude_response = anthropic_client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=8000,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": f"Given this reasoning about the technical problem:\n\n{reasoning}\n\nWhat is the correct answer?"
-                    }
-                ]
-            )
-            final_answer = claude_response.content[0].text
-            
-        print(colored(f"\n{'OpenAI O1' if args.o1 else 'Claude'}'s Final Answer:", "magenta"))
-        print(final_answer)
-        
+            self._revise(reasoning)
+        try:
+            return self.future.result()
+        finally:
+            self.executor.shutdown(wait=False)
+
+    def materially_changed(self, reasoning):
+        if not reasoning.startswith(self.started_with):
+            return True
+        return len(reasoning) - len(self.started_with) > self.tolerance * len(reasoning)
+
+    def _launch(self, reasoning):
+        self.cancel = threading.Event()
+        self.started_with = reasoning
+        self.future = self.executor.submit(stream_final_answer, reasoning, self.cancel)
+
+    def _revise(self, reasoning):
+        if self.materially_changed(reasoning):
+            if args.verbose:
+                print(colored("\nReasoning changed, restarting the final answer...", "yellow"))
+            self.cancel.set()
+            self.restarts += 1
+            self._launch(reasoning)
+
+
+def print_latency_report(reasoning_marks, final_marks, restarts=None):
+    """Print TTFT and total latency of both stages, relative to the reasoning request."""
+    origin = reasoning_marks["start"]
+
+    def seconds(marks, key, since="start"):
+        if key not in marks:
+            return "   n/a"
+        return f"{marks[key] - marks[since]:6.2f}"
+
+    print(colored("\nLatency (seconds):", "cyan"))
+    print(f"  reasoning    TTFT {seconds(reasoning_marks, 'first_token')}  total {seconds(reasoning_marks, 'end')}")
+    print(f"  final answer TTFT {seconds(final_marks, 'first_token')}  total {seconds(final_marks, 'end')}"
+          f"  started at {final_marks['start'] - origin:.2f}")
+    print(f"  end to end                 {final_marks['end'] - origin:6.2f}"
+          + (f"  (speculative restarts: {restarts})" if restarts is not None else ""))
+
+
+def print_cache_stats():
+    if response_cache:
+        stats = response_cache.stats()
+        print(colored(f"Cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%}), "
+                      f"{stats['entries']} entries, {stats['bytes'] / 1e6:.1f} MB in {args.cache}", "cyan"))
+
+
+def read_questions(path):
+    """Read questions from a JSONL file: {"id": ..., "question": ...} objects or plain JSON strings."""
+    questions = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"question": item}
+            item.setdefault("id", line_number)
+            questions.append(item)
+    return questions
+
+
+async def stream_reasoning_async(client, question):
+    """
+    Async counterpart of stream_reasoning for batch mode.
+
+    Streams over the shared AsyncSSEClient, so many questions share one
+    pooled connection set and a stalled stream fails after the client's
+    per-chunk deadline.
+    """
+    data = build_reasoning_request(question, args.local)
+
+    def live_stream():
+        call = metrics.start(reasoning_provider(), data["model"], "reasoning")
+        return call.wrap_async(reasoning_content_async(client, data, call))
+
+    if response_cache:
+        deltas = response_cache.stream_async(reasoning_cache_key(data), live_stream, data["model"])
+    else:
+        deltas = live_stream()
+    response_parts = []
+    think_parser = ThinkStreamParser()
+    try:
+        async for content in deltas:
+            response_parts.append(content)
+            think_parser.feed(content)
     except Exception as e:
-        print(colored(f"Error getting final answer: {str(e)}", "red"))
+        if not response_parts:
+            raise ReasoningError(f"No response received: {str(e)}") from e
+
+    full_response = "".join(response_parts)
+    if not full_response.strip():
+        raise ReasoningError("Empty response received")
+    return reasoning_from_parser(think_parser) if args.local else full_response
+
+
+async def reasoning_content_async(client, data, call, wrap_reasoning=False):
+    """
+    Yield the content deltas of a streamed chat completion, reporting token usage to call.
+
+    With wrap_reasoning, separate reasoning deltas (OpenRouter's
+    include_reasoning) are yielded too, enclosed in a <think> block.
+    """
+    in_think = False
+    async with aclosing(client.stream_chat(data)) as chunks:
+        async for chunk in chunks:
+            if chunk.get('usage'):
+                call.usage(chunk['usage'].get('prompt_tokens'), chunk['usage'].get('completion_tokens'))
+            choice = (chunk.get('choices') or [{}])[0]
+            if wrap_reasoning and choice.get('delta', {}).get('reasoning'):
+                if not in_think:
+                    in_think = True
+                    yield "<think>"
+                yield choice['delta']['reasoning']
+            content = choice['delta'].get('content') if 'delta' in choice else choice.get('text')
+            if content:
+                if in_think:
+                    in_think = False
+                    yield "</think>"
+                yield content
+
+
+async def gemini_think_deltas(question):
+    """Stream Gemini's thought parts as a <think> block, followed by its answer parts."""
+    from gemini_thought_flash import stream_chain_of_thought  # needs GEMINI_API_KEY at import
+    in_think = False
+    async with aclosing(stream_chain_of_thought(question, metrics=metrics)) as parts:
+        async for thought, text in parts:
+            if thought and not in_think:
+                in_think = True
+                yield "<think>"
+            elif not thought and in_think:
+                in_think = False
+                yield "</think>"
+            yield text
+
+
+async def race_reasoning(question):
+    """
+    Race the reasoning request across the configured backends.
+
+    Replaces the up-front LM Studio availability check: a local server that
+    is down just loses the race.
+    """
+    from backend_race import LatencyStats, race
+    from sse_client import AsyncSSEClient
+    names = [name.strip() for name in args.race_backends.split(',') if name.strip()]
+    backends = {}
+    async with AsyncExitStack() as stack:
+        def sse_backend(client, provider, data, wrap_reasoning):
+            def open_stream():
+                call = metrics.start(provider, data["model"], "reasoning")
+                return call.wrap_async(reasoning_content_async(client, data, call, wrap_reasoning))
+            return open_stream
+
+        if "local" in names:
+            client = await stack.enter_async_context(AsyncSSEClient.for_local(args.lm_studio_url))
+            backends["local"] = sse_backend(client, "lmstudio", build_reasoning_request(question, True), False)
+        if "openrouter" in names and OPENROUTER_API_KEY:
+            client = await stack.enter_async_context(AsyncSSEClient.for_openrouter(OPENROUTER_API_KEY))
+            backends["openrouter"] = sse_backend(client, "openrouter", build_reasoning_request(question, False), True)
+        if "gemini" in names and os.getenv('GEMINI_API_KEY'):
+            backends["gemini"] = lambda: gemini_think_deltas(question)
+
+        print(colored(f"Racing reasoning backends: {', '.join(backends)}", "cyan"))
+        return await race(backends, LatencyStats(args.race_stats), args.race_slack)
+
+
+def race_and_report(question, marks):
+    """Run race_reasoning for the interactive path and print the outcome."""
+    import asyncio
+    from backend_race import RaceError
+    marks["start"] = time.perf_counter()
+    try:
+        result = asyncio.run(race_reasoning(question))
+    except RaceError as e:
+        raise ReasoningError(f"All backends failed: {str(e)}") from e
+    marks["end"] = time.perf_counter()
+    for name, error in result.errors.items():
+        print(colored(f"{name} failed: {type(error).__name__}: {str(error)}", "yellow"))
+    cancelled = f", cancelled {', '.join(result.cancelled)}" if result.cancelled else ""
+    print(colored(f"\nReasoning from {result.backend} in {result.seconds:.2f}s{cancelled}:", "cyan"))
+    print(result.reasoning)
+    return result.reasoning
+
+
+async def answer_question(item, client, reasoning_slots, final_slots, results):
+    """
+    Run both stages for one batch question and queue its result.
+
+    The two stages hold separate semaphores, so while this question waits
+    for its final answer the next question's reasoning stream is already
+    running: the stages pipeline across questions.
+    """
+    import asyncio
+    result = {"id": item["id"], "question": item["question"]}
+    start = time.time()
+    try:
+        async with reasoning_slots:
+            reasoning = await stream_reasoning_async(client, item["question"])
+        result["reasoning"] = reasoning
+        result["reasoning_seconds"] = round(time.time() - start, 3)
+
+        async with final_slots:
+            result["final_answer"] = await asyncio.to_thread(get_final_answer, reasoning)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {str(e)}"
+    result["total_seconds"] = round(time.time() - start, 3)
+    await results.put(result)
+
+
+async def write_results(results, output_path, total):
+    """Append results to the output JSONL as they complete."""
+    with open(output_path, 'a', encoding='utf-8') as f:
+        for done in range(1, total + 1):
+            result = await results.get()
+            f.write(json.dumps(result) + "\n")
+            f.flush()
+            status = colored("error", "red") if "error" in result else colored("ok", "green")
+            print(f"[{done}/{total}] {result['id']}: {status} ({result['total_seconds']}s)")
+
+
+async def run_batch(questions, base_url, headers, output_path):
+    """Answer all questions with bounded per-provider concurrency."""
+    import asyncio
+    from sse_client import AsyncSSEClient
+    reasoning_slots = asyncio.Semaphore(args.reasoning_concurrency)
+    final_slots = asyncio.Semaphore(args.final_concurrency)
+    results = asyncio.Queue()
+    writer = asyncio.create_task(write_results(results, output_path, len(questions)))
+    async with AsyncSSEClient(base_url, headers, max_connections=args.reasoning_concurrency) as client:
+        await asyncio.gather(*(
+            answer_question(item, client, reasoning_slots, final_slots, results)
+            for item in questions
+        ))
+    await writer
+
+
+def check_api_keys(args):
+    """Exit with an error when a key the selected path needs is not set."""
+    if not args.local and not args.race and not OPENROUTER_API_KEY:
+        print(colored("Error: OPENROUTER_API_KEY environment variable is not set", "red"))
+        exit(1)
+    if args.o1 and not OPENAI_API_KEY:
+        print(colored("Error: OPENAI_API_KEY environment variable is not set", "red"))
+        exit(1)
+    if not args.o1 and not ANTHROPIC_API_KEY:
+        print(colored("Error: ANTHROPIC_API_KEY environment variable is not set", "red"))
+        exit(1)
+
+
+def interactive_reasoning(question, base_url, headers, marks, speculation):
+    """Reasoning stage for one interactive question; exits with a message on failure."""
+    if args.race:
+        try:
+            return race_and_report(question, marks)
+        except ReasoningError as e:
+            print(colored(f"\nError: {str(e)}", "red"))
+            exit(1)
+
+    import requests
+    try:
+        return stream_reasoning(question, base_url, headers, marks=marks,
+                                on_delta=speculation.on_delta if speculation else None)
+    except requests.exceptions.Timeout:
+        print(colored("Error: Request timed out", "red"))
         exit(1)
+    except requests.exceptions.RequestException as e:
+        print(colored(f"Error making request: {str(e)}", "red"))
+        if args.verbose and hasattr(e, 'response') and e.response is not None:
+            print(colored(f"Response text: {e.response.text}", "red"))
+        exit(1)
+    except ReasoningError as e:
+        print(colored(f"\nError: {str(e)}", "red"))
+        exit(1)
+
+
+def main(argv=None):
+    # Parse arguments
+    parser = create_parser()
+    parsed_args = parser.parse_args(argv)
+
+    if parsed_args.race and parsed_args.batch:
+        parser.error("--race is only supported for interactive questions")
+
+    print(colored(f"Running in {'race' if parsed_args.race else 'local' if parsed_args.local else 'OpenRouter'} mode", "cyan"))
+
+    # Check required API keys
+    check_api_keys(parsed_args)
+    print(colored(f"Using {'OpenAI O1' if parsed_args.o1 else 'Claude'} for final answer", "cyan"))
+    configure(parsed_args)
+
+    try:
+        # Get API configuration based on mode
+        if args.race:
+            base_url = headers = None
+        else:
+            base_url, headers = get_api_client(args.local, args.lm_studio_url)
+
+        if args.batch:
+            import asyncio
+            questions = read_questions(args.batch)
+            print(colored(f"Answering {len(questions)} questions from {args.batch} -> {args.output}", "cyan"))
+            asyncio.run(run_batch(questions, base_url, headers, args.output))
+            print_cache_stats()
+            return
+
+        # Get user input and print it for verification
+        user_question = input("Enter your question: ")
+        print(colored(f"You asked: {user_question}", "cyan"))
+
+        speculation = SpeculativeAnswer(args.speculate_tokens, args.speculate_tolerance) if args.speculate and not args.race else None
+        reasoning_marks = {}
+        reasoning = interactive_reasoning(user_question, base_url, headers, reasoning_marks, speculation)
+
+        # Pass to final answer model (Claude or O1)
+        if args.verbose:
+            print(colored(f"\nSending to {'OpenAI O1' if args.o1 else 'Claude'} for final answer...", "cyan"))
+
+        try:
+            if speculation:
+                final_answer, final_marks = speculation.result(reasoning)
+            else:
+                final_answer, final_marks = stream_final_answer(reasoning)
+            print(colored(f"\n{'OpenAI O1' if args.o1 else 'Claude'}'s Final Answer:", "magenta"))
+            print(final_answer)
+            print_latency_report(reasoning_marks, final_marks, speculation.restarts if speculation else None)
+            print_cache_stats()
+
+        except Exception as e:
+            print(colored(f"Error getting final answer: {str(e)}", "red"))
+            exit(1)
+
+    except Exception as e:
+        print(colored(f"Unexpected error: {str(e)}", "red"))
+
 
-except requests.exceptions.RequestException as e:
-    print(colored(f"Request error: {str(e)}", "red"))
-except Exception as e:
-    print(colored(f"Unexpected error: {str(e)}", "red"))
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,13 @@
 from google import genai
+import asyncio
+import json
 import os
+import random
+
+import httpx
+
+from response_cache import cache_key
+from sse_client import AsyncSSEClient
 
 """ 26.01.2025
 The Google Gen AI SDK for Python 
@@ -22,35 +30,209 @@ if not GEMINI_API_KEY:
 # Initialize the client with API key and version
 client = genai.Client(api_key=GEMINI_API_KEY, http_options={'api_version':'v1alpha'})
 
-def get_chain_of_thought(prompt):
+MODEL = 'gemini-2.0-flash-thinking-exp-1219'
+THINKING_CONFIG = {'thinking_config': {'include_thoughts': True}}
+GEMINI_API_URL = 'https://generativelanguage.googleapis.com/v1alpha'
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+def generate_thought_parts(prompt, metrics=None):
     """
-    Make a request to the Gemini model and extract chain of thought.
+    Make a request to the Gemini model and return its parts as
+    (is_thought, text) pairs. Errors are raised, not swallowed.
+
+    Pass an llm_metrics.MetricsRecorder as metrics to record the call's
+    latency, token counts and cost.
     """
+    call = metrics.start("gemini", MODEL, "reasoning") if metrics is not None else None
     try:
-        # Configure thinking parameters
-        config = {'thinking_config': {'include_thoughts': True}}
-        
-        # Make the request
         response = client.models.generate_content(
-            model='gemini-2.0-flash-thinking-exp-1219',
+            model=MODEL,
             contents=prompt,
-            config=config
+            config=THINKING_CONFIG
         )
+    except Exception as e:
+        if call is not None:
+            call.finish(type(e).__name__)
+        raise
+    if call is not None:
+        usage = response.usage_metadata
+        call.usage(getattr(usage, 'prompt_token_count', None), getattr(usage, 'candidates_token_count', None))
+        call.finish()
+    return [(bool(part.thought), part.text) for part in response.candidates[0].content.parts]
+
+def get_chain_of_thought(prompt, cache=None, metrics=None):
+    """
+    Make a request to the Gemini model and extract chain of thought.
+
+    Pass a response_cache.ResponseCache as cache to reuse earlier answers
+    to the same prompt instead of calling the API again, and an
+    llm_metrics.MetricsRecorder as metrics to record the call's latency,
+    token counts and cost.
+    """
+    try:
+        if cache is not None:
+            key = cache_key(MODEL, prompt, config=THINKING_CONFIG)
+            cached = cache.get(key)
+            if cached is not None:
+                return "\n".join(cached)
+        
+        # Make the request
+        parts = generate_thought_parts(prompt, metrics)
         
         # Extract thoughts and responses
-        thoughts_and_responses = []
-        for part in response.candidates[0].content.parts:
-            if part.thought:
-                thoughts_and_responses.append(f"Model Thought:\n{part.text}\n")
-            else:
-                thoughts_and_responses.append(f"\nModel Response:\n{part.text}\n")
+        thoughts_and_responses = format_parts(parts)
         
+        if cache is not None:
+            cache.put(key, thoughts_and_responses, MODEL)
         return "\n".join(thoughts_and_responses)
         
     except Exception as e:
         print(f"Error making API request: {str(e)}")
         return None
 
+def format_parts(parts):
+    """Label (is_thought, text) parts the way get_chain_of_thought prints them."""
+    thoughts_and_responses = []
+    for thought, text in parts:
+        if thought:
+            thoughts_and_responses.append(f"Model Thought:\n{text}\n")
+        else:
+            thoughts_and_responses.append(f"\nModel Response:\n{text}\n")
+    return thoughts_and_responses
+
+def stream_client(**kwargs):
+    """
+    Pooled async client for the Gemini REST streaming endpoint.
+
+    The pinned SDK's async methods run each request in a thread and read
+    the stream synchronously, so streaming goes over httpx instead; one
+    client serves many concurrent prompts.
+    """
+    headers = {"x-goog-api-key": GEMINI_API_KEY, "Content-Type": "application/json"}
+    return AsyncSSEClient(GEMINI_API_URL, headers, **kwargs)
+
+async def stream_chain_of_thought(prompt, client=None, metrics=None):
+    """
+    Async variant of get_chain_of_thought that yields (is_thought, text)
+    parts as they arrive. Errors are raised (httpx.HTTPStatusError for API
+    errors). Pass a stream_client() to share connections between prompts.
+    """
+    own_client = client is None
+    client = client or stream_client()
+    call = metrics.start("gemini", MODEL, "reasoning") if metrics is not None else None
+    body = {
+        "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+        "generationConfig": {"thinkingConfig": {"includeThoughts": True}},
+    }
+    parts = _stream_parts(client, body, call)
+    if call is not None:
+        parts = call.wrap_async(parts)
+    try:
+        async for part in parts:
+            yield part
+    finally:
+        await parts.aclose()
+        if own_client:
+            await client.aclose()
+
+async def _stream_parts(client, body, call):
+    async for event in client.stream_events(body, f"/models/{MODEL}:streamGenerateContent?alt=sse"):
+        try:
+            chunk = json.loads(event)
+        except json.JSONDecodeError:
+            continue
+        usage = chunk.get("usageMetadata")
+        if usage and call is not None:
+            call.usage(usage.get("promptTokenCount"), usage.get("candidatesTokenCount"))
+        for candidate in chunk.get("candidates", [])[:1]:
+            for part in candidate.get("content", {}).get("parts", []):
+                if part.get("text"):
+                    yield bool(part.get("thought")), part["text"]
+
+class RateLimiter:
+    """
+    Shared pacing for concurrent requests: at most requests_per_minute
+    starts, and a cooldown that holds every worker back after a 429.
+    """
+
+    def __init__(self, requests_per_minute=None):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_start = 0.0
+        self._resume_at = 0.0
+
+    async def acquire(self):
+        now = asyncio.get_running_loop().time()
+        start = max(now, self._next_start, self._resume_at)
+        self._next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def cooldown(self, seconds):
+        self._resume_at = max(self._resume_at, asyncio.get_running_loop().time() + seconds)
+
+def _retry_after(error):
+    """Server-requested delay in seconds from a Retry-After header or a RetryInfo detail, if any."""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    header = response.headers.get('retry-after')
+    if header:
+        try:
+            return float(header)
+        except ValueError:
+            pass
+    try:
+        details = response.json().get('error', {}).get('details', [])
+    except ValueError:
+        return None
+    for detail in details:
+        if detail.get('@type', '').endswith('RetryInfo') and 'retryDelay' in detail:
+            return float(detail['retryDelay'].rstrip('s'))
+    return None
+
+def _is_retryable(error):
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS
+    return isinstance(error, (httpx.TransportError, TimeoutError))
+
+async def amap_chain_of_thought(prompts, concurrency=16, requests_per_minute=None, max_retries=5,
+                                base_delay=1.0, max_delay=60.0, return_exceptions=False, metrics=None):
+    """
+    Run many prompts concurrently over one connection pool and return
+    their (is_thought, text) part lists in prompt order.
+
+    At most concurrency requests are in flight and, if given, at most
+    requests_per_minute start per minute. Retryable failures back off
+    exponentially with full jitter, honouring the server's retry delay;
+    a 429 also pauses all workers for that delay. With return_exceptions,
+    prompts that still fail return their exception instead of raising.
+    """
+    limiter = RateLimiter(requests_per_minute)
+    slots = asyncio.Semaphore(concurrency)
+
+    async with stream_client(max_connections=concurrency) as client:
+        async def run(prompt):
+            for attempt in range(max_retries + 1):
+                async with slots:
+                    await limiter.acquire()
+                    try:
+                        return [part async for part in stream_chain_of_thought(prompt, client, metrics)]
+                    except Exception as e:
+                        if attempt == max_retries or not _is_retryable(e):
+                            raise
+                        delay = _retry_after(e)
+                        if delay is None:
+                            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+                        if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 429:
+                            limiter.cooldown(delay)
+                await asyncio.sleep(delay)
+
+        return await asyncio.gather(*(run(prompt) for prompt in prompts), return_exceptions=return_exceptions)
+
+def map_chain_of_thought(prompts, **kwargs):
+    """Blocking wrapper around amap_chain_of_thought."""
+    return asyncio.run(amap_chain_of_thought(prompts, **kwargs))
+
 # Example usage
 if __name__ == "__main__":
     test_prompt = "Explain how RLHF works in simple terms."
@@ -0,0 +1,276 @@
+"""
+Latency, throughput and cost instrumentation for LLM calls.
+
+Every call (a DeepSeek reasoning stream, a Claude/O1 final answer, a Gemini
+generate_content) is timed by an LLMCall: connect time (until response
+headers), time to first token, the gaps between streamed chunks, tokens per
+second over the generation, retries made by the urllib3 Retry adapter and
+cost from the PRICES table. Finished calls are appended to a JSONL log and
+aggregated into a Prometheus text file (node_exporter textfile format), so
+providers and stages can be compared under load.
+
+Usage:
+    metrics = MetricsRecorder(log_path="llm_calls.jsonl", prom_path="llm.prom")
+    call = metrics.start("openrouter", "deepseek/deepseek-r1", "reasoning")
+    response = session.post(...)
+    call.connected(retries=retry_count(response))
+    for delta in call.wrap(deltas):
+        ...
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+# USD per million (input, output) tokens; models not listed are costed at zero
+PRICES = {
+    "deepseek/deepseek-r1": (0.55, 2.19),
+    "claude-3-5-sonnet-20241022": (3.00, 15.00),
+    "o1": (15.00, 60.00),
+    "gemini-2.0-flash-thinking-exp-1219": (0.0, 0.0),
+    "deepseek-r1-distill-llama-8b": (0.0, 0.0),
+}
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+GAP_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+def retry_count(response):
+    """Number of retries urllib3's Retry adapter made for a requests response."""
+    retries = getattr(getattr(response, "raw", None), "retries", None)
+    return len(retries.history) if retries is not None else 0
+
+
+def call_cost(model, input_tokens, output_tokens):
+    price_in, price_out = PRICES.get(model, (0.0, 0.0))
+    return ((input_tokens or 0) * price_in + (output_tokens or 0) * price_out) / 1e6
+
+
+class LLMCall:
+    """
+    Timings of one LLM call, finished exactly once.
+
+    Without reported usage the number of streamed chunks stands in for the
+    output token count (tokens_estimated is then set in the log record).
+    """
+
+    def __init__(self, recorder, provider, model, stage):
+        self.recorder = recorder
+        self.provider = provider
+        self.model = model
+        self.stage = stage
+        self.start = time.perf_counter()
+        self.connect = None
+        self.first_token = None
+        self.last_chunk = None
+        self.gaps = []
+        self.chunks = 0
+        self.retries = 0
+        self.input_tokens = None
+        self.output_tokens = None
+        self.finished = False
+
+    def connected(self, retries=0):
+        """Mark the response headers as received."""
+        self.connect = time.perf_counter() - self.start
+        self.retries = retries
+
+    def chunk(self):
+        """Mark one streamed chunk as received."""
+        now = time.perf_counter()
+        if self.first_token is None:
+            self.first_token = now
+        else:
+            self.gaps.append(now - self.last_chunk)
+        self.last_chunk = now
+        self.chunks += 1
+
+    def usage(self, input_tokens=None, output_tokens=None):
+        """Record token counts reported by the provider."""
+        if input_tokens is not None:
+            self.input_tokens = input_tokens
+        if output_tokens is not None:
+            self.output_tokens = output_tokens
+
+    def wrap(self, stream, closed_status="ok"):
+        """
+        Pass a stream's chunks through, timing each one and finishing the call at the end.
+
+        When the consumer closes the wrapper before the stream ends, the call
+        is recorded with closed_status: "ok" when stopping early is the
+        consumer's normal use of the stream, "cancelled" when the answer was
+        abandoned.
+        """
+        status = "ok"
+        try:
+            for item in stream:
+                self.chunk()
+                yield item
+        except GeneratorExit:
+            status = closed_status
+            raise
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+            self.finish(status)
+
+    async def wrap_async(self, stream, closed_status="ok"):
+        """Async counterpart of wrap(); a task cancelled mid-stream is recorded as "cancelled"."""
+        # Imported here so interactive runs of deep_thought_claude.py don't pay for asyncio
+        import asyncio
+
+        status = "ok"
+        try:
+            async for item in stream:
+                self.chunk()
+                yield item
+        except GeneratorExit:
+            status = closed_status
+            raise
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            await stream.aclose()
+            self.finish(status)
+
+    def finish(self, status="ok"):
+        """Close the call (non-streaming calls count the whole response as its first token)."""
+        if self.finished:
+            return
+        self.finished = True
+        end = time.perf_counter()
+        if self.first_token is None and status == "ok":
+            self.first_token = end
+        self.recorder.record(self, status, end)
+
+    def as_record(self, status, end):
+        estimated = self.output_tokens is None
+        output_tokens = self.chunks if estimated else self.output_tokens
+        generation = end - self.first_token if self.first_token is not None else None
+        return {
+            "time": time.time(),
+            "provider": self.provider,
+            "model": self.model,
+            "stage": self.stage,
+            "status": status,
+            "connect_seconds": self.connect,
+            "ttft_seconds": self.first_token - self.start if self.first_token is not None else None,
+            "total_seconds": end - self.start,
+            "chunks": self.chunks,
+            "max_gap_seconds": max(self.gaps) if self.gaps else None,
+            "mean_gap_seconds": sum(self.gaps) / len(self.gaps) if self.gaps else None,
+            "input_tokens": self.input_tokens,
+            "output_tokens": output_tokens,
+            "tokens_estimated": estimated,
+            "tokens_per_second": output_tokens / generation if generation else None,
+            "retries": self.retries,
+            "cost_usd": call_cost(self.model, self.input_tokens, output_tokens),
+        }
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+class MetricsRecorder:
+    """
+    Collects finished LLMCalls into a JSONL log and Prometheus metrics.
+
+    Both sinks are optional; the Prometheus file is rewritten atomically
+    after every call so a textfile collector never reads a partial file.
+    Safe to use from several threads.
+    """
+
+    def __init__(self, log_path=None, prom_path=None):
+        self.log_path = log_path
+        self.prom_path = prom_path
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._histograms = {}
+
+    def start(self, provider, model, stage):
+        """Start timing a call."""
+        return LLMCall(self, provider, model, stage)
+
+    def record(self, call, status, end):
+        record = call.as_record(status, end)
+        labels = (("provider", call.provider), ("model", call.model), ("stage", call.stage))
+        with self._lock:
+            self._counters[("llm_calls_total", labels + (("status", status),))] += 1
+            self._counters[("llm_retries_total", labels)] += record["retries"]
+            self._counters[("llm_input_tokens_total", labels)] += record["input_tokens"] or 0
+            self._counters[("llm_output_tokens_total", labels)] += record["output_tokens"] or 0
+            self._counters[("llm_cost_usd_total", labels)] += record["cost_usd"]
+            if record["ttft_seconds"] is not None:
+                self._counters[("llm_generation_seconds_total", labels)] += record["total_seconds"] - record["ttft_seconds"]
+            self._observe("llm_call_seconds", labels, LATENCY_BUCKETS, [record["total_seconds"]])
+            if record["connect_seconds"] is not None:
+                self._observe("llm_connect_seconds", labels, LATENCY_BUCKETS, [record["connect_seconds"]])
+            if record["ttft_seconds"] is not None:
+                self._observe("llm_ttft_seconds", labels, LATENCY_BUCKETS, [record["ttft_seconds"]])
+            self._observe("llm_chunk_gap_seconds", labels, GAP_BUCKETS, call.gaps)
+
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+            if self.prom_path:
+                self._write_prometheus()
+        return record
+
+    def _observe(self, name, labels, buckets, values):
+        histogram = self._histograms.get((name, labels))
+        if histogram is None:
+            histogram = self._histograms[(name, labels)] = Histogram(buckets)
+        for value in values:
+            histogram.observe(value)
+
+    def prometheus_text(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for name in sorted({name for name, _ in self._counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (metric, labels), value in sorted(self._counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{{{_labels(labels)}}} {value:g}")
+        for name in sorted({name for name, _ in self._histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                if metric != name:
+                    continue
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f"{name}_bucket{{{_labels(labels + (('le', f'{bound:g}'),))}}} {count}")
+                lines.append(f"{name}_bucket{{{_labels(labels + (('le', '+Inf'),))}}} {histogram.count}")
+                lines.append(f"{name}_sum{{{_labels(labels)}}} {histogram.sum:g}")
+                lines.append(f"{name}_count{{{_labels(labels)}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def _write_prometheus(self):
+        tmp_path = f"{self.prom_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, self.prom_path)
+
+
+def _labels(labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels)
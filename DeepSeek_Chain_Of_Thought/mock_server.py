@@ -0,0 +1,166 @@
+"""
+Mock LLM server for testing deep_thought_claude.py without API keys.
+
+Serves the three endpoints the script talks to on one local port:
+- GET  /v1/models              (LM Studio availability check)
+- POST /v1/chat/completions    (streamed DeepSeek reasoning, or a plain O1-style completion)
+- POST /v1/messages            (Anthropic Messages API, plain or streamed)
+- POST /v1alpha/models/<model>:streamGenerateContent  (Gemini thought/response stream)
+
+The reasoning stream sends a <think> block word by word with a configurable
+delay, so concurrency and pipelining behave like they do against a real
+backend. --throttle-every N answers every Nth Gemini request with a 429 and
+a RetryInfo delay, to exercise rate-limit backoff.
+
+Usage:
+    python mock_server.py --port 1234 --delay 0.05
+    ANTHROPIC_API_KEY=mock ANTHROPIC_BASE_URL=http://localhost:1234 \\
+        python deep_thought_claude.py --local --batch questions.jsonl
+"""
+
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REASONING = "<think>Let me think step by step about {question} First, restate the problem. Then check each assumption.</think> The answer follows from the reasoning above."
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    delay = 0.05
+    throttle_every = 0
+    gemini_requests = 0
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self._json({"object": "list", "data": [{"id": "deepseek-r1-distill-llama-8b", "object": "model"}]})
+        else:
+            self._json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        data = self._read_json()
+        if self.path.startswith("/v1alpha/models/") and ":streamGenerateContent" in self.path:
+            self._gemini(data)
+            return
+        question = data.get("messages", [{}])[-1].get("content", "")
+        answer = f"Mock final answer ({len(question)} chars of reasoning)"
+        if self.path == "/v1/chat/completions" and data.get("stream") and data.get("model") == "o1":
+            self._stream(answer)
+        elif self.path == "/v1/chat/completions" and data.get("stream"):
+            self._stream(REASONING.format(question=question))
+        elif self.path == "/v1/chat/completions":
+            self._json({
+                "id": "mock-completion", "object": "chat.completion", "created": int(time.time()),
+                "model": data.get("model", "o1"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": answer}}],
+                "usage": {"prompt_tokens": len(question.split()), "completion_tokens": 5, "total_tokens": len(question.split()) + 5},
+            })
+        elif self.path == "/v1/messages" and data.get("stream"):
+            time.sleep(self.delay * 10)
+            self._stream_messages(data.get("model"), answer)
+        elif self.path == "/v1/messages":
+            time.sleep(self.delay * 10)
+            self._json({
+                "id": "msg_mock", "type": "message", "role": "assistant", "model": data.get("model"),
+                "content": [{"type": "text", "text": answer}],
+                "stop_reason": "end_turn", "stop_sequence": None,
+                "usage": {"input_tokens": len(question.split()), "output_tokens": 5},
+            })
+        else:
+            self._json({"error": "not found"}, 404)
+
+    def _stream(self, text):
+        """Send text as OpenAI-style SSE chunks, one word per chunk."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for word in text.split(" "):
+            chunk = {"choices": [{"index": 0, "delta": {"content": word + " "}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+            time.sleep(self.delay)
+        usage = {"prompt_tokens": 20, "completion_tokens": len(text.split(" ")), "total_tokens": 20 + len(text.split(" "))}
+        self.wfile.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode('utf-8'))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _gemini(self, data):
+        """Stream Gemini thought parts then response parts, or throttle with a 429."""
+        MockHandler.gemini_requests += 1
+        if self.throttle_every and MockHandler.gemini_requests % self.throttle_every == 0:
+            self._json({"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Quota exceeded",
+                                  "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "0.2s"}]}}, 429)
+            return
+        prompt = data["contents"][-1]["parts"][0]["text"]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        parts = [{"text": f"Considering {prompt}", "thought": True}, {"text": " step by step.", "thought": True},
+                 {"text": f"Mock Gemini answer to {prompt}"}]
+        for i, part in enumerate(parts):
+            chunk = {"candidates": [{"content": {"role": "model", "parts": [part]}, "index": 0}]}
+            if i == len(parts) - 1:
+                chunk["usageMetadata"] = {"promptTokenCount": len(prompt.split()), "candidatesTokenCount": 12}
+            self.wfile.write(f"data: {json.dumps(chunk)}\r\n\r\n".encode('utf-8'))
+            self.wfile.flush()
+            time.sleep(self.delay)
+        self.close_connection = True
+
+    def _stream_messages(self, model, text):
+        """Send text as an Anthropic Messages event stream, one word per delta."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        events = [("message_start", {"type": "message_start", "message": {
+            "id": "msg_mock", "type": "message", "role": "assistant", "model": model, "content": [],
+            "stop_reason": None, "stop_sequence": None, "usage": {"input_tokens": 1, "output_tokens": 0}}}),
+            ("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})]
+        events += [("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                            "delta": {"type": "text_delta", "text": word + " "}})
+                   for word in text.split(" ")]
+        events += [("content_block_stop", {"type": "content_block_stop", "index": 0}),
+                   ("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                      "usage": {"output_tokens": 5}}),
+                   ("message_stop", {"type": "message_stop"})]
+        for event, payload in events:
+            self.wfile.write(f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+            if event == "content_block_delta":
+                time.sleep(self.delay)
+        self.close_connection = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Mock LM Studio / OpenRouter / Anthropic server')
+    parser.add_argument('--port', type=int, default=1234, help='Port to listen on (LM Studio uses 1234)')
+    parser.add_argument('--delay', type=float, default=0.05, help='Seconds between streamed chunks')
+    parser.add_argument('--throttle-every', type=int, default=0, help='Answer every Nth Gemini request with a 429 (0: never)')
+    args = parser.parse_args()
+
+    MockHandler.delay = args.delay
+    MockHandler.throttle_every = args.throttle_every
+    server = ThreadingHTTPServer(("localhost", args.port), MockHandler)
+    # --port 0 picks a free port
+    print(f"Mock server listening on http://localhost:{server.server_address[1]}", flush=True)
+    server.serve_forever()
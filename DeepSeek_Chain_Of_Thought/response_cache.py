@@ -0,0 +1,163 @@
+"""
+Persistent content-addressed cache for LLM responses.
+
+Responses are stored in a local SQLite file keyed by a SHA-256 hash of the
+request (model, messages, temperature, max_tokens), as the list of streamed
+chunks, so a cached stream replays chunk by chunk through the same code path
+as a live one. Entries expire after ttl seconds, and once the file holds
+more than max_bytes of responses the least recently used ones are evicted.
+
+Usage:
+    cache = ResponseCache("response_cache.sqlite")
+    key = cache_key(model, messages, temperature=0.7, max_tokens=2048)
+    for chunk in cache.stream(key, lambda: live_stream(...)):
+        print(chunk, end='')
+    print(cache.stats())
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = "response_cache.sqlite"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+def cache_key(model, messages, temperature=None, max_tokens=None, **extra):
+    """
+    Hash a request into a cache key.
+
+    messages may be a chat message list or a plain prompt; extra holds any
+    other request fields that change the response (e.g. a thinking config).
+    """
+    request = {"model": model, "messages": messages, "temperature": temperature,
+               "max_tokens": max_tokens, **extra}
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed response store with TTL expiry and LRU size eviction.
+
+    Safe to share between threads (speculative answers, batch workers); hit
+    and miss counts are kept per instance and returned by stats().
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT, chunks TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    def close(self):
+        self._db.close()
+
+    def get(self, key):
+        """Return the cached chunks for key, or None on a miss or an expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT chunks FROM responses WHERE key = ? AND created >= ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, chunks, model=None):
+        """Store a complete response as its list of chunks, then evict if over budget."""
+        payload = json.dumps(list(chunks), ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, chunks, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, payload, len(payload.encode("utf-8")), now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until the rest fits
+        excess = total - self.max_bytes
+        stale = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            stale.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._db.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def stream(self, key, open_stream, model=None):
+        """Yield a response chunk by chunk, from the cache or, on a miss, from open_stream()."""
+        chunks = self.get(key)
+        if chunks is not None:
+            yield from chunks
+        else:
+            yield from self.record(key, open_stream(), model)
+
+    def record(self, key, stream, model=None):
+        """
+        Pass a live stream's chunks through and store them once it completes.
+
+        A stream that fails or is closed early (e.g. a cancelled speculative
+        answer) is not cached.
+        """
+        chunks = []
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+        self.put(key, chunks, model)
+
+    async def stream_async(self, key, open_stream, model=None):
+        """Async counterpart of stream() for async generators."""
+        chunks = self.get(key)
+        if chunks is not None:
+            for chunk in chunks:
+                yield chunk
+            return
+        chunks = []
+        stream = open_stream()
+        try:
+            async for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            await stream.aclose()
+        self.put(key, chunks, model)
+
+    def stats(self):
+        """Hit/miss counts of this instance plus the size of the store."""
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
@@ -0,0 +1,176 @@
+"""
+Async streaming chat client for OpenRouter and LM Studio.
+
+One httpx.AsyncClient is shared by all streams, so many concurrent requests
+reuse pooled keep-alive connections (multiplexed over HTTP/2 when the h2
+package is installed and the server supports it, e.g. OpenRouter). Server
+sent events are framed incrementally from raw bytes, and every chunk read
+has its own deadline, so a stalled stream fails after chunk_timeout seconds
+instead of blocking until the next line arrives.
+
+Usage:
+    async with AsyncSSEClient.for_openrouter(os.getenv('OPENROUTER_API_KEY')) as client:
+        async for chunk in client.stream_chat(data):
+            print(chunk['choices'][0]['delta'].get('content', ''), end='')
+"""
+
+import asyncio
+import codecs
+import json
+import os
+from contextlib import aclosing
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+LM_STUDIO_URL = os.getenv("LM_STUDIO_URL", "http://localhost:1234/v1")
+OPENROUTER_URL = "https://openrouter.ai/api/v1"
+
+
+class StreamStallError(TimeoutError):
+    """Raised when no bytes arrive on a stream within the chunk deadline."""
+
+
+class SSEDecoder:
+    """
+    Incremental server-sent events framer.
+
+    Feed it raw byte chunks as they arrive; it returns the data payloads of
+    the events completed by that chunk. UTF-8 sequences and lines split
+    across chunk boundaries are carried over, comment lines (": ...", used
+    by OpenRouter as keep-alives) are dropped, and multi-line data fields
+    are joined with newlines as the SSE spec requires.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ""
+        self._data = []
+
+    def feed(self, chunk):
+        """Consume a byte chunk and return the completed event payloads."""
+        self._buffer += self._decoder.decode(chunk)
+        events = []
+        while True:
+            newline = self._buffer.find("\n")
+            if newline < 0:
+                break
+            line = self._buffer[:newline].rstrip("\r")
+            self._buffer = self._buffer[newline + 1:]
+            self._process_line(line, events)
+        return events
+
+    def flush(self):
+        """Return the payload of a final event not terminated by a blank line."""
+        events = []
+        if self._buffer:
+            self._process_line(self._buffer.rstrip("\r"), events)
+            self._buffer = ""
+        self._process_line("", events)
+        return events
+
+    def _process_line(self, line, events):
+        if not line:
+            # Blank line dispatches the event
+            if self._data:
+                events.append("\n".join(self._data))
+                self._data = []
+        elif line.startswith(":"):
+            return
+        elif line.startswith("data:"):
+            value = line[5:]
+            self._data.append(value[1:] if value.startswith(" ") else value)
+        elif not line.startswith(("event:", "id:", "retry:")):
+            # Lines without a data: prefix are kept as data, like deep_thought_claude.py does
+            self._data.append(line)
+
+
+class AsyncSSEClient:
+    """Pooled async client for OpenAI-compatible streaming chat completions."""
+
+    def __init__(self, base_url, headers=None, chunk_timeout=30.0, connect_timeout=10.0,
+                 max_connections=100, http2=HTTP2_AVAILABLE):
+        self.base_url = base_url.rstrip("/")
+        self.chunk_timeout = chunk_timeout
+        self.client = httpx.AsyncClient(
+            headers=headers or {"Content-Type": "application/json"},
+            http2=http2,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            # Reads are bounded by chunk_timeout below; httpx's own read timeout is a backstop
+            timeout=httpx.Timeout(connect=connect_timeout, read=chunk_timeout * 2, write=30.0, pool=None),
+        )
+
+    @classmethod
+    def for_local(cls, base_url=LM_STUDIO_URL, **kwargs):
+        """Client for a local LM Studio server."""
+        return cls(base_url, {"Content-Type": "application/json"}, **kwargs)
+
+    @classmethod
+    def for_openrouter(cls, api_key, base_url=OPENROUTER_URL, **kwargs):
+        """Client for OpenRouter, with the same headers deep_thought_claude.py sends."""
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "https://github.com/cascade",
+            "X-Title": "Chain of Thought Demo"
+        }
+        return cls(base_url, headers, **kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def stream_events(self, data, path="/chat/completions"):
+        """
+        POST a streaming request and yield each SSE data payload as a string.
+
+        Raises httpx.HTTPStatusError on an error status and StreamStallError
+        when no bytes arrive within chunk_timeout.
+        """
+        decoder = SSEDecoder()
+        async with self.client.stream("POST", f"{self.base_url}{path}", json=data) as response:
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            chunks = response.aiter_bytes()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), self.chunk_timeout)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise StreamStallError(f"No data received for {self.chunk_timeout} seconds") from None
+                for event in decoder.feed(chunk):
+                    yield event
+            for event in decoder.flush():
+                yield event
+
+    async def stream_chat(self, data, path="/chat/completions"):
+        """Yield parsed JSON chunks of a streaming chat completion until [DONE]."""
+        async with aclosing(self.stream_events(dict(data, stream=True), path)) as events:
+            async for event in events:
+                if event == "[DONE]":
+                    return
+                try:
+                    yield json.loads(event)
+                except json.JSONDecodeError:
+                    continue
+
+    async def stream_content(self, data, path="/chat/completions"):
+        """Yield only the text deltas of a streaming chat completion."""
+        async with aclosing(self.stream_chat(data, path)) as chunks:
+            async for chunk in chunks:
+                choice = (chunk.get('choices') or [{}])[0]
+                content = choice['delta'].get('content') if 'delta' in choice else choice.get('text')
+                if content:
+                    yield content
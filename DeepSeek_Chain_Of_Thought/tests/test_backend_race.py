@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+from backend_race import LatencyStats, race
+from llm_metrics import MetricsRecorder
+
+
+async def fake_stream(deltas, delay, error=None):
+    """A provider stream yielding deltas delay seconds apart, then raising error if given."""
+    for delta in deltas:
+        await asyncio.sleep(delay)
+        yield delta
+    if error is not None:
+        raise error
+
+
+def statuses(log_path):
+    with open(log_path, encoding="utf-8") as f:
+        return {record["provider"]: (record["status"], record["chunks"]) for record in map(json.loads, f)}
+
+
+def test_race_records_winner_losers_and_failures(tmp_path):
+    metrics = MetricsRecorder(log_path=tmp_path / "calls.jsonl")
+    think = ["<think>", "Rayleigh scattering", "</think>", " Blue light scatters most."]
+
+    def backend(name, delay, error=None, deltas=think):
+        return lambda: metrics.start(name, "model", "reasoning").wrap_async(fake_stream(deltas, delay, error))
+
+    result = asyncio.run(race({
+        "fast": backend("fast", 0.01),
+        "slow": backend("slow", 0.5),
+        "broken": backend("broken", 0.01, ConnectionError("refused"), deltas=["<think>"]),
+    }, LatencyStats()))
+
+    assert result.backend == "fast"
+    assert result.reasoning == "Rayleigh scattering"
+    assert result.cancelled == ["slow"]
+    assert isinstance(result.errors["broken"], ConnectionError)
+    # The winner stops reading after </think>, which is a normal end of its call
+    assert statuses(tmp_path / "calls.jsonl") == {
+        "fast": ("ok", 3),
+        "slow": ("cancelled", 0),
+        "broken": ("ConnectionError", 1),
+    }
+
+
+def test_early_close_status_is_chosen_by_the_caller(tmp_path):
+    metrics = MetricsRecorder(log_path=tmp_path / "calls.jsonl")
+    for name, closed_status in (("kept", "ok"), ("abandoned", "cancelled")):
+        stream = metrics.start(name, "model", "final").wrap(iter(["a", "b", "c"]), closed_status=closed_status)
+        next(stream)
+        stream.close()
+
+    async def read_one():
+        stream = metrics.start("async", "model", "reasoning").wrap_async(fake_stream(["a", "b"], 0))
+        await stream.__anext__()
+        await stream.aclose()
+
+    asyncio.run(read_one())
+    assert statuses(tmp_path / "calls.jsonl") == {
+        "kept": ("ok", 1),
+        "abandoned": ("cancelled", 1),
+        "async": ("ok", 1),
+    }
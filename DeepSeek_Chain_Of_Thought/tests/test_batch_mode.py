@@ -0,0 +1,73 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from mock_server import MockHandler
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "deep_thought_claude.py")
+QUESTIONS = ["Why is the sky blue?", "What is 17 * 23?", {"id": "q3", "question": "Is zero even?"}]
+
+
+@pytest.fixture
+def mock_server():
+    """mock_server.MockHandler on an ephemeral port; yields (base URL, request counts per path)."""
+    requests = Counter()
+
+    class CountingHandler(MockHandler):
+        delay = 0.001
+
+        def do_POST(self):
+            requests[self.path] += 1
+            super().do_POST()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CountingHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", requests
+    server.shutdown()
+    server.server_close()
+
+
+def run_batch(tmp_path, url):
+    env = {**os.environ, "ANTHROPIC_API_KEY": "mock", "ANTHROPIC_BASE_URL": url, "LM_STUDIO_URL": f"{url}/v1"}
+    env.pop("OPENROUTER_API_KEY", None)
+    completed = subprocess.run(
+        [sys.executable, SCRIPT, "--local", "--batch", "questions.jsonl", "--output", "results.jsonl",
+         "--cache", "cache.db"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert completed.returncode == 0, completed.stderr
+    with open(tmp_path / "results.jsonl", encoding="utf-8") as f:
+        return [json.loads(line) for line in f], completed.stdout
+
+
+def test_batch_writes_appends_and_hits_the_cache(tmp_path, mock_server):
+    url, requests = mock_server
+    (tmp_path / "questions.jsonl").write_text("".join(json.dumps(q) + "\n" for q in QUESTIONS), encoding="utf-8")
+
+    results, stdout = run_batch(tmp_path, url)
+    assert len(results) == 3
+    assert {result["id"] for result in results} == {1, 2, "q3"}
+    for result in results:
+        assert "error" not in result, result
+        assert result["reasoning"].startswith("Let me think step by step about")
+        assert result["final_answer"].startswith("Mock final answer")
+    assert requests == {"/v1/chat/completions": 3, "/v1/messages": 3}
+    assert "0 hits, 6 misses" in stdout
+
+    # A second run appends its results and answers everything from the cache
+    results_again, stdout = run_batch(tmp_path, url)
+    assert len(results_again) == 6
+    assert results_again[:3] == results
+    by_id = {result["id"]: result for result in results}
+    for result in results_again[3:]:
+        assert result["reasoning"] == by_id[result["id"]]["reasoning"]
+        assert result["final_answer"] == by_id[result["id"]]["final_answer"]
+    assert requests == {"/v1/chat/completions": 3, "/v1/messages": 3}
+    assert "6 hits, 0 misses" in stdout
@@ -0,0 +1,72 @@
+import asyncio
+import json
+import random
+
+import httpx
+
+from sse_client import AsyncSSEClient, SSEDecoder
+
+STREAM = (
+    ': OPENROUTER PROCESSING\r\n\r\n'
+    'data: {"choices": [{"delta": {"content": "Grüße "}}]}\r\n\r\n'
+    'event: message\n'
+    'data: first line\n'
+    'data: second line\n\n'
+    ': keep-alive\n\n'
+    'data:no space\n\n'
+    'data: [DONE]\n\n'
+).encode('utf-8')
+
+EVENTS = [
+    '{"choices": [{"delta": {"content": "Grüße "}}]}',
+    'first line\nsecond line',
+    'no space',
+    '[DONE]',
+]
+
+
+def _decode(chunks):
+    decoder = SSEDecoder()
+    events = []
+    for chunk in chunks:
+        events.extend(decoder.feed(chunk))
+    return events + decoder.flush()
+
+
+def test_whole_stream():
+    assert _decode([STREAM]) == EVENTS
+
+
+def test_events_split_across_chunks():
+    # Every single split point, including inside \r\n pairs and the UTF-8 bytes of "ü" and "ß"
+    for i in range(1, len(STREAM)):
+        assert _decode([STREAM[:i], STREAM[i:]]) == EVENTS, i
+    rng = random.Random(0)
+    for _ in range(200):
+        cuts = sorted(rng.sample(range(1, len(STREAM)), rng.randint(2, 20)))
+        chunks = [STREAM[a:b] for a, b in zip([0] + cuts, cuts + [len(STREAM)])]
+        assert _decode(chunks) == EVENTS
+
+
+def test_byte_by_byte():
+    assert _decode([STREAM[i:i + 1] for i in range(len(STREAM))]) == EVENTS
+
+
+def test_unterminated_final_event_is_flushed():
+    assert _decode([b'data: one\n\ndata: two\r\n']) == ['one', 'two']
+    assert _decode([b'data: tail']) == ['tail']
+
+
+def test_stream_chat_stops_at_done():
+    body = STREAM + b'data: {"after": "done"}\n\n'
+
+    async def run():
+        client = AsyncSSEClient("http://mock/v1")
+        await client.client.aclose()
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body))
+        client.client = httpx.AsyncClient(transport=transport)
+        async with client:
+            return [chunk async for chunk in client.stream_chat({"model": "m", "messages": []})]
+
+    # Non-JSON payloads are skipped and nothing after [DONE] is yielded
+    assert asyncio.run(run()) == [json.loads(EVENTS[0])]
@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from think_parser import ThinkStreamParser
+
+TEXTS = [
+    "<think>Let me think step by step.</think> The answer is 42.",
+    "Preamble <think>a < b and </thin is not a tag</think>Answer with <thi and </ inside.",
+    "Reasoning opened in the prompt.</think> The answer.",
+    "No tags at all, just < and </ and <th.",
+    "<think>Never closed <",
+    "<think></think>",
+    "x</think",
+]
+
+
+def _parse(chunks):
+    """Feed chunks and return (merged segments, reasoning, answer, think_closed, on_reasoning calls)."""
+    calls = []
+    parser = ThinkStreamParser(on_reasoning=calls.append)
+    segments = []
+    for chunk in chunks:
+        segments.extend(parser.feed(chunk))
+    segments.extend(parser.finish())
+    merged = []
+    for kind, text in segments:
+        if merged and merged[-1][0] == kind:
+            merged[-1] = (kind, merged[-1][1] + text)
+        else:
+            merged.append((kind, text))
+    return merged, parser.reasoning, parser.answer, parser.think_closed, calls
+
+
+def _random_chunks(text, rng):
+    cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randint(1, 12))))
+    return [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_random_chunk_splits_match_whole_string(text):
+    whole = _parse([text])
+    _, reasoning, answer, closed, calls = whole
+    rng = random.Random(text)
+    splits = [[text[:i], text[i:]] for i in range(1, len(text))]
+    splits += [_random_chunks(text, rng) for _ in range(200)]
+    splits.append(list(text))
+    for chunks in splits:
+        split = _parse(chunks)
+        assert split[1:] == (reasoning, answer, closed, calls), chunks
+        if "<think>" in text or "</think>" not in text:
+            # Without an implicit block no text is reclassified, so the segments match too
+            assert split[0] == whole[0], chunks
+
+
+def test_whole_string_results():
+    _, reasoning, answer, closed, calls = _parse([TEXTS[0]])
+    assert (reasoning, answer, closed, calls) == ("Let me think step by step.", "The answer is 42.", True,
+                                                 ["Let me think step by step."])
+    _, reasoning, answer, closed, _ = _parse([TEXTS[2]])
+    assert (reasoning, answer, closed) == ("Reasoning opened in the prompt.", "The answer.", True)
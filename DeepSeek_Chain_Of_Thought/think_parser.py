@@ -0,0 +1,130 @@
+"""
+Incremental <think> tag parser for streamed DeepSeek R1 output.
+
+Consumes the response one delta at a time and splits it into think and
+answer segments as it goes, so every character is scanned once and the
+reasoning is available the moment </think> arrives instead of after the
+stream ends. Tags split across chunk boundaries ("</th" + "ink>") are
+handled by holding back the shortest tail that could still become a tag.
+
+Usage:
+    parser = ThinkStreamParser(on_reasoning=lambda reasoning: print("reasoning done"))
+    for delta in deltas:
+        for kind, text in parser.feed(delta):
+            print(text, end='')
+    parser.finish()
+    reasoning = parser.reasoning
+"""
+
+OPEN_TAG = "<think>"
+CLOSE_TAG = "</think>"
+
+
+class ThinkStreamParser:
+    """
+    State machine over the stream: before, inside and after the think block.
+
+    feed() returns the (kind, text) segments completed by a delta, kind
+    being "think" or "answer". If </think> arrives without an opening tag
+    (some R1 chat templates open the block in the prompt), everything before
+    it is treated as reasoning. on_reasoning, if given, is called once with
+    the stripped reasoning when the block closes.
+    """
+
+    def __init__(self, on_reasoning=None):
+        self.on_reasoning = on_reasoning
+        self.state = "before"  # "before" -> "think" -> "after"
+        self.think_started = False
+        self.think_closed = False
+        self._pending = ""
+        self._think = []
+        self._answer = []
+        self._text = []
+
+    def feed(self, delta):
+        """Consume one streamed delta and return the completed segments."""
+        self._text.append(delta)
+        data = self._pending + delta
+        self._pending = ""
+        segments = []
+        pos = 0
+        while pos < len(data):
+            if self.state == "after":
+                self._emit(segments, "answer", data[pos:])
+                return segments
+            tag = OPEN_TAG if self.state == "before" else CLOSE_TAG
+            kind = "answer" if self.state == "before" else "think"
+            found = data.find(tag, pos)
+            # A bare </think> before any <think> closes an implicit block
+            close = data.find(CLOSE_TAG, pos) if self.state == "before" else -1
+            if close >= 0 and (found < 0 or close < found):
+                self._reclassify_as_think(data[pos:close])
+                pos = close + len(CLOSE_TAG)
+                self._close()
+                continue
+            if found >= 0:
+                self._emit(segments, kind, data[pos:found])
+                pos = found + len(tag)
+                if self.state == "before":
+                    self.state = "think"
+                    self.think_started = True
+                else:
+                    self._close()
+                continue
+            # No complete tag: hold back a tail that could start one
+            keep = _partial_tag_length(data, pos)
+            self._emit(segments, kind, data[pos:len(data) - keep])
+            self._pending = data[len(data) - keep:]
+            break
+        return segments
+
+    def finish(self):
+        """Flush held-back text at the end of the stream and return its segments."""
+        segments = []
+        if self._pending:
+            kind = "think" if self.state == "think" else "answer"
+            self._emit(segments, kind, self._pending)
+            self._pending = ""
+        return segments
+
+    @property
+    def reasoning(self):
+        """Reasoning text so far (complete once think_closed is True)."""
+        return "".join(self._think).strip()
+
+    @property
+    def answer(self):
+        """Text outside the think block so far."""
+        return "".join(self._answer).strip()
+
+    @property
+    def text(self):
+        """The raw response so far."""
+        return "".join(self._text)
+
+    def _emit(self, segments, kind, text):
+        if text:
+            (self._think if kind == "think" else self._answer).append(text)
+            segments.append((kind, text))
+
+    def _reclassify_as_think(self, text):
+        """Move answer text seen before an implicit block into the reasoning."""
+        self._think = self._answer + ([text] if text else [])
+        self._answer = []
+        self.think_started = True
+
+    def _close(self):
+        self.state = "after"
+        self.think_closed = True
+        if self.on_reasoning is not None:
+            self.on_reasoning(self.reasoning)
+
+
+def _partial_tag_length(data, pos):
+    """Length of the longest suffix of data[pos:] that is a prefix of a tag."""
+    longest = min(len(CLOSE_TAG) - 1, len(data) - pos)
+    for n in range(longest, 0, -1):
+        tail = data[-n:]
+        if OPEN_TAG.startswith(tail) or CLOSE_TAG.startswith(tail):
+            return n
+    return 0
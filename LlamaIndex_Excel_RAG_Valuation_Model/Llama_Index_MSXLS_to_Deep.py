@@ -1,44 +1,258 @@
+"""
+Convert Excel valuation models to Markdown with LlamaIndex.
+
+A single workbook is converted next to itself; a directory is converted in
+parallel on a process pool. A JSON manifest records each workbook's size,
+mtime and SHA-256, so unchanged workbooks are skipped on the next run and
+the markdown of deleted ones is removed. Documents are written to disk as
+the reader produces them rather than collected in memory first: .xlsx and
+.xlsm workbooks are streamed row by row through ExcelStreamReader, other
+formats go through SimpleDirectoryReader.
+
+Usage:
+    python Llama_Index_MSXLS_to_Deep.py BASF_Case_Study_Modul1.xlsx
+    python Llama_Index_MSXLS_to_Deep.py models/ --output-dir markdown/ --workers 8
+"""
+
 import nest_asyncio
 nest_asyncio.apply()
 
 from llama_index.core import SimpleDirectoryReader
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import hashlib
+import json
 import os
 
+from excel_stream_reader import ExcelStreamReader, STREAMABLE_EXTENSIONS
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm', '.xls')
+MANIFEST_NAME = '.markdown_manifest.json'
+WRITE_BUFFER = 1024 * 1024
+
+
+def write_markdown(documents, f):
+    """Write documents to an open file one at a time; returns how many were written"""
+    count = 0
+    for doc in documents:
+        # Write metadata as YAML front matter
+        front_matter = ['---\n']
+        if hasattr(doc, 'metadata') and doc.metadata:
+            front_matter.extend(f'{key}: {value}\n' for key, value in doc.metadata.items())
+        front_matter.append('---\n\n')
+        f.write(''.join(front_matter))
+        # Write content
+        f.write(doc.text)
+        f.write('\n\n')
+        count += 1
+    return count
+
+
 def save_as_markdown(documents, output_path):
-    """Save document content as markdown"""
-    with open(output_path, 'w', encoding='utf-8') as f:
-        for doc in documents:
-            # Write metadata as YAML front matter
-            f.write('---\n')
-            if hasattr(doc, 'metadata') and doc.metadata:
-                for key, value in doc.metadata.items():
-                    f.write(f'{key}: {value}\n')
-            f.write('---\n\n')
-            # Write content
-            f.write(doc.text)
-            f.write('\n\n')
-
-# For demonstration, let's use SimpleDirectoryReader instead of LlamaParse
-# since LlamaParse requires an API key
-def process_documents(file_path: str):
+    """Save document content as markdown, replacing output_path only once complete"""
+    # Unique per process, so concurrent writers never share a temporary file
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER) as f:
+            count = write_markdown(documents, f)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        # Don't leave a partial file behind when the reader fails
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def iter_documents(file_path):
+    """Yield a workbook's documents as the reader produces them"""
+    if file_path.lower().endswith(STREAMABLE_EXTENSIONS):
+        yield from ExcelStreamReader().lazy_load_data(file_path)
+        return
     reader = SimpleDirectoryReader(input_files=[file_path])
-    documents = reader.load_data()
-    
-    # Save as markdown
-    markdown_path = os.path.splitext(file_path)[0] + '.md'
-    save_as_markdown(documents, markdown_path)
+    for documents in reader.iter_data():
+        yield from documents
+
+
+# For demonstration, let's use local readers instead of LlamaParse
+# since LlamaParse requires an API key
+def process_documents(file_path: str, keep_documents=True):
+    """Convert one workbook to markdown; returns its documents, or None if keep_documents is False"""
+    documents = [] if keep_documents else None
+
+    def produced():
+        for doc in iter_documents(file_path):
+            if documents is not None:
+                documents.append(doc)
+            yield doc
+
+    # Save as markdown while the reader streams
+    markdown_path = file_path + '.md'
+    save_as_markdown(produced(), markdown_path)
     print(f"Saved markdown version to: {markdown_path}")
-    
+
     return documents
 
+
+def convert_workbook(file_path, markdown_path):
+    """Process pool worker: stream one workbook to markdown and return the document count"""
+    os.makedirs(os.path.dirname(markdown_path) or '.', exist_ok=True)
+    return save_as_markdown(iter_documents(file_path), markdown_path)
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, manifest_path):
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def find_workbooks(input_dir):
+    """Relative paths of the Excel files under input_dir, skipping Office lock files"""
+    workbooks = []
+    for root, _, files in os.walk(input_dir):
+        for name in files:
+            if name.lower().endswith(EXCEL_EXTENSIONS) and not name.startswith('~$'):
+                workbooks.append(os.path.relpath(os.path.join(root, name), input_dir))
+    return sorted(workbooks)
+
+
+def workbook_changed(path, entry, output_path):
+    """
+    Return (changed, stat fields, sha256) for a workbook against its manifest
+    entry; a workbook whose output_path is missing counts as changed.
+    Matching size and mtime skip hashing; a touched but identical file is
+    still recognised by its hash.
+    """
+    stat = os.stat(path)
+    fields = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if entry is None or not os.path.exists(output_path):
+        return True, fields, file_sha256(path)
+    if entry.get('size') == fields['size'] and entry.get('mtime_ns') == fields['mtime_ns']:
+        return False, fields, entry['sha256']
+    sha256 = file_sha256(path)
+    return sha256 != entry.get('sha256'), fields, sha256
+
+
+def markdown_for(output_dir, relative):
+    """
+    Markdown path of a workbook, mirroring its path relative to the input
+    directory. The workbook's extension is kept (model.xlsx.md), so
+    model.xlsx and model.xls next to each other don't share an output.
+    """
+    return os.path.join(output_dir, relative + '.md')
+
+
+def remove_orphans(old_manifest, workbooks, output_dir):
+    """
+    Delete markdown recorded in the old manifest that no current workbook
+    produces: that of workbooks no longer on disk, and outputs written
+    under an older naming scheme. Returns the removed paths.
+    """
+    current = {markdown_for(output_dir, relative) for relative in workbooks}
+    removed = []
+    for relative, entry in sorted(old_manifest.items()):
+        markdown_path = entry.get('markdown') or markdown_for(output_dir, relative)
+        if markdown_path not in current and os.path.exists(markdown_path):
+            os.remove(markdown_path)
+            removed.append(markdown_path)
+            print(f"Removed orphaned markdown of {relative}: {markdown_path}")
+    return removed
+
+
+def process_directory(input_dir, output_dir=None, max_workers=None, force=False, manifest_path=None):
+    """
+    Convert every workbook under input_dir to markdown in parallel.
+
+    Markdown files mirror the input tree under output_dir (next to the
+    workbooks by default), named after their workbook (model.xlsx.md). The manifest is saved after every finished
+    workbook, so an interrupted run resumes where it stopped; a workbook
+    that fails is left out of it and retried next time. The markdown of
+    workbooks that were deleted since the last run is removed.
+    """
+    output_dir = output_dir or input_dir
+    manifest_path = manifest_path or os.path.join(output_dir, MANIFEST_NAME)
+    os.makedirs(output_dir, exist_ok=True)
+    old_manifest = load_manifest(manifest_path)
+    manifest = {}
+    pending = {}
+    workbooks = find_workbooks(input_dir)
+    for relative in workbooks:
+        path = os.path.join(input_dir, relative)
+        markdown_path = markdown_for(output_dir, relative)
+        entry = None if force else old_manifest.get(relative)
+        changed, fields, sha256 = workbook_changed(path, entry, markdown_path)
+        if changed:
+            pending[relative] = (path, markdown_path, fields, sha256)
+        else:
+            manifest[relative] = {**entry, **fields, 'markdown': markdown_path}
+    removed = remove_orphans(old_manifest, workbooks, output_dir)
+    # Drops entries of deleted workbooks and refreshes touched ones before converting
+    save_manifest(manifest, manifest_path)
+
+    summary = {'converted': 0, 'skipped': len(manifest), 'removed': removed, 'documents': 0, 'failed': {}}
+    if not pending:
+        return summary
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(convert_workbook, path, markdown_path): relative
+            for relative, (path, markdown_path, _, _) in pending.items()
+        }
+        for future in as_completed(futures):
+            relative = futures[future]
+            _, markdown_path, fields, sha256 = pending[relative]
+            try:
+                count = future.result()
+            except Exception as e:
+                summary['failed'][relative] = f"{type(e).__name__}: {e}"
+                print(f"Failed to convert {relative}: {e}")
+                continue
+            manifest[relative] = {**fields, 'sha256': sha256, 'markdown': markdown_path, 'documents': count}
+            save_manifest(manifest, manifest_path)
+            summary['converted'] += 1
+            summary['documents'] += count
+            print(f"Saved markdown version to: {markdown_path}")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert Excel workbooks to markdown")
+    parser.add_argument('path', nargs='?', default=os.path.join(current_dir, "BASF_Case_Study_Modul1.xlsx"),
+                        help="Workbook or directory of workbooks")
+    parser.add_argument('--output-dir', help="Directory mode: where to write markdown (default: next to the workbooks)")
+    parser.add_argument('--workers', type=int, default=None, help="Directory mode: worker processes (default: CPU count)")
+    parser.add_argument('--force', action='store_true', help="Directory mode: reconvert unchanged workbooks too")
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.path):
+        summary = process_directory(args.path, args.output_dir, args.workers, args.force)
+        print(f"Converted {summary['converted']} workbooks ({summary['documents']} documents), "
+              f"skipped {summary['skipped']} unchanged, removed {len(summary['removed'])} orphaned, "
+              f"{len(summary['failed'])} failed")
+    elif os.path.exists(args.path):
+        # Handle complex Excel file
+        process_documents(args.path, keep_documents=False)
+    else:
+        print(f"No Excel file found at {args.path}")
+
+
 # Example usage
 if __name__ == "__main__":
-    
-    # Handle complex Excel file
-    excel_path = os.path.join(current_dir, "BASF_Case_Study_Modul1.xlsx")
-    if os.path.exists(excel_path):
-        excel_documents = process_documents(excel_path)
-        
-    else:
-        print(f"No Excel file found at {pdf_path}")
-  
\ No newline at end of file
+    main()
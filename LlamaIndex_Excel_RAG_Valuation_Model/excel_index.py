@@ -0,0 +1,287 @@
+"""
+Persistent vector index over Excel valuation models.
+
+Workbooks are read through the loader in Llama_Index_MSXLS_to_Deep, their
+sheets split into table-aware chunks (whole rows only, each chunk repeating
+its table's header row) and embedded in batches with a local HuggingFace
+model. Every workbook is stored as its own segment (a float32 .npy matrix
+of normalised embeddings plus a .jsonl of chunk text and metadata), so
+re-indexing a folder only re-embeds workbooks whose SHA-256 changed (only
+hashing those whose size or mtime moved) and queries are a single
+matrix-vector product over the loaded segments.
+
+Usage:
+    python excel_index.py build models/ --index-dir excel_index/
+    python excel_index.py query "terminal growth rate" --index-dir excel_index/ -k 5
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from Llama_Index_MSXLS_to_Deep import file_sha256, find_workbooks, iter_documents, workbook_changed
+
+DEFAULT_MODEL = "BAAI/bge-small-en-v1.5"
+DEFAULT_INDEX_DIR = "excel_index"
+MAX_CHUNK_CHARS = 2000
+EMBED_BATCH_SIZE = 64
+
+_SEPARATOR_ROW = re.compile(r'^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$')
+
+
+def load_embed_model(model_name=DEFAULT_MODEL, embed_batch_size=EMBED_BATCH_SIZE):
+    try:
+        from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+    except ImportError as e:
+        raise ImportError("Local embeddings need llama-index-embeddings-huggingface "
+                          "(pip install llama-index-embeddings-huggingface)") from e
+    return HuggingFaceEmbedding(model_name=model_name, embed_batch_size=embed_batch_size)
+
+
+def table_chunks(text, max_chars=MAX_CHUNK_CHARS):
+    """
+    Split sheet text into chunks of at most max_chars that never cut a row.
+
+    Blank lines separate tables. A table's first row (plus a Markdown
+    |---| separator after it) is its header and starts every chunk the
+    table is split into; small consecutive tables share a chunk. A single
+    row longer than max_chars becomes a chunk of its own.
+    """
+    chunks, current = [], ''
+    for block in re.split(r'\n\s*\n', text):
+        lines = [line for line in block.splitlines() if line.strip()]
+        if not lines:
+            continue
+        table = '\n'.join(lines)
+        if len(table) <= max_chars:
+            if current and len(current) + len(table) + 2 > max_chars:
+                chunks.append(current)
+                current = ''
+            current = f"{current}\n\n{table}" if current else table
+            continue
+        if current:
+            chunks.append(current)
+            current = ''
+        header_len = 2 if len(lines) > 1 and _SEPARATOR_ROW.match(lines[1]) else 1
+        header = '\n'.join(lines[:header_len])
+        rows = []
+        size = len(header)
+        for row in lines[header_len:]:
+            if rows and size + len(row) + 1 > max_chars:
+                chunks.append('\n'.join([header] + rows))
+                rows, size = [], len(header)
+            rows.append(row)
+            size += len(row) + 1
+        chunks.append('\n'.join([header] + rows))
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def iter_chunks(file_path, max_chars=MAX_CHUNK_CHARS):
+    """Yield (text, metadata) chunks of a workbook, one document at a time"""
+    for doc_number, doc in enumerate(iter_documents(file_path)):
+        metadata = {key: value for key, value in (doc.metadata or {}).items()
+                    if isinstance(value, (str, int, float, bool)) or value is None}
+        for chunk_number, text in enumerate(table_chunks(doc.text, max_chars)):
+            yield text, {**metadata, 'document': doc_number, 'chunk': chunk_number}
+
+
+class ExcelVectorIndex:
+    """
+    On-disk embedding index with one segment per workbook.
+
+    index.json maps each workbook to its hash and segment; it is rewritten
+    atomically after every workbook, so an interrupted build keeps what it
+    finished. Segments are loaded lazily on the first query.
+    """
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR, embed_model=None, model_name=DEFAULT_MODEL):
+        self.index_dir = index_dir
+        self.model_name = model_name
+        self._embed_model = embed_model
+        self._matrix = None
+        self._nodes = None
+        os.makedirs(os.path.join(index_dir, 'segments'), exist_ok=True)
+        self.meta_path = os.path.join(index_dir, 'index.json')
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta['model'] != model_name:
+                raise ValueError(f"Index at {index_dir} was built with {meta['model']}, not {model_name}")
+            self.files = meta['files']
+        else:
+            self.files = {}
+
+    @property
+    def embed_model(self):
+        if self._embed_model is None:
+            self._embed_model = load_embed_model(self.model_name)
+        return self._embed_model
+
+    def _save_meta(self):
+        tmp_path = self.meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'model': self.model_name, 'files': self.files}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.meta_path)
+
+    def _segment_path(self, segment, suffix):
+        return os.path.join(self.index_dir, 'segments', segment + suffix)
+
+    def _embed(self, texts):
+        vectors = np.asarray(self.embed_model.get_text_embedding_batch(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def add_file(self, file_path, key=None, sha256=None, max_chars=MAX_CHUNK_CHARS):
+        """
+        (Re-)index one workbook under key (default: its path) and return the
+        chunk count. Chunks are embedded EMBED_BATCH_SIZE at a time as the
+        reader produces them; a failure leaves no temporary segment files.
+        """
+        key = key or file_path
+        stat = os.stat(file_path)
+        sha256 = sha256 or file_sha256(file_path)
+        segment = hashlib.sha256(key.encode('utf-8')).hexdigest()[:24]
+        batch_size = getattr(self.embed_model, 'embed_batch_size', EMBED_BATCH_SIZE)
+        vectors, batch = [], []
+        nodes_tmp = self._segment_path(segment, '.jsonl.tmp')
+        vectors_tmp = self._segment_path(segment, '.npy.tmp')
+        try:
+            with open(nodes_tmp, 'w', encoding='utf-8') as f:
+                for text, metadata in iter_chunks(file_path, max_chars):
+                    f.write(json.dumps({'text': text, 'metadata': {**metadata, 'source': key}}) + '\n')
+                    batch.append(text)
+                    if len(batch) >= batch_size:
+                        vectors.append(self._embed(batch))
+                        batch = []
+                if batch:
+                    vectors.append(self._embed(batch))
+            matrix = np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+            with open(vectors_tmp, 'wb') as f:
+                np.save(f, matrix)
+            os.replace(vectors_tmp, self._segment_path(segment, '.npy'))
+            os.replace(nodes_tmp, self._segment_path(segment, '.jsonl'))
+        except BaseException:
+            # Don't leave partial segments behind when reading or embedding fails
+            for tmp_path in (nodes_tmp, vectors_tmp):
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            raise
+        self.files[key] = {'sha256': sha256, 'segment': segment, 'chunks': len(matrix),
+                           'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        self._save_meta()
+        self._matrix = None
+        return len(matrix)
+
+    def remove_file(self, key):
+        entry = self.files.pop(key, None)
+        if entry is None:
+            return
+        for suffix in ('.npy', '.jsonl'):
+            path = self._segment_path(entry['segment'], suffix)
+            if os.path.exists(path):
+                os.remove(path)
+        self._save_meta()
+        self._matrix = None
+
+    def update_directory(self, input_dir, force=False):
+        """
+        Index new and changed workbooks under input_dir and drop deleted ones.
+        Workbooks whose size and mtime match their entry are not hashed.
+        """
+        summary = {'indexed': 0, 'skipped': 0, 'removed': 0, 'chunks': 0, 'failed': {}}
+        workbooks = find_workbooks(input_dir)
+        for key in set(self.files) - set(workbooks):
+            self.remove_file(key)
+            summary['removed'] += 1
+        for relative in workbooks:
+            path = os.path.join(input_dir, relative)
+            entry = None if force else self.files.get(relative)
+            segment_path = self._segment_path(entry['segment'], '.npy') if entry else ''
+            changed, fields, sha256 = workbook_changed(path, entry, segment_path)
+            if not changed:
+                if any(entry.get(name) != value for name, value in fields.items()):
+                    # Touched but identical: record the new size and mtime so the next run skips hashing
+                    self.files[relative] = {**entry, **fields}
+                    self._save_meta()
+                summary['skipped'] += 1
+                continue
+            try:
+                summary['chunks'] += self.add_file(path, relative, sha256)
+            except Exception as e:
+                summary['failed'][relative] = f"{type(e).__name__}: {e}"
+                print(f"Failed to index {relative}: {e}")
+                continue
+            summary['indexed'] += 1
+            print(f"Indexed {relative}: {self.files[relative]['chunks']} chunks")
+        return summary
+
+    def _load(self):
+        matrices, nodes = [], []
+        for key in sorted(self.files):
+            segment = self.files[key]['segment']
+            matrix = np.load(self._segment_path(segment, '.npy'))
+            if not len(matrix):
+                continue
+            matrices.append(matrix)
+            with open(self._segment_path(segment, '.jsonl'), encoding='utf-8') as f:
+                nodes.extend((f"{segment}:{i}", line) for i, line in enumerate(f))
+        self._matrix = np.concatenate(matrices) if matrices else np.zeros((0, 0), dtype=np.float32)
+        # Node JSON stays unparsed until it is returned by a query
+        self._nodes = nodes
+
+    def query(self, question, top_k=5):
+        """Return the top_k chunks for question as NodeWithScore, by cosine similarity"""
+        if self._matrix is None:
+            self._load()
+        if not len(self._matrix):
+            return []
+        vector = np.asarray(self.embed_model.get_query_embedding(question), dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1
+        scores = self._matrix @ vector
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        results = []
+        for i in best:
+            node_id, line = self._nodes[i]
+            node = json.loads(line)
+            results.append(NodeWithScore(node=TextNode(id_=node_id, text=node['text'], metadata=node['metadata']),
+                                         score=float(scores[i])))
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query a vector index over Excel workbooks")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="Index new and changed workbooks in a directory")
+    build.add_argument('input_dir')
+    build.add_argument('--force', action='store_true', help="Re-embed unchanged workbooks too")
+    query = subparsers.add_parser('query', help="Retrieve the chunks closest to a question")
+    query.add_argument('question')
+    query.add_argument('-k', '--top-k', type=int, default=5)
+    for sub in (build, query):
+        sub.add_argument('--index-dir', default=DEFAULT_INDEX_DIR)
+        sub.add_argument('--model', default=DEFAULT_MODEL, help="HuggingFace embedding model")
+    args = parser.parse_args(argv)
+
+    index = ExcelVectorIndex(args.index_dir, model_name=args.model)
+    if args.command == 'build':
+        summary = index.update_directory(args.input_dir, args.force)
+        print(f"Indexed {summary['indexed']} workbooks ({summary['chunks']} chunks), skipped {summary['skipped']} "
+              f"unchanged, removed {summary['removed']}, {len(summary['failed'])} failed")
+    else:
+        for result in index.query(args.question, args.top_k):
+            print(f"[{result.score:.3f}] {result.node.metadata.get('source')} #{result.node.metadata.get('chunk')}")
+            print(result.node.text)
+            print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Streaming Excel reader for LlamaIndex.
+
+Opens workbooks with openpyxl in read-only mode, so rows are parsed from
+the sheet XML one at a time instead of the whole workbook being loaded.
+Every sheet, and every workbook-level named range, becomes Markdown table
+documents of at most rows_per_document rows; a longer sheet is split into
+several documents that each repeat its header row. A named range usually
+covers values without their labels, so its tables are headed by the
+column letters instead. Each document carries
+the cell range it covers (e.g. "B3:H1002") in its metadata, so peak memory
+depends on rows_per_document, not on the workbook size.
+
+Usage:
+    reader = ExcelStreamReader(rows_per_document=500)
+    for doc in reader.lazy_load_data("BASF_Case_Study_Modul1.xlsx"):
+        print(doc.metadata["sheet"], doc.metadata["range"])
+"""
+
+import datetime
+import os
+
+from llama_index.core import Document
+from llama_index.core.readers.base import BaseReader
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter, range_boundaries
+
+STREAMABLE_EXTENSIONS = ('.xlsx', '.xlsm')
+ROWS_PER_DOCUMENT = 1000
+
+
+def format_cell(value):
+    """Cell value as Markdown table text"""
+    if value is None:
+        return ''
+    if type(value) is str:
+        text = value
+    elif isinstance(value, float):
+        text = format(value, '.15g')
+    elif isinstance(value, datetime.datetime) and value.time() == datetime.time():
+        # Excel stores dates as datetimes at midnight
+        text = value.date().isoformat()
+    elif isinstance(value, (datetime.date, datetime.time)):
+        text = value.isoformat()
+    else:
+        text = str(value)
+    return text.replace('|', '\\|').replace('\r', '').replace('\n', '<br>')
+
+
+def _markdown_row(cells, width):
+    return '| ' + ' | '.join(cells + [''] * (width - len(cells))) + ' |'
+
+
+def table_blocks(rows, first_row=1, first_col=1, rows_per_document=ROWS_PER_DOCUMENT, header_row=True):
+    """
+    Turn rows of cell values into Markdown tables of at most
+    rows_per_document rows; yields (table, cell range, first row, last row).
+
+    Empty rows and the empty columns around the data are dropped. With
+    header_row, the first non-empty row is the header: it is repeated at the
+    top of every table, but only the first table's range includes it.
+    Otherwise every row is data and the tables are headed by column letters.
+    """
+    header = None
+    block = []
+    first = True
+    for row_number, values in enumerate(rows, start=first_row):
+        cells = [format_cell(value) for value in values]
+        while cells and not cells[-1]:
+            cells.pop()
+        if not cells:
+            continue
+        if header_row and header is None:
+            header = (row_number, cells)
+        else:
+            block.append((row_number, cells))
+        if len(block) >= rows_per_document:
+            yield _table(header, block, first, first_col)
+            block = []
+            first = False
+    if block or (header is not None and first):
+        yield _table(header, block, first, first_col)
+
+
+def _table(header, block, first, first_col):
+    rows = ([header] if header is not None else []) + block
+    lead = min(next(i for i, cell in enumerate(cells) if cell) for _, cells in rows)
+    width = max(len(cells) for _, cells in rows) - lead
+    if header is not None:
+        header_cells = header[1][lead:]
+    else:
+        header_cells = [get_column_letter(first_col + lead + i) for i in range(width)]
+    lines = [_markdown_row(header_cells, width), '| ' + ' | '.join(['---'] * width) + ' |']
+    lines.extend(_markdown_row(cells[lead:], width) for _, cells in block)
+    start = header[0] if first and header is not None else block[0][0]
+    end = rows[-1][0]
+    cell_range = f"{get_column_letter(first_col + lead)}{start}:{get_column_letter(first_col + lead + width - 1)}{end}"
+    return '\n'.join(lines), cell_range, start, end
+
+
+class ExcelStreamReader(BaseReader):
+    """
+    LlamaIndex reader yielding Markdown table documents per sheet and per
+    named range of an .xlsx/.xlsm workbook.
+
+    Cached formula results are read (data_only), as the workbook was last
+    saved by Excel. Metadata: file_path, file_name, sheet, range, first_row,
+    last_row and, for named ranges, named_range.
+    """
+
+    def __init__(self, rows_per_document=ROWS_PER_DOCUMENT, include_named_ranges=True):
+        super().__init__()
+        self.rows_per_document = rows_per_document
+        self.include_named_ranges = include_named_ranges
+
+    def lazy_load_data(self, file, extra_info=None, **kwargs):
+        file_path = str(file)
+        base = {'file_path': file_path, 'file_name': os.path.basename(file_path), **(extra_info or {})}
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                yield from self._documents(sheet.iter_rows(values_only=True), 1, 1, {**base, 'sheet': sheet.title})
+            if self.include_named_ranges:
+                for name, sheet_title, coordinates in _named_ranges(workbook):
+                    min_col, min_row, max_col, max_row = range_boundaries(coordinates.replace('$', ''))
+                    rows = workbook[sheet_title].iter_rows(min_row=min_row, max_row=max_row, min_col=min_col,
+                                                           max_col=max_col, values_only=True)
+                    yield from self._documents(rows, min_row or 1, min_col or 1,
+                                               {**base, 'sheet': sheet_title, 'named_range': name},
+                                               header_row=False)
+        finally:
+            workbook.close()
+
+    def _documents(self, rows, first_row, first_col, metadata, header_row=True):
+        for table, cell_range, start, end in table_blocks(rows, first_row, first_col, self.rows_per_document,
+                                                          header_row):
+            yield Document(text=table, metadata={**metadata, 'range': cell_range, 'first_row': start, 'last_row': end})
+
+
+def _named_ranges(workbook):
+    """(name, sheet title, coordinates) of the workbook-level names that refer to cell ranges"""
+    for name, defined_name in workbook.defined_names.items():
+        if defined_name.type != 'RANGE':
+            continue
+        try:
+            destinations = list(defined_name.destinations)
+        except Exception:
+            continue
+        for sheet_title, coordinates in destinations:
+            if sheet_title in workbook.sheetnames:
+                yield name, sheet_title, coordinates
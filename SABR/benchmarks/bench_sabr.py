@@ -0,0 +1,216 @@
+"""
+Benchmarks for the SABR pipeline.
+
+Times vol evaluation, implied vol inversion, single-expiry fits and
+full-surface fits across chain sizes on synthetic chains, the surface fit
+on recorded SPY fixtures when present, warm-started against cold refits
+over an intraday tick stream, history backfill and constant-maturity
+queries, and pricing books off the smile grid cache against exact Hagan
+prices. Throughput and parameter recovery errors are attached to each
+result's extra_info, so --benchmark-compare / --benchmark-compare-fail can
+gate regressions. Under --benchmark-disable every benchmark runs once as a
+smoke test and throughput is not recorded.
+
+Usage:
+    cd SABR && pytest benchmarks --benchmark-autosave
+    cd SABR && pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:10%
+    cd SABR && pytest benchmarks --benchmark-disable
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from pysabr import Hagan2002LognormalSABR
+
+import sabr_fit
+import sabr_vol
+from chain_store import ChainStore
+from implied_vol import black_price, implied_vol
+from sabr_history import SABRHistory, backfill
+from sabr_incremental import IncrementalSABRCalibrator
+from sabr_smile_cache import SmileGrid
+from sabr_surface import calibrate_surface
+from synthetic import NOW, TRUE_PARAMS, synthetic_chain, synthetic_smile, synthetic_ticks
+
+P = TRUE_PARAMS
+
+
+def _recovery_error(alpha, rho, volvol):
+    """Largest absolute error of fitted (alpha, rho, volvol) against TRUE_PARAMS."""
+    return float(max(abs(alpha - P["alpha"]), abs(rho - P["rho"]), abs(volvol - P["volvol"])))
+
+
+def _throughput(benchmark, key, n):
+    """Record items per second at the mean benchmark time; skipped under --benchmark-disable."""
+    if benchmark.stats is not None:
+        benchmark.extra_info[key] = n / benchmark.stats.stats.mean
+
+
+@pytest.mark.parametrize("n_expiries,n_strikes", [(1, 100), (40, 250), (40, 2500)])
+def bench_vol_evaluation(benchmark, n_expiries, n_strikes):
+    strikes = np.linspace(400, 600, n_strikes)[None, :]
+    t = np.arange(1, n_expiries + 1)[:, None] / 52
+    vols = benchmark(sabr_vol.lognormal_vol, strikes, 500.0, t, P["alpha"], P["beta"], P["rho"], P["volvol"])
+    assert vols.shape == (n_expiries, n_strikes)
+    _throughput(benchmark, "points_per_sec", vols.size)
+
+
+@pytest.mark.parametrize("n", [100, 10_000, 100_000])
+def bench_implied_vol(benchmark, n):
+    rng = np.random.default_rng(0)
+    k = rng.uniform(400, 600, n)
+    t = rng.uniform(1 / 365, 1, n)
+    vols = rng.uniform(0.05, 1.0, n)
+    prices = black_price(k, 500.0, t, vols, "call")
+    result = benchmark(implied_vol, prices, k, 500.0, t, "call")
+    _throughput(benchmark, "options_per_sec", n)
+    benchmark.extra_info["max_abs_error"] = float(np.nanmax(np.abs(result - vols)))
+
+
+@pytest.mark.parametrize("method", ["pysabr", "least_squares"])
+@pytest.mark.parametrize("noise", [0.0, 0.01])
+def bench_single_expiry_fit(benchmark, method, noise):
+    f, t = 500.0, 4 / 365
+    strikes, vols = synthetic_smile(n_strikes=100, f=f, t=t, noise=noise)
+    if method == "pysabr":
+        fit = lambda: Hagan2002LognormalSABR(f=f, t=t, beta=P["beta"]).fit(strikes, vols)
+    else:
+        fit = lambda: sabr_fit.fit(strikes, vols, f, t, P["beta"])[0]
+    alpha, rho, volvol = benchmark(fit)
+    benchmark.extra_info["recovery_error"] = _recovery_error(alpha, rho, volvol)
+
+
+@pytest.mark.parametrize("max_workers", [1, None])
+@pytest.mark.parametrize("n_expiries", [5, 40])
+def bench_surface_fit(benchmark, n_expiries, max_workers):
+    df_options, _ = synthetic_chain(n_expiries=n_expiries, n_strikes=100)
+    surface = benchmark.pedantic(
+        calibrate_surface, args=(df_options,),
+        kwargs={"beta": P["beta"], "max_workers": max_workers, "now": NOW, "method": "least_squares"},
+        rounds=3,
+    )
+    assert len(surface) == n_expiries
+    _throughput(benchmark, "expiries_per_sec", n_expiries)
+    benchmark.extra_info["recovery_error"] = max(
+        _recovery_error(row.alpha, row.rho, row.volvol) for row in surface.itertuples()
+    )
+    benchmark.extra_info["max_rmse"] = float(surface["rmse"].max())
+
+
+@pytest.mark.parametrize("method", ["pysabr", "least_squares"])
+def bench_fixture_surface_fit(benchmark, fixture_store, method):
+    snapshot = fixture_store.latest_snapshot("SPY")
+    df_options = fixture_store.read_chain("SPY", snapshot)
+    surface = benchmark.pedantic(
+        calibrate_surface, args=(df_options,),
+        kwargs={"beta": P["beta"], "now": snapshot, "method": method},
+        rounds=3,
+    )
+    benchmark.extra_info["expiries"] = len(surface)
+    _throughput(benchmark, "expiries_per_sec", len(surface))
+    benchmark.extra_info["median_rmse"] = float(surface["rmse"].median())
+
+
+@pytest.fixture(scope="module")
+def tick_stream():
+    """20 chain snapshots of 10 expiries, 5 seconds apart."""
+    return synthetic_ticks(n_ticks=20, n_expiries=10, n_strikes=100)
+
+
+@pytest.mark.parametrize("mode", ["incremental", "cold"])
+def bench_tick_replay(benchmark, tick_stream, mode):
+    """Replay the tick stream through one IncrementalSABRCalibrator, or refit every tick from the cold start."""
+    snapshots, truth = tick_stream
+
+    def replay(calibrator):
+        for now, df_options in snapshots:
+            if mode == "cold":
+                calibrator.reset()
+            surface = calibrator.update_surface(df_options, now=now)
+        return calibrator, surface
+
+    calibrator, surface = benchmark.pedantic(
+        replay, setup=lambda: ((IncrementalSABRCalibrator(beta=P["beta"]),), {}), rounds=3
+    )
+    stats = calibrator.stats
+    last = truth.iloc[-1]
+    _throughput(benchmark, "ticks_per_sec", len(snapshots))
+    benchmark.extra_info["fits"] = stats["fits"]
+    benchmark.extra_info["skipped"] = stats["skipped"]
+    benchmark.extra_info["nit_per_fit"] = stats["nit"] / max(stats["fits"], 1)
+    # Time spent fitting or checking slices, without building them from the chain
+    benchmark.extra_info["calibration_sec_per_tick"] = stats["elapsed"] / len(snapshots)
+    benchmark.extra_info["recovery_error"] = float(max(
+        np.abs(surface[name] - last[name]).max() for name in ("alpha", "rho", "volvol")
+    ))
+
+
+@pytest.fixture(scope="module")
+def snapshot_store(tmp_path_factory):
+    """ChainStore with 20 daily synthetic snapshots of 10 expiries each."""
+    store = ChainStore(tmp_path_factory.mktemp("store"))
+    for i, day in enumerate(pd.bdate_range(NOW.normalize(), periods=20)):
+        now = day + pd.Timedelta(hours=15)
+        df_options, _ = synthetic_chain(n_expiries=10, n_strikes=100, f=500.0 + i, now=now, seed=i)
+        store.write_chain("SPY", df_options, now)
+    return store
+
+
+@pytest.mark.parametrize("max_workers", [1, None])
+def bench_backfill(benchmark, snapshot_store, tmp_path, max_workers):
+    roots = iter(range(1000))
+
+    def setup():
+        return (snapshot_store, SABRHistory(tmp_path / str(next(roots))), "SPY"), {"max_workers": max_workers}
+
+    params = benchmark.pedantic(backfill, setup=setup, rounds=3)
+    assert len(params) == 200
+    _throughput(benchmark, "fits_per_sec", len(params))
+    benchmark.extra_info["recovery_error"] = max(
+        _recovery_error(row.alpha, row.rho, row.volvol) for row in params.itertuples()
+    )
+
+
+def bench_constant_maturity(benchmark, tmp_path):
+    """Ten years of daily history with 20 expiries per day, interpolated to four tenors."""
+    days = pd.bdate_range("2015-01-01", periods=2520)
+    tenors = np.arange(1, 21) * 7 / 365
+    n = len(days) * len(tenors)
+    history = SABRHistory(tmp_path)
+    history.append("SPY", pd.DataFrame({
+        "snapshot_time": np.repeat(days.to_numpy(), len(tenors)),
+        "snapshot": "",
+        "expiry": np.repeat(days.to_numpy(), len(tenors)),
+        "tenor": np.tile(tenors, len(days)),
+        "f": 500.0, "alpha": P["alpha"], "beta": P["beta"], "rho": P["rho"], "volvol": P["volvol"], "rmse": 0.0,
+    }))
+    history.query("SPY")
+    cm = benchmark(history.constant_maturity, "SPY", [7 / 365, 30 / 365, 60 / 365, 90 / 365])
+    assert len(cm) == 4 * len(days)
+    benchmark.extra_info["rows"] = n
+
+
+@pytest.mark.parametrize("tenors", ["fitted", "interpolated"])
+def bench_smile_grid_price(benchmark, tenors):
+    """Price a 100k-option book off the smile grid, on fitted expiries or at arbitrary tenors."""
+    df_options, _ = synthetic_chain(n_expiries=20, n_strikes=100)
+    surface = calibrate_surface(df_options, beta=P["beta"], max_workers=1, now=NOW, method="least_squares")
+    grid = SmileGrid(surface, P["beta"])
+    rng = np.random.default_rng(0)
+    n = 100_000
+    if tenors == "fitted":
+        t = surface["t"].to_numpy()[rng.integers(0, len(surface), n)]
+    else:
+        t = rng.uniform(surface["t"].min(), surface["t"].max(), n)
+    f = grid.forward(t)
+    k = f * np.exp(rng.uniform(-0.3, 0.3, n))
+    cp = np.where(rng.random(n) < 0.5, "call", "put")
+    prices = benchmark(grid.price, k, t, cp)
+    # Exact Hagan SABR prices with the parameters of the nearest fitted expiry
+    row = surface.iloc[np.abs(surface["t"].to_numpy()[:, None] - t).argmin(axis=0)]
+    vols = sabr_vol.lognormal_vol(k, f, t, row["alpha"].to_numpy(), P["beta"], row["rho"].to_numpy(),
+                                  row["volvol"].to_numpy())
+    exact = black_price(k, f, t, vols, cp)
+    _throughput(benchmark, "options_per_sec", n)
+    benchmark.extra_info["max_abs_error"] = float(np.max(np.abs(prices - exact)))
+    benchmark.extra_info["max_rel_error"] = float(np.max(np.abs(prices - exact) / np.maximum(exact, 1e-2)))
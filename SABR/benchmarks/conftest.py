@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# The SABR modules are flat scripts next to py_sabr.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+@pytest.fixture(scope="session")
+def fixture_store():
+    """ChainStore over the recorded chain fixtures; skips when none are recorded."""
+    from chain_store import ChainStore
+
+    store = ChainStore(FIXTURES_DIR)
+    if not store.snapshots("SPY"):
+        pytest.skip("No recorded SPY chain fixture, run benchmarks/record_fixture.py first")
+    return store
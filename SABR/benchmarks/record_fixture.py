@@ -0,0 +1,46 @@
+"""
+Record a frozen option chain fixture for the benchmarks.
+
+Fetches the chain and price history once through OpenBB and writes them to
+benchmarks/fixtures with chain_store.ChainStore, where bench_sabr.py picks
+them up (the newest snapshot wins). With --synthetic, writes a small noisy
+chain generated from synthetic.py instead, without network access; the
+committed fixture is one of these.
+
+Usage:
+    python benchmarks/record_fixture.py SPY
+    python benchmarks/record_fixture.py SPY --synthetic
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chain_store import ChainStore
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record an option chain fixture for the benchmarks")
+    parser.add_argument("symbol", nargs="?", default="SPY")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="Write a noisy synthetic chain instead of fetching one through OpenBB")
+    args = parser.parse_args()
+    store = ChainStore(FIXTURES_DIR)
+    if args.synthetic:
+        from synthetic import NOW, synthetic_chain
+
+        df_options, _ = synthetic_chain(n_expiries=8, n_strikes=60, noise=0.01, now=NOW)
+        snapshot = store.write_chain(args.symbol, df_options, NOW)
+    else:
+        from openbb import obb
+
+        snapshot = store.write_chain(
+            args.symbol, obb.derivatives.options.chains(symbol=args.symbol, provider="yfinance").to_df()
+        )
+        store.write_history(
+            args.symbol, obb.equity.price.historical(symbol=args.symbol, provider="yfinance").to_df(), snapshot
+        )
+    print(f"Recorded {args.symbol} chain snapshot {snapshot} to {FIXTURES_DIR}")
@@ -0,0 +1,84 @@
+"""
+Synthetic option chains generated from known SABR parameters.
+
+Builds DataFrames shaped like obb.derivatives.options.chains(...).to_df()
+(expiration, strike, option_type, bid, ask, implied_volatility,
+underlying_price) whose mids are Black-76 prices of the SABR smile, so
+benchmarks can check parameter recovery as well as speed.
+"""
+
+import numpy as np
+import pandas as pd
+
+import sabr_vol
+from implied_vol import black_price
+
+NOW = pd.Timestamp("2025-01-24 10:00")
+TRUE_PARAMS = {"alpha": 2.0, "beta": 0.5, "rho": -0.4, "volvol": 1.5}
+
+
+def synthetic_chain(n_expiries=10, n_strikes=100, f=500.0, params=TRUE_PARAMS, spread=0.01,
+                    noise=0.0, now=NOW, seed=0):
+    """
+    Return (df_options, truth) for a chain with n_expiries weekly expiries.
+
+    Strikes span +/- 20% around f. spread is the relative bid-ask width
+    around the model price and noise the relative Gaussian noise on the
+    quoted implied vols. truth holds the generating parameters per expiry.
+    """
+    rng = np.random.default_rng(seed)
+    frames, truth = [], []
+    strikes = np.linspace(f * 0.8, f * 1.2, n_strikes)
+    for i in range(n_expiries):
+        expiration = now.normalize() + pd.Timedelta(days=7 * (i + 1))
+        t = (expiration - now) / pd.Timedelta(days=365)
+        vols = sabr_vol.lognormal_vol(
+            strikes, f, t, params["alpha"], params["beta"], params["rho"], params["volvol"]
+        )
+        truth.append({"expiry": expiration, "t": t, "f": f, **params})
+        for option_type in ("call", "put"):
+            price = black_price(strikes, f, t, vols, option_type)
+            frames.append(pd.DataFrame({
+                "expiration": expiration,
+                "strike": strikes,
+                "option_type": option_type,
+                "bid": price * (1 - spread / 2),
+                "ask": price * (1 + spread / 2),
+                "implied_volatility": vols * (1 + noise * rng.standard_normal(n_strikes)),
+                "underlying_price": f,
+            }))
+    return pd.concat(frames, ignore_index=True), pd.DataFrame(truth)
+
+
+def synthetic_smile(n_strikes=100, f=500.0, t=4 / 365, params=TRUE_PARAMS, noise=0.0, seed=0):
+    """Return (strikes, vols in percent) for a single SABR smile."""
+    rng = np.random.default_rng(seed)
+    strikes = np.linspace(f * 0.8, f * 1.2, n_strikes)
+    vols = sabr_vol.lognormal_vol(
+        strikes, f, t, params["alpha"], params["beta"], params["rho"], params["volvol"]
+    ) * 100
+    return strikes, vols * (1 + noise * rng.standard_normal(n_strikes))
+
+
+def synthetic_ticks(n_ticks=50, n_expiries=10, n_strikes=100, f=500.0, params=TRUE_PARAMS, f_move=0.0005,
+                    param_move=0.002, interval=pd.Timedelta(seconds=5), seed=0):
+    """
+    Return (snapshots, truth) for an intraday tick stream of chains;
+    snapshots is a list of (timestamp, df_options).
+
+    Between ticks the forward takes a Gaussian step of f_move (relative)
+    and alpha, rho and volvol drift by param_move (relative), like quotes
+    refreshed every interval. truth holds the generating parameters per tick.
+    """
+    rng = np.random.default_rng(seed)
+    snapshots, truth = [], []
+    params = dict(params)
+    for i in range(n_ticks):
+        now = NOW + i * interval
+        df_options, _ = synthetic_chain(n_expiries, n_strikes, f, params, now=now, seed=seed + i)
+        snapshots.append((now, df_options))
+        truth.append({"f": f, **params})
+        f *= 1 + f_move * rng.standard_normal()
+        for name in ("alpha", "rho", "volvol"):
+            params[name] *= 1 + param_move * rng.standard_normal()
+    return snapshots, pd.DataFrame(truth)
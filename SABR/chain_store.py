@@ -0,0 +1,218 @@
+"""
+On-disk columnar cache for OpenBB option chains and price history.
+
+Snapshots are written as uncompressed Arrow IPC files, one per expiry, under
+
+    <root>/chains/<SYMBOL>/<snapshot time>/<expiry time>.arrow
+    <root>/history/<SYMBOL>/<snapshot time>.arrow
+
+and read back memory-mapped into DataFrames whose numeric columns are
+views of the map, so loading a stored chain costs little more than the
+pages that are actually touched. Snapshot keys carry microseconds and
+expiry files their time of day, so neither collides within a day. StoreOBB mimics the two OpenBB
+calls used by py_sabr.py and serves them from the store: live data is only
+fetched when the newest snapshot is older than the TTL, and with no live
+client at all the pipeline runs fully offline from local snapshots.
+
+Usage:
+    from openbb import obb as live_obb
+    obb = StoreOBB(ChainStore("~/.sabr_store", ttl=timedelta(minutes=5)), live=live_obb)
+    df_options = obb.derivatives.options.chains(symbol="SPY", provider="yfinance").to_df()
+
+    # Offline replay of the newest (or a given) snapshot
+    obb = StoreOBB(ChainStore("~/.sabr_store"), snapshot="20250124T153000.000000")
+"""
+
+import os
+import shutil
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+SNAPSHOT_FORMAT = "%Y%m%dT%H%M%S.%f"
+EXPIRY_FORMAT = "%Y-%m-%dT%H%M%S"
+
+
+class ChainStore:
+    """Snapshot store keyed by (symbol, snapshot time, expiry)."""
+
+    def __init__(self, root, ttl=timedelta(minutes=5)):
+        self.root = os.path.expanduser(root)
+        self.ttl = pd.Timedelta(ttl)
+
+    def _chain_dir(self, symbol, snapshot=None):
+        path = os.path.join(self.root, "chains", symbol.upper())
+        return path if snapshot is None else os.path.join(path, snapshot)
+
+    def _history_dir(self, symbol):
+        return os.path.join(self.root, "history", symbol.upper())
+
+    def write_chain(self, symbol, df_options, snapshot_time=None):
+        """
+        Store a chain DataFrame as one Arrow file per expiry.
+
+        The snapshot directory is written under a temporary name and renamed
+        into place, so readers never see a half-written snapshot; a
+        temporary directory left by an interrupted write is cleared first.
+        Returns the snapshot key.
+        """
+        snapshot = _snapshot_key(snapshot_time)
+        final_dir = self._chain_dir(symbol, snapshot)
+        tmp_dir = final_dir + ".tmp"
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+
+        df_options = df_options.assign(expiration=pd.to_datetime(df_options["expiration"]))
+        for expiration, group in df_options.groupby("expiration", sort=True):
+            path = os.path.join(tmp_dir, f"{expiration.strftime(EXPIRY_FORMAT)}.arrow")
+            _write_arrow(group.reset_index(drop=True), path)
+
+        if os.path.exists(final_dir):
+            shutil.rmtree(final_dir)
+        os.replace(tmp_dir, final_dir)
+        return snapshot
+
+    def write_history(self, symbol, df_daily, snapshot_time=None):
+        """Store a price history DataFrame, keeping its index. Returns the snapshot key."""
+        snapshot = _snapshot_key(snapshot_time)
+        os.makedirs(self._history_dir(symbol), exist_ok=True)
+        path = os.path.join(self._history_dir(symbol), f"{snapshot}.arrow")
+        _write_arrow(df_daily, path + ".tmp", preserve_index=True)
+        os.replace(path + ".tmp", path)
+        return snapshot
+
+    def snapshots(self, symbol, kind="chains"):
+        """Return the stored snapshot keys ("chains" or "history") for a symbol, oldest first."""
+        path = self._chain_dir(symbol) if kind == "chains" else self._history_dir(symbol)
+        if not os.path.isdir(path):
+            return []
+        names = (name.removesuffix(".arrow") for name in os.listdir(path) if not name.endswith(".tmp"))
+        return sorted(names)
+
+    def _expiry_files(self, symbol, snapshot):
+        """(expiry, path) of the expiry files in a chain snapshot, oldest first."""
+        path = self._chain_dir(symbol, snapshot)
+        names = sorted(name for name in os.listdir(path) if name.endswith(".arrow"))
+        return [(pd.Timestamp(name.removesuffix(".arrow")), os.path.join(path, name)) for name in names]
+
+    def expiries(self, symbol, snapshot):
+        """Return the expiries stored in a chain snapshot."""
+        return [expiry for expiry, _ in self._expiry_files(symbol, snapshot)]
+
+    def read_chain(self, symbol, snapshot=None, expiries=None):
+        """
+        Read a chain snapshot (the newest one by default) memory-mapped.
+
+        expiries optionally restricts the read to a list of expirations; a
+        date without a time matches every expiry on that day. The other
+        expiry files are never opened.
+        """
+        snapshot = snapshot or self.latest_snapshot(symbol)
+        if snapshot is None:
+            raise FileNotFoundError(f"No stored chain snapshot for {symbol}")
+        wanted = None if expiries is None else {pd.Timestamp(e) for e in expiries}
+        tables = [
+            _read_arrow(path)
+            for expiry, path in self._expiry_files(symbol, snapshot)
+            if wanted is None or expiry in wanted or expiry.normalize() in wanted
+        ]
+        if not tables:
+            raise FileNotFoundError(f"No matching expiries in snapshot {snapshot} for {symbol}")
+        return _to_pandas(pa.concat_tables(tables))
+
+    def read_history(self, symbol, snapshot=None):
+        """Read the newest price history snapshot, at or before snapshot if given."""
+        keys = [key for key in self.snapshots(symbol, "history") if snapshot is None or key <= snapshot]
+        if not keys:
+            raise FileNotFoundError(f"No stored price history for {symbol}")
+        return _to_pandas(_read_arrow(os.path.join(self._history_dir(symbol), f"{keys[-1]}.arrow")))
+
+    def latest_snapshot(self, symbol, kind="chains"):
+        """Return the newest snapshot key for a symbol, or None."""
+        snapshots = self.snapshots(symbol, kind)
+        return snapshots[-1] if snapshots else None
+
+    def is_fresh(self, symbol, kind="chains", now=None):
+        """True when the newest snapshot of a kind is younger than the TTL."""
+        snapshot = self.latest_snapshot(symbol, kind)
+        if snapshot is None:
+            return False
+        now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+        return now - pd.Timestamp(snapshot) < self.ttl
+
+
+class StoreOBB:
+    """
+    Stand-in for the openbb obb object used by py_sabr.py.
+
+    Exposes obb.equity.price.historical and obb.derivatives.options.chains.
+    With a live client, calls are served from the store while it is fresh
+    and otherwise fetched live and written to the store. Without one (or
+    when a snapshot is pinned), everything is read from local snapshots.
+    """
+
+    def __init__(self, store, live=None, snapshot=None):
+        self.store = store
+        self.live = live
+        self.snapshot = snapshot
+        self.equity = SimpleNamespace(price=SimpleNamespace(historical=self._historical))
+        self.derivatives = SimpleNamespace(options=SimpleNamespace(chains=self._chains))
+
+    def _offline(self, symbol, kind):
+        return self.live is None or self.snapshot is not None or self.store.is_fresh(symbol, kind)
+
+    def _chains(self, symbol, provider="yfinance", **kwargs):
+        if self._offline(symbol, "chains"):
+            return StoredResult(self.store.read_chain(symbol, self.snapshot))
+        df_options = self.live.derivatives.options.chains(symbol=symbol, provider=provider, **kwargs).to_df()
+        self.store.write_chain(symbol, df_options)
+        return StoredResult(df_options)
+
+    def _historical(self, symbol, provider="yfinance", **kwargs):
+        if self._offline(symbol, "history"):
+            return StoredResult(self.store.read_history(symbol, self.snapshot))
+        df_daily = self.live.equity.price.historical(symbol=symbol, provider=provider, **kwargs).to_df()
+        self.store.write_history(symbol, df_daily)
+        return StoredResult(df_daily)
+
+
+class StoredResult:
+    """Minimal OBBject stand-in: wraps a DataFrame behind .to_df()."""
+
+    def __init__(self, df):
+        self.df = df
+
+    def to_df(self):
+        return self.df
+
+
+def _snapshot_key(snapshot_time=None):
+    """Format a snapshot time (default now) as a sortable directory name."""
+    snapshot_time = pd.Timestamp.now() if snapshot_time is None else pd.Timestamp(snapshot_time)
+    return snapshot_time.strftime(SNAPSHOT_FORMAT)
+
+
+def _write_arrow(df, path, preserve_index=False):
+    """Write a DataFrame as an uncompressed Arrow IPC file so it can be mmapped."""
+    table = pa.Table.from_pandas(df, preserve_index=preserve_index)
+    with pa.OSFile(path, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _read_arrow(path):
+    """Read an Arrow IPC file through a memory map without copying buffers."""
+    with pa.memory_map(path, "r") as source:
+        return ipc.open_file(source).read_all()
+
+
+def _to_pandas(table):
+    """
+    Convert a table to a DataFrame without consolidating its columns, so
+    single-chunk numeric columns without nulls stay read-only views of the
+    Arrow buffers (of the memory map for a single expiry file).
+    """
+    return table.to_pandas(split_blocks=True)
@@ -0,0 +1,125 @@
+"""
+Compact array-backed option chain.
+
+The chain DataFrame from OpenBB is sorted once by (option type, expiration,
+strike) into contiguous float64 arrays, with the option type stored as
+uint8 category codes and the start of every (type, expiry) block kept in an
+offsets table. Slicing by (type, expiry) is then two integer lookups and a
+basic slice, which NumPy returns as a zero-copy view, instead of a boolean
+filter and copy of the whole DataFrame per step.
+
+Usage:
+    chain = OptionChain.from_df(df_options)
+    calls = chain.slice("call", expiration)
+    calls.strike, calls.mid, calls.iv  # views into the chain's arrays
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+OPTION_TYPES = ("call", "put")
+
+
+class ChainSlice(namedtuple("ChainSlice", ["option_type", "expiration", "strike", "bid", "ask", "mid", "iv"])):
+    """One (type, expiry) block of an OptionChain; the arrays are views."""
+
+    __slots__ = ()
+
+    def to_frame(self):
+        """Materialize the slice as a DataFrame indexed by strike (copies)."""
+        return pd.DataFrame(
+            {"bid": self.bid, "ask": self.ask, "mid": self.mid, "implied_volatility": self.iv},
+            index=pd.Index(self.strike, name="strike"),
+        )
+
+
+class OptionChain:
+    """
+    Option chain held as sorted, contiguous column arrays.
+
+    Columns strike, bid, ask, mid, iv and expiry (days since the epoch) are
+    float64; type_code holds indexes into OPTION_TYPES. Rows of one
+    (type, expiry) block run from offsets[type, e] to offsets[type, e + 1],
+    where e is the expiry's position in expirations.
+    """
+
+    def __init__(self, strike, bid, ask, iv, expiry, type_code, expirations, offsets):
+        self.strike = strike
+        self.bid = bid
+        self.ask = ask
+        self.mid = (bid + ask) / 2
+        self.iv = iv
+        self.expiry = expiry
+        self.type_code = type_code
+        self.expirations = expirations
+        self.offsets = offsets
+        self._expiry_index = {expiration: i for i, expiration in enumerate(expirations)}
+
+    @classmethod
+    def from_df(cls, df_options):
+        """Build a chain from an OpenBB chains DataFrame with a single sort."""
+        expiration = pd.to_datetime(df_options["expiration"]).to_numpy("datetime64[ns]")
+        type_code = pd.Categorical(df_options["option_type"], categories=OPTION_TYPES).codes
+        if (type_code < 0).any():
+            raise ValueError(f"option_type must be one of {OPTION_TYPES}")
+        expirations, expiry_code = np.unique(expiration, return_inverse=True)
+        strike = df_options["strike"].to_numpy(np.float64)
+        order = np.lexsort((strike, expiry_code, type_code))
+
+        # Rows are sorted by block = type * n_expiries + expiry, so one
+        # searchsorted finds where every block starts
+        n_types, n_expiries = len(OPTION_TYPES), len(expirations)
+        block = type_code[order].astype(np.int64) * n_expiries + expiry_code[order]
+        starts = np.searchsorted(block, np.arange(n_types * n_expiries + 1))
+        offsets = np.empty((n_types, n_expiries + 1), dtype=np.int64)
+        offsets[:, :-1] = starts[:-1].reshape(n_types, n_expiries)
+        offsets[:, -1] = starts[n_expiries::n_expiries]
+
+        def column(values):
+            return np.ascontiguousarray(values[order])
+
+        return cls(
+            strike=column(strike),
+            bid=column(df_options["bid"].to_numpy(np.float64)),
+            ask=column(df_options["ask"].to_numpy(np.float64)),
+            iv=column(df_options["implied_volatility"].to_numpy(np.float64)),
+            expiry=column(expiration.astype(np.int64) / 86_400e9),
+            type_code=column(type_code.astype(np.uint8)),
+            expirations=pd.DatetimeIndex(expirations),
+            offsets=offsets,
+        )
+
+    def __len__(self):
+        return len(self.strike)
+
+    @property
+    def nbytes(self):
+        """Memory held by the column arrays."""
+        arrays = (self.strike, self.bid, self.ask, self.mid, self.iv, self.expiry, self.type_code, self.offsets)
+        return sum(a.nbytes for a in arrays)
+
+    def slice(self, option_type, expiration):
+        """
+        Return the rows of one (type, expiry) block as views, sorted by strike.
+
+        An expiration that isn't in the chain gives an empty slice.
+        """
+        t = OPTION_TYPES.index(option_type)
+        e = self._expiry_index.get(pd.Timestamp(expiration))
+        if e is None:
+            start = stop = 0
+        else:
+            start, stop = self.offsets[t, e], self.offsets[t, e + 1]
+        rows = slice(start, stop)
+        return ChainSlice(
+            option_type, pd.Timestamp(expiration),
+            self.strike[rows], self.bid[rows], self.ask[rows], self.mid[rows], self.iv[rows],
+        )
+
+    def iter_slices(self, option_type):
+        """Yield the slice of every expiry for one option type, in expiry order."""
+        for expiration in self.expirations:
+            yield self.slice(option_type, expiration)
+
@@ -4,6 +4,9 @@
 # In[12]:
 
 
+import os
+from datetime import timedelta
+
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -12,196 +15,233 @@ from pysabr import Hagan2002LognormalSABR
 from pysabr import hagan_2002_lognormal_sabr as sabr
 from pysabr.black import lognormal_call
 
-
-# In[13]:
+import sabr_vol
+from chain_store import ChainStore, StoreOBB
+from implied_vol import implied_vol
+from option_chain import OptionChain
+from sabr_forward import parity_forwards
+from sabr_history import SABRHistory, backfill
+from sabr_smile_cache import SmileCache
+from sabr_surface import calibrate_surface
 
 
-from openbb import obb
-import os
+# The notebook cells run in main(): calibrate_surface and backfill start process pools, and
+# spawned workers re-import this module, so nothing may fetch, fit or plot at import time
+def main():
+    # In[13]:
 
+    # Serve OpenBB calls from the local snapshot store; set SABR_OFFLINE=1 to replay without network access
+    store = ChainStore(os.getenv("SABR_STORE", "~/.sabr_store"))
+    if os.getenv("SABR_OFFLINE"):
+        obb = StoreOBB(store)
+    else:
+        # openbb is slow to import and only needed for live fetches
+        from openbb import obb as live_obb
+        obb = StoreOBB(store, live=live_obb)
 
-# In[14]:
 
+    # In[14]:
 
-df_daily = obb.equity.price.historical(symbol = "spy", provider="yfinance")
-df_daily.to_df().head(1)
+    df_daily = obb.equity.price.historical(symbol = "spy", provider="yfinance")
+    df_daily.to_df().head(1)
 
 
-# In[25]:
+    # In[25]:
 
+    # Define variables
+    symbol = "SPY"
 
-from openbb import obb
+    # Fetch options chain
+    df_options = obb.derivatives.options.chains(symbol=symbol, provider="yfinance")
 
-# Define variables
-symbol = "SPY"
+    # Convert to DataFrame and print the first row
+    print(df_options.to_df().head(1))
 
-# Fetch options chain
-df_options = obb.derivatives.options.chains(symbol=symbol, provider="yfinance")
 
-# Convert to DataFrame and print the first row
-print(df_options.to_df().head(1))
+    # In[26]:
 
+    # Convert OBBject to a DataFrame
+    df_options = df_options.to_df()  # Ensure this conversion is done before accessing columns
 
-# In[26]:
+    # Adjust expiration to tomorrow for testing
+    expiration = pd.Timestamp.today() + timedelta(days=4)
+    expiration = expiration.normalize()  # Optional: Ensure it's at midnight
 
+    # Ensure expiration column is in datetime format
+    df_options["expiration"] = pd.to_datetime(df_options["expiration"])
+    expiration = pd.to_datetime(expiration)
 
-import pandas as pd
-from datetime import timedelta
+    # Sort the chain once into contiguous arrays; every (type, expiry) slice below is a view
+    chain = OptionChain.from_df(df_options)
+    print("Option chain:", len(chain), "rows,", len(chain.expirations), "expiries,", chain.nbytes, "bytes")
 
-# Convert OBBject to a DataFrame
-df_options = df_options.to_df()  # Ensure this conversion is done before accessing columns
+    # Calls for the expiration, indexed by strike with a mid column
+    jan_today_c = chain.slice("call", expiration).to_frame()
+    print("Filtered calls for today's expiration:")
+    print(jan_today_c.head())
 
-# Adjust expiration to tomorrow for testing
-expiration = pd.Timestamp.today() + timedelta(days=4)
-expiration = expiration.normalize()  # Optional: Ensure it's at midnight
+    # Puts for the expiration
+    jan_today_p = chain.slice("put", expiration).to_frame()
+    print("Filtered puts for expiration:")
+    print(jan_today_p.head())
 
-# Ensure expiration column is in datetime format
-df_options["expiration"] = pd.to_datetime(df_options["expiration"])
-expiration = pd.to_datetime(expiration)
+    # Extract strikes and volatilities
+    strikes = jan_today_c.index
+    vols = jan_today_c["implied_volatility"] * 100
 
-# Filter calls
-calls = df_options[df_options["option_type"] == "call"]
-print("Filtered calls DataFrame:")
-print(calls.head())
+    # Final output
+    print("Strikes:", strikes)
+    print("Volatilities:", vols)
 
-jan_today_c = calls[calls["expiration"] == expiration]
-print("Filtered calls for today's expiration:")
-print(jan_today_c.head())
 
-jan_today_c = jan_today_c.set_index("strike")
-jan_today_c["mid"] = (jan_today_c["bid"] + jan_today_c["ask"]) / 2
+    # In[27]:
 
-# Filter puts
-puts = df_options[df_options["option_type"] == "put"]
-print("Filtered puts DataFrame:")
-print(puts.head())
+    # Compute parity-implied forwards (and discount/borrow) for all expiries in one pass
+    forwards = parity_forwards(df_options).set_index("expiration")
+    print(forwards)
 
-jan_today_p = puts[puts["expiration"] == expiration]
-print("Filtered puts for expiration:")
-print(jan_today_p.head())
+    # Forward interpolated where call minus put mids cross zero
+    f = forwards.loc[expiration, "forward"]
 
-jan_today_p = jan_today_p.set_index("strike")
-jan_today_p["mid"] = (jan_today_p["bid"] + jan_today_p["ask"]) / 2
+    # Compute time to expiration in years
+    t = (pd.Timestamp(expiration) - pd.Timestamp.now()).days / 365
 
-# Extract strikes and volatilities
-strikes = jan_today_c.index
-vols = jan_today_c["implied_volatility"] * 100
+    # Assign beta (example: 0.5)
+    beta = 0.5
 
-# Final output
-print("Strikes:", strikes)
-print("Volatilities:", vols)
+    # Print the results for validation
+    print("Forward stock price (f):", f)
+    print("Time to expiration (t):", t)
+    print("Beta:", beta)
 
 
-# In[27]:
+    # In[29]:
 
+    # Replace the provider's implied volatilities with Black-76 vols inverted from the call mids
+    discount = forwards.loc[expiration, "discount"]
+    vols = pd.Series(
+        implied_vol(jan_today_c["mid"], strikes, f, t, "call", 1.0 if np.isnan(discount) else discount) * 100,
+        index=strikes,
+    )
 
-import pandas as pd
+    # Filter valid data (Ensure all volatilities and strikes are valid)
+    valid_data = (vols > 0) & (strikes > 0)  # Both volatilities and strikes must be positive
+    strikes = strikes[valid_data]
+    vols = np.maximum(vols[valid_data], 1e-8)  # Avoid very small volatilities
+
+    # Ensure forward price and time to expiration are positive
+    if f <= 0:
+        raise ValueError(f"Forward price (f) must be positive. Got f={f}.")
+    if t <= 0:
+        raise ValueError(f"Time to expiration (t) must be positive. Got t={t}.")
+
+    # Print filtered strikes and volatilities for debugging
+    if len(strikes) == 0 or len(vols) == 0:
+        raise ValueError("No valid strikes or volatilities after filtering.")
+    print("Filtered Strikes:", strikes)
+    print("Filtered Volatilities:", vols)
+
+    # SABR model fitting
+    try:
+        sabr_lognormal = Hagan2002LognormalSABR(
+            f=f,
+            t=t,
+            beta=beta
+        )
+
+        # Debug inputs
+        print("Fitting with parameters:")
+        print(f"Forward price (f): {f}")
+        print(f"Time to expiration (t): {t}")
+        print(f"Beta: {beta}")
+
+        # Fit the model and extract parameters
+        alpha, rho, volvol = sabr_lognormal.fit(strikes, vols)
+
+        # Output fitted parameters
+        print("Fitted SABR Parameters:")
+        print(f"Alpha: {alpha:.6f}")  # Format to six decimal places for readability
+        print(f"Rho: {rho:.6f}")
+        print(f"Volatility of Volatility (VolVol): {volvol:.6f}")
+
+    except Exception as e:
+        print(f"Error fitting the SABR model: {e}")
+
+
+    # In[30]:
+
+    # Generate calibrated volatilities using the SABR model (all strikes in one vectorized call)
+    calibrated_vols = sabr_vol.lognormal_vol(
+        np.asarray(strikes), f, t, alpha, beta, rho, volvol
+    ) * 100  # Convert to percentage
+
+    # Plot the calibrated volatility smile
+    plt.plot(
+        strikes,  # Strike prices
+        calibrated_vols,  # SABR model calibrated volatilities
+        label="Calibrated Volatility Smile"
+    )
 
-# Compute the forward stock price using put-call parity
-f = (
-    (jan_today_c["mid"] - jan_today_p["mid"])  # Calculate call minus put midpoint
-    .dropna()  # Remove NaN values
-    .abs()  # Take absolute values
-    .sort_values()  # Sort by absolute value
-    .index[0]  # Get the strike price that minimizes the absolute difference
-)
+    # Overlay the market volatilities for comparison
+    plt.plot(
+        strikes,  # Strike prices
+        vols,  # Market implied volatilities
+        label="Market Volatilities"
+    )
 
-# Compute time to expiration in years
-t = (pd.Timestamp(expiration) - pd.Timestamp.now()).days / 365
+    # Add labels and title
+    plt.xlabel("Strike")
+    plt.ylabel("Volatility (%)")
+    plt.title("Volatility Smile")
+    plt.legend()
 
-# Assign beta (example: 0.5)
-beta = 0.5
+    # Show the plot
+    plt.show()
 
-# Print the results for validation
-print("Forward stock price (f):", f)
-print("Time to expiration (t):", t)
-print("Beta:", beta)
 
+    #
 
-# In[29]:
 
+    # In[31]:
 
-from pysabr import Hagan2002LognormalSABR
-import numpy as np
+    # Calibrate every expiry of the chain in parallel (one process per core by default)
+    surface = calibrate_surface(df_options, beta=beta, max_workers=os.cpu_count())
+    print(surface)
 
-# Filter valid data (Ensure all volatilities and strikes are valid)
-valid_data = (vols > 0) & (strikes > 0)  # Both volatilities and strikes must be positive
-strikes = strikes[valid_data]
-vols = np.maximum(vols[valid_data], 1e-8)  # Avoid very small volatilities
-
-# Ensure forward price and time to expiration are positive
-if f <= 0:
-    raise ValueError(f"Forward price (f) must be positive. Got f={f}.")
-if t <= 0:
-    raise ValueError(f"Time to expiration (t) must be positive. Got t={t}.")
-
-# Print filtered strikes and volatilities for debugging
-if len(strikes) == 0 or len(vols) == 0:
-    raise ValueError("No valid strikes or volatilities after filtering.")
-print("Filtered Strikes:", strikes)
-print("Filtered Volatilities:", vols)
-
-# SABR model fitting
-try:
-    sabr_lognormal = Hagan2002LognormalSABR(
-        f=f,
-        t=t,
-        beta=beta
-    )
 
-    # Debug inputs
-    print("Fitting with parameters:")
-    print(f"Forward price (f): {f}")
-    print(f"Time to expiration (t): {t}")
-    print(f"Beta: {beta}")
+    # In[32]:
 
-    # Fit the model and extract parameters
-    alpha, rho, volvol = sabr_lognormal.fit(strikes, vols)
+    # Refit every stored daily snapshot not yet in the parameter history (in parallel) and append it
+    history = SABRHistory(os.getenv("SABR_STORE", "~/.sabr_store"))
+    params = backfill(store, history, symbol, beta=beta, max_workers=os.cpu_count())
+    print(params.tail())
 
-    # Output fitted parameters
-    print("Fitted SABR Parameters:")
-    print(f"Alpha: {alpha:.6f}")  # Format to six decimal places for readability
-    print(f"Rho: {rho:.6f}")
-    print(f"Volatility of Volatility (VolVol): {volvol:.6f}")
+    # 30-day constant-maturity ATM vol against 21-day realized vol from the daily price history
+    cm = history.constant_maturity(symbol, [30 / 365]).set_index("snapshot_time")
+    closes = df_daily.to_df()["close"]
+    closes.index = pd.to_datetime(closes.index)
+    realized = np.log(closes).diff().rolling(21).std() * np.sqrt(252)
+    vol_history = pd.DataFrame({
+        "atm_vol_30d": cm["atm_vol"].to_numpy(),
+        "realized_vol_21d": realized.reindex(cm.index.normalize()).to_numpy(),
+    }, index=cm.index)
+    print(vol_history.tail())
 
-except Exception as e:
-    print(f"Error fitting the SABR model: {e}")
 
+    # In[33]:
 
-# In[30]:
+    # Precompute SABR vol splines per fitted tenor, in standardized moneyness, for the calibrated surface;
+    # options are priced with Black-76 off these vols, and the grid is rebuilt only when the fitted
+    # parameters change
+    smile_cache = SmileCache()
+    grid = smile_cache.update(symbol, surface, beta)
 
+    # Price every call of the chain off the grid in one vectorized lookup
+    calls = chain.slice("call", expiration)
+    tenor = surface.set_index("expiry").loc[expiration, "t"]
+    grid_prices = grid.price(calls.strike, tenor, "call", 1.0 if np.isnan(discount) else discount)
+    print(pd.DataFrame({"mid": calls.mid, "sabr_price": grid_prices}, index=pd.Index(calls.strike, name="strike")))
 
-import matplotlib.pyplot as plt
-from pysabr import hagan_2002_lognormal_sabr as sabr
 
-# Generate calibrated volatilities using the SABR model
-calibrated_vols = [
-    sabr.lognormal_vol(strike, f, t, alpha, beta, rho, volvol) * 100  # Convert to percentage
-    for strike in strikes
-]
-
-# Plot the calibrated volatility smile
-plt.plot(
-    strikes,  # Strike prices
-    calibrated_vols,  # SABR model calibrated volatilities
-    label="Calibrated Volatility Smile"
-)
-
-# Overlay the market volatilities for comparison
-plt.plot(
-    strikes,  # Strike prices
-    vols,  # Market implied volatilities
-    label="Market Volatilities"
-)
-
-# Add labels and title
-plt.xlabel("Strike")
-plt.ylabel("Volatility (%)")
-plt.title("Volatility Smile")
-plt.legend()
-
-# Show the plot
-plt.show()
-
-
-# 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Native SABR least-squares fitter with an analytic Jacobian.
+
+Fits (alpha, rho, volvol) for a fixed beta to a smile of lognormal vols with
+scipy.optimize.least_squares. Residuals for all strikes are computed in one
+vectorized call and the Jacobian of Hagan's 2002 lognormal expansion is
+computed in closed form, so the optimizer needs no finite differences.
+Residuals can be weighted by Black vega or by the inverse bid-ask spread to
+keep wide, noisy short-dated smiles from being driven by far OTM quotes.
+
+Usage:
+    (alpha, rho, volvol), res = fit(strikes, vols, f, t, beta=0.5,
+                                    weights=vega_weights(strikes, f, t, vols))
+"""
+
+import numpy as np
+from scipy.optimize import least_squares
+from scipy.stats import norm
+
+import sabr_vol
+from sabr_vol import EPS
+
+
+def lognormal_vol_jacobian(k, f, t, alpha, beta, rho, volvol):
+    """
+    Hagan's 2002 lognormal vol and its partial derivatives.
+
+    Returns (vol, d_alpha, d_rho, d_volvol), each with the broadcast shape of
+    the inputs. Strikes and forwards must be positive.
+    """
+    k, f, t, alpha, beta, rho, volvol = np.broadcast_arrays(
+        *(np.asarray(x, dtype=np.float64) for x in (k, f, t, alpha, beta, rho, volvol))
+    )
+    logfk = np.log(f / k)
+    fkbeta = (f * k) ** (1 - beta)
+    d = fkbeta ** 0.5
+    a = (1 - beta) ** 2 * alpha ** 2 / (24 * fkbeta)
+    b = 0.25 * rho * beta * volvol * alpha / d
+    c = (2 - 3 * rho ** 2) * volvol ** 2 / 24
+    v = (1 - beta) ** 2 * logfk ** 2 / 24
+    w = (1 - beta) ** 4 * logfk ** 4 / 1920
+    z = volvol * d * logfk / alpha
+
+    # Parameter-free factor and the time correction term
+    g = 1 / (d * (1 + v + w))
+    p = 1 + (a + b + c) * t
+    dp_dalpha = t * (2 * a + b) / alpha
+    dp_drho = t * (0.25 * beta * volvol * alpha / d - rho * volvol ** 2 / 4)
+    dp_dvolvol = t * (b / volvol + (2 - 3 * rho ** 2) * volvol / 12)
+
+    # q = z / x(z) and its derivatives, with the series 1 - rho z / 2 near ATM
+    atm = np.abs(z) <= EPS
+    z_ = np.where(atm, 1.0, z)
+    root = np.sqrt(1 - 2 * rho * z_ + z_ ** 2)
+    x = np.log((root + z_ - rho) / (1 - rho))
+    q = np.where(atm, 1.0, z_ / x)
+    dq_dz = np.where(atm, -rho / 2, (x - z_ / root) / x ** 2)
+    dx_drho = (-z_ / root - 1) / (root + z_ - rho) + 1 / (1 - rho)
+    dq_drho = np.where(atm, -z / 2, -z_ / x ** 2 * dx_drho)
+
+    vol = alpha * g * p * q
+    d_alpha = g * (p * q + alpha * q * dp_dalpha - p * dq_dz * z)
+    d_rho = alpha * g * (q * dp_drho + p * dq_drho)
+    d_volvol = alpha * g * (q * dp_dvolvol + p * dq_dz * z / volvol)
+    return vol, d_alpha, d_rho, d_volvol
+
+
+def vega_weights(strikes, f, t, vols):
+    """Black vega of each quote (vols in percent), normalized to sum to 1."""
+    sigma = np.asarray(vols, dtype=np.float64) / 100
+    d1 = (np.log(f / np.asarray(strikes, dtype=np.float64)) + sigma ** 2 * t / 2) / (sigma * t ** 0.5)
+    vega = f * norm.pdf(d1) * t ** 0.5
+    return vega / vega.sum()
+
+
+def spread_weights(bid, ask, min_spread=0.01):
+    """Inverse bid-ask spread of each quote, normalized to sum to 1."""
+    spread = np.maximum(np.asarray(ask, dtype=np.float64) - np.asarray(bid, dtype=np.float64), min_spread)
+    weights = 1 / spread
+    return weights / weights.sum()
+
+
+def initial_guess(strikes, vols, f, beta):
+    """Seed alpha from the ATM vol, rho at 0 and volvol at 0.5."""
+    order = np.argsort(strikes)
+    atm_vol = np.interp(f, np.asarray(strikes)[order], np.asarray(vols)[order]) / 100
+    return np.array([atm_vol * f ** (1 - beta), 0.0, 0.5])
+
+
+def fit(strikes, vols, f, t, beta=0.5, weights=None, x0=None, rho_bounds=(-0.9999, 0.9999)):
+    """
+    Calibrate SABR parameters alpha, rho and volvol.
+
+    Best fit a smile of lognormal vols in percent (as passed to pysabr's
+    fit). Residuals are multiplied by the square root of the optional
+    weights. Returns ((alpha, rho, volvol), scipy OptimizeResult).
+    """
+    strikes = np.asarray(strikes, dtype=np.float64)
+    vols = np.asarray(vols, dtype=np.float64)
+    sqrt_w = np.ones_like(vols) if weights is None else np.sqrt(np.asarray(weights, dtype=np.float64))
+    if x0 is None:
+        x0 = initial_guess(strikes, vols, f, beta)
+
+    def residuals(x):
+        model = sabr_vol.lognormal_vol(strikes, f, t, x[0], beta, x[1], x[2])
+        return sqrt_w * (model * 100 - vols)
+
+    def jacobian(x):
+        _, d_alpha, d_rho, d_volvol = lognormal_vol_jacobian(strikes, f, t, x[0], beta, x[1], x[2])
+        return (sqrt_w * 100)[:, None] * np.column_stack((d_alpha, d_rho, d_volvol))
+
+    lower = [1e-4, rho_bounds[0], 1e-4]
+    upper = [np.inf, rho_bounds[1], np.inf]
+    x0 = np.clip(x0, lower, upper)
+    res = least_squares(residuals, x0, jac=jacobian, bounds=(lower, upper), method="trf", x_scale="jac")
+    return tuple(float(p) for p in res.x), res
+
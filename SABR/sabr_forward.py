@@ -0,0 +1,119 @@
+"""
+Put-call parity forwards for every expiry of an option chain.
+
+For European options C - P = D * (F - K), so call-minus-put mids fall
+linearly in the strike with slope -D and intercept D * F. Per expiry, C - P
+is regressed on K by least squares over a window of near-ATM strikes, which
+averages out the bid-ask noise of single quotes: D comes from the slope
+and F from the intercept. All expiries are fitted in one pass: calls and
+puts are aligned with hash joins and the per-expiry sums of the regression
+are accumulated with np.bincount, so nothing is sorted per expiry.
+
+Usage:
+    forwards = parity_forwards(df_options, spot=df_daily.to_df()["close"].iloc[-1])
+"""
+
+import numpy as np
+import pandas as pd
+
+FORWARD_COLUMNS = ["expiration", "t", "forward", "atm_strike", "discount", "rate", "borrow"]
+
+# Strikes within this relative distance of the rough forward enter the regression
+WINDOW = 0.05
+# Expiries with fewer strikes in the window are fitted over all their strikes
+MIN_STRIKES = 3
+# Discount factors outside (MIN_DISCOUNT, MAX_DISCOUNT] are rejected as implausible
+MIN_DISCOUNT = 0.8
+MAX_DISCOUNT = 1.05
+
+
+def parity_forwards(df_options, spot=None, now=None, window=WINDOW):
+    """
+    Compute parity-implied forwards for all expiries of a chain.
+
+    Returns one row per expiry, sorted by expiration, with the forward, the
+    listed strike closest to it, the implied discount factor D and
+    continuous rate r = -log(D) / t. When a spot price is given (or the
+    chain has an underlying_price column) the implied borrow/dividend yield
+    q from F = S * exp((r - q) * t) is filled in too, otherwise it is NaN.
+
+    The regression uses the strikes within window (relative) of a rough
+    forward, the strike with the smallest |C - P| shifted by it. When the
+    fitted D is not in (0.8, 1.05], or a single strike leaves no slope,
+    discount, rate and borrow are NaN and the forward is refitted with D = 1.
+    """
+    now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+    if spot is None and "underlying_price" in df_options.columns:
+        spot = float(df_options["underlying_price"].iloc[0])
+
+    mids = pd.DataFrame({
+        "expiration": pd.to_datetime(df_options["expiration"]),
+        "strike": df_options["strike"].astype(np.float64),
+        "mid": (df_options["bid"] + df_options["ask"]) / 2,
+    })
+    # Align calls and puts on (expiration, strike) with hash group-bys and an inner join
+    is_call = (df_options["option_type"] == "call").to_numpy()
+    calls = mids[is_call].groupby(["expiration", "strike"], sort=False)["mid"].mean()
+    puts = mids[~is_call].groupby(["expiration", "strike"], sort=False)["mid"].mean()
+    aligned = calls.to_frame("call").join(puts.rename("put"), how="inner").dropna()
+    if aligned.empty:
+        return pd.DataFrame(columns=FORWARD_COLUMNS)
+
+    # Only the distinct expiries are sorted
+    code, expirations = pd.factorize(aligned.index.get_level_values("expiration"), sort=True)
+    n_expiries = len(expirations)
+    strike = aligned.index.get_level_values("strike").to_numpy(np.float64)
+    diff = (aligned["call"] - aligned["put"]).to_numpy(np.float64)
+
+    # Rough forward: the strike with the smallest |C - P|, shifted by C - P (D = 1)
+    abs_diff = np.abs(diff)
+    smallest = np.full(n_expiries, np.inf)
+    np.minimum.at(smallest, code, abs_diff)
+    hit = abs_diff == smallest[code]
+    rough = np.empty(n_expiries)
+    rough[code[hit]] = strike[hit] + diff[hit]
+
+    # Regress C - P on strikes centred at the rough forward, over the near-ATM window
+    x = strike - rough[code]
+    near = np.abs(x) <= window * rough[code]
+    sparse = np.bincount(code, weights=near, minlength=n_expiries) < MIN_STRIKES
+    near |= sparse[code]
+
+    def total(values):
+        return np.bincount(code, weights=np.where(near, values, 0.0), minlength=n_expiries)
+
+    n, sx, sy, sxx, sxy = total(1.0), total(x), total(diff), total(x * x), total(x * diff)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+        intercept = (sy - slope * sx) / n
+        discount = -slope
+        plausible = (discount > MIN_DISCOUNT) & (discount <= MAX_DISCOUNT)
+        # C - P = D * (F - rough) - D * x, so the intercept is D * (F - rough)
+        forward = rough + np.where(plausible, intercept / discount, (sy + sx) / n)
+    discount = np.where(plausible, discount, np.nan)
+
+    t = ((expirations - now) / pd.Timedelta(days=365)).to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.where(t > 0, -np.log(discount) / t, np.nan)
+        borrow = rate - np.log(forward / spot) / t if spot else np.full_like(forward, np.nan)
+
+    return pd.DataFrame({
+        "expiration": expirations,
+        "t": t,
+        "forward": forward,
+        "atm_strike": _nearest_strike(code, strike, forward),
+        "discount": discount,
+        "rate": rate,
+        "borrow": borrow,
+    })
+
+
+def _nearest_strike(code, strike, forwards):
+    """Listed strike closest to each expiry's forward."""
+    distance = np.abs(strike - forwards[code])
+    closest = np.full(len(forwards), np.inf)
+    np.minimum.at(closest, code, distance)
+    hit = distance == closest[code]
+    nearest = np.empty(len(forwards))
+    nearest[code[hit]] = strike[hit]
+    return nearest
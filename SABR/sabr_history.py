@@ -0,0 +1,289 @@
+"""
+SABR parameter history with a parallel backfill engine.
+
+backfill replays the chain snapshots in a ChainStore over a date range,
+calibrates every expiry of every snapshot on a ProcessPoolExecutor and
+appends the fitted parameters to a SABRHistory. Snapshots are fitted in
+contiguous date chunks, each expiry warm-started from its fit on the
+previous snapshot, so a day-to-day refit takes a few iterations. Expiries
+that fail to fit are logged and counted, and every processed snapshot is
+recorded with its fitted and failed counts, so snapshots that failed or
+produced no rows are not refitted on the next run.
+
+SABRHistory keeps one row per (symbol, snapshot_time, tenor) as Arrow IPC
+files under <root>/sabr_params/<SYMBOL>/, memory-mapped like the chain
+store, and the snapshot log under its snapshots/ subdirectory. Every
+append writes a new part file and compact() merges them, so a backfill
+that is interrupted keeps its finished chunks. Rows are held sorted by
+(snapshot_time, tenor): a time range is a binary search, and
+constant_maturity interpolates every snapshot to fixed tenors in one
+vectorized pass.
+
+Usage:
+    store = ChainStore("~/.sabr_store")
+    history = SABRHistory("~/.sabr_store")
+    backfill(store, history, "SPY", "2023-01-01", "2024-12-31", max_workers=8)
+    params = history.query("SPY", "2024-06-01", "2024-06-30")
+    cm = history.constant_maturity("SPY", [30 / 365, 90 / 365])
+"""
+
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import sabr_vol
+from chain_store import SNAPSHOT_FORMAT, _read_arrow, _write_arrow
+from sabr_surface import fit_slice, iter_slices
+
+logger = logging.getLogger(__name__)
+
+HISTORY_COLUMNS = ["snapshot_time", "snapshot", "expiry", "tenor", "f", "alpha", "beta", "rho", "volvol", "rmse"]
+SNAPSHOT_LOG_COLUMNS = ["snapshot", "fitted", "failed"]
+CONSTANT_MATURITY_COLUMNS = ["snapshot_time", "tenor", "f", "alpha", "beta", "rho", "volvol", "atm_vol", "extrapolated"]
+
+
+class SABRHistory:
+    """Columnar SABR parameter store keyed by (symbol, snapshot_time, tenor)."""
+
+    def __init__(self, root):
+        self.root = os.path.expanduser(root)
+        self._cache = {}
+
+    def _dir(self, symbol, log=False):
+        path = os.path.join(self.root, "sabr_params", symbol.upper())
+        return os.path.join(path, "snapshots") if log else path
+
+    def _parts(self, symbol, log=False):
+        path = self._dir(symbol, log)
+        if not os.path.isdir(path):
+            return []
+        return sorted(name for name in os.listdir(path) if name.endswith(".arrow"))
+
+    def _write_part(self, symbol, df, log=False):
+        os.makedirs(self._dir(symbol, log), exist_ok=True)
+        # Part names sort in write order, so later parts win on duplicates
+        name = f"{pd.Timestamp.now():%Y%m%dT%H%M%S%f}-{os.getpid()}.arrow"
+        path = os.path.join(self._dir(symbol, log), name)
+        _write_arrow(df, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    def append(self, symbol, rows):
+        """
+        Store rows of HISTORY_COLUMNS (tuples or a DataFrame) as a new part.
+
+        A (snapshot_time, expiry) that is already stored is replaced by the
+        new row.
+        """
+        df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows), columns=HISTORY_COLUMNS)
+        if not df.empty:
+            self._write_part(symbol, _sorted(df[HISTORY_COLUMNS]))
+
+    def record(self, symbol, log):
+        """
+        Store rows of SNAPSHOT_LOG_COLUMNS (tuples or a DataFrame): how many
+        expiries of each processed snapshot were fitted and how many failed.
+        """
+        df = log if isinstance(log, pd.DataFrame) else pd.DataFrame(list(log), columns=SNAPSHOT_LOG_COLUMNS)
+        if not df.empty:
+            self._write_part(symbol, df[SNAPSHOT_LOG_COLUMNS].reset_index(drop=True), log=True)
+
+    def compact(self, symbol):
+        """Merge all parts of a symbol, and of its snapshot log, into one file each."""
+        for log, load in ((False, self._load), (True, self.snapshot_log)):
+            parts = self._parts(symbol, log)
+            if len(parts) <= 1:
+                continue
+            df = load(symbol)
+            self._write_part(symbol, df, log)
+            for name in parts:
+                os.remove(os.path.join(self._dir(symbol, log), name))
+
+    def _read_parts(self, symbol, log, columns, prepare):
+        """Concatenated parts of a symbol passed through prepare, cached until the parts change."""
+        parts = tuple(self._parts(symbol, log))
+        key = (symbol, log)
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == parts:
+            return cached[1]
+        if not parts:
+            df = pd.DataFrame(columns=columns)
+        else:
+            path = self._dir(symbol, log)
+            df = prepare(pa.concat_tables(_read_arrow(os.path.join(path, name)) for name in parts).to_pandas())
+        self._cache[key] = (parts, df)
+        return df
+
+    def _load(self, symbol):
+        """All rows of a symbol sorted by (snapshot_time, tenor)."""
+        return self._read_parts(
+            symbol, False, HISTORY_COLUMNS,
+            lambda df: _sorted(df.drop_duplicates(["snapshot_time", "expiry"], keep="last")),
+        )
+
+    def snapshot_log(self, symbol):
+        """Fitted and failed expiry counts of every processed snapshot, the latest run of each."""
+        return self._read_parts(
+            symbol, True, SNAPSHOT_LOG_COLUMNS,
+            lambda df: df.drop_duplicates("snapshot", keep="last").reset_index(drop=True),
+        )
+
+    def snapshots(self, symbol):
+        """Snapshot keys that have been processed for a symbol, including failed and empty ones."""
+        return set(self._load(symbol)["snapshot"].unique()) | set(self.snapshot_log(symbol)["snapshot"])
+
+    def query(self, symbol, start=None, end=None):
+        """Rows with start <= snapshot_time <= end (a date without a time includes the whole day)."""
+        df = self._load(symbol)
+        times = df["snapshot_time"].to_numpy()
+        lo = 0 if start is None else np.searchsorted(times, np.datetime64(pd.Timestamp(start)), "left")
+        hi = len(df) if end is None else np.searchsorted(times, np.datetime64(_end_of_day(end)), "right")
+        return df.iloc[lo:hi].reset_index(drop=True)
+
+    def constant_maturity(self, symbol, tenors, start=None, end=None):
+        """
+        Interpolate every snapshot's fitted expiries to fixed tenors (in years).
+
+        f, alpha, rho and volvol are interpolated linearly in tenor and the
+        ATM vol linearly in total variance; outside a snapshot's fitted
+        tenors the nearest expiry is used flat and extrapolated is set.
+        Returns one row per (snapshot_time, tenor) with
+        CONSTANT_MATURITY_COLUMNS.
+        """
+        df = self.query(symbol, start, end)
+        tenors = np.atleast_1d(np.asarray(tenors, dtype=np.float64))
+        if df.empty:
+            return pd.DataFrame(columns=CONSTANT_MATURITY_COLUMNS)
+        t = df["tenor"].to_numpy(np.float64)
+        times, first = np.unique(df["snapshot_time"].to_numpy(), return_index=True)
+        last = np.append(first[1:], len(df)) - 1
+        code = np.repeat(np.arange(len(times)), last - first + 1)
+
+        # Rows are sorted by (snapshot_time, tenor), so time code + scaled tenor is one sorted key
+        scale = max(t.max(), tenors.max()) + 1.0
+        key = code + t / scale
+        target = np.arange(len(times))[:, None] + tenors[None, :] / scale
+        hi = np.clip(np.searchsorted(key, target), first[:, None] + 1, last[:, None])
+        lo = np.maximum(hi - 1, first[:, None])
+        span = t[hi] - t[lo]
+        raw = np.divide(tenors[None, :] - t[lo], span, out=np.zeros_like(span), where=span > 0)
+        weight = np.clip(raw, 0.0, 1.0)
+        extrapolated = (tenors[None, :] < t[first][:, None]) | (tenors[None, :] > t[last][:, None])
+
+        def lerp(values):
+            return values[lo] + weight * (values[hi] - values[lo])
+
+        columns = {name: df[name].to_numpy(np.float64) for name in ("f", "alpha", "beta", "rho", "volvol")}
+        atm = sabr_vol.lognormal_vol(columns["f"], columns["f"], t, columns["alpha"], columns["beta"],
+                                     columns["rho"], columns["volvol"])
+        atm_vol = np.where(extrapolated, lerp(atm), np.sqrt(lerp(atm ** 2 * t) / tenors[None, :]))
+        return pd.DataFrame({
+            "snapshot_time": np.repeat(times, len(tenors)),
+            "tenor": np.tile(tenors, len(times)),
+            **{name: lerp(values).ravel() for name, values in columns.items()},
+            "atm_vol": atm_vol.ravel(),
+            "extrapolated": extrapolated.ravel(),
+        })
+
+
+def select_snapshots(store, symbol, start=None, end=None, daily=True):
+    """Chain snapshot keys of a symbol in [start, end]; with daily, the last one of each day."""
+    keys = store.snapshots(symbol)
+    if not keys:
+        return []
+    times = pd.Series(pd.to_datetime(keys, format=SNAPSHOT_FORMAT), index=keys)
+    if start is not None:
+        times = times[times >= pd.Timestamp(start)]
+    if end is not None:
+        times = times[times <= _end_of_day(end)]
+    if daily:
+        times = times.groupby(times.dt.normalize()).tail(1)
+    return list(times.index)
+
+
+def _fit_snapshots(store, symbol, snapshots, beta, method, vol_source):
+    """
+    Fit every expiry of consecutive snapshots, warm-starting each expiry from
+    its previous fit. Returns the history rows and one snapshot log row per
+    snapshot.
+    """
+    rows, log, previous = [], [], {}
+    for snapshot in snapshots:
+        now = pd.Timestamp(snapshot)
+        df_options = store.read_chain(symbol, snapshot)
+        fitted = failed = 0
+        for expiry, t, f, strikes, vols in iter_slices(df_options, now, vol_source):
+            try:
+                _, _, _, alpha, rho, volvol, rmse = fit_slice(
+                    expiry, t, f, strikes, vols, beta, method, x0=previous.get(expiry)
+                )
+            except (ValueError, np.linalg.LinAlgError) as e:
+                failed += 1
+                logger.warning("%s %s: fit of expiry %s failed: %s", symbol, snapshot, expiry, e)
+                continue
+            fitted += 1
+            previous[expiry] = (alpha, rho, volvol)
+            rows.append((now, snapshot, expiry, t, f, alpha, beta, rho, volvol, rmse))
+        log.append((snapshot, fitted, failed))
+    return rows, log
+
+
+def backfill(store, history, symbol, start=None, end=None, beta=0.5, method="least_squares",
+             vol_source="provider", max_workers=None, daily=True, refit=False, chunk_size=None):
+    """
+    Calibrate the stored chain snapshots of a symbol and append them to history.
+
+    Snapshots already processed, including those whose fits failed or that
+    had no expiries to fit, are skipped unless refit is set; failed expiry
+    fits are logged and counted in history.snapshot_log(symbol). Snapshots
+    are split into contiguous chunks (chunk_size snapshots, by default
+    about four chunks per worker) fitted on max_workers processes;
+    max_workers=1 fits in the current process. Each finished chunk is
+    appended right away. Returns the history rows of [start, end].
+    """
+    snapshots = select_snapshots(store, symbol, start, end, daily)
+    if not refit:
+        done = history.snapshots(symbol)
+        snapshots = [snapshot for snapshot in snapshots if snapshot not in done]
+    if snapshots:
+        workers = 1 if max_workers == 1 else (max_workers or os.cpu_count() or 1)
+        chunk_size = chunk_size or max(1, math.ceil(len(snapshots) / (4 * workers)))
+        chunks = [snapshots[i:i + chunk_size] for i in range(0, len(snapshots), chunk_size)]
+        failed = 0
+
+        def store_chunk(rows, log):
+            nonlocal failed
+            # Rows before the log, so an interrupted append never marks a snapshot done without its rows
+            history.append(symbol, rows)
+            history.record(symbol, log)
+            failed += sum(n for _, _, n in log)
+
+        if workers == 1:
+            for chunk in chunks:
+                store_chunk(*_fit_snapshots(store, symbol, chunk, beta, method, vol_source))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(_fit_snapshots, store, symbol, chunk, beta, method, vol_source)
+                    for chunk in chunks
+                ]
+                for future in as_completed(futures):
+                    store_chunk(*future.result())
+        if failed:
+            logger.warning("%s: %d expiry fits failed in %d snapshots", symbol, failed, len(snapshots))
+        history.compact(symbol)
+    return history.query(symbol, start, end)
+
+
+def _sorted(df):
+    return df.sort_values(["snapshot_time", "tenor"], kind="stable").reset_index(drop=True)
+
+
+def _end_of_day(end):
+    """A bare date as an end bound covers the whole day."""
+    end = pd.Timestamp(end)
+    return end + pd.Timedelta(days=1) - pd.Timedelta(1, "ns") if end == end.normalize() else end
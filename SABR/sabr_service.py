@@ -0,0 +1,172 @@
+"""
+Multi-symbol streaming SABR surface service.
+
+Runs the py_sabr.py pipeline (chain fetch -> filter -> forward -> calibrate)
+for many underlyings at once on asyncio. Chain fetches are blocking OpenBB
+calls, so they run in threads behind a semaphore that bounds how many are in
+flight; the CPU-bound slice fits are handed to a ProcessPoolExecutor. Each
+symbol's surface is published on a bounded queue (dropping the oldest
+update when no one drains it) as soon as it is done, together with
+per-stage latencies. With a smile_cache, each new surface also
+refreshes that symbol's precomputed pricing grid in a worker thread, so
+grid builds do not stall the event loop.
+
+Any object shaped like openbb's obb works as the provider, including
+chain_store.StoreOBB, so the service runs against a local snapshot store
+as a fake provider.
+
+Usage:
+    async with SABRSurfaceService(obb, ["SPY", "QQQ", "IWM"], max_fetches=8) as service:
+        asyncio.create_task(service.run_forever(interval=30))
+        while True:
+            update = await service.updates.get()
+            print(update.symbol, update.timings, update.surface)
+"""
+
+import asyncio
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from sabr_surface import SURFACE_COLUMNS, fit_slice, iter_slices
+
+logger = logging.getLogger(__name__)
+
+SurfaceUpdate = namedtuple("SurfaceUpdate", ["symbol", "snapshot_time", "surface", "timings", "error"])
+
+
+class SABRSurfaceService:
+    """
+    Keeps SABR surfaces current for a list of symbols.
+
+    max_fetches bounds the concurrent chain fetches, max_workers sizes the
+    fit process pool (ignored when an executor is passed in). Updates are
+    put on self.updates, which holds at most queue_size of them (the oldest
+    is dropped when it is full; queue_size=0 disables the queue and
+    self.updates is None), and, if given, passed to the on_update callback.
+    An exception raised by the callback is logged and counted in
+    callback_errors without affecting other symbols; an expiry whose fit
+    raises is logged, counted in fit_errors and left out of the surface.
+    The fetch timing excludes the wait for a fetch slot, which is reported
+    as fetch_wait. smile_cache is an
+    optional sabr_smile_cache.SmileCache updated per symbol.
+    """
+
+    def __init__(self, provider, symbols, beta=0.5, max_fetches=8, max_workers=None,
+                 method="least_squares", vol_source="provider", data_provider="yfinance",
+                 executor=None, on_update=None, smile_cache=None, queue_size=100):
+        self.provider = provider
+        self.symbols = list(symbols)
+        self.beta = beta
+        self.method = method
+        self.vol_source = vol_source
+        self.data_provider = data_provider
+        self.max_workers = max_workers
+        self.executor = executor
+        self.on_update = on_update
+        self.smile_cache = smile_cache
+        self.updates = asyncio.Queue(maxsize=queue_size) if queue_size else None
+        self.dropped_updates = 0
+        self.callback_errors = 0
+        self.fit_errors = 0
+        self.latest = {}
+        self._fetch_slots = asyncio.Semaphore(max_fetches)
+        self._owns_executor = executor is None
+
+    async def __aenter__(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self._owns_executor and self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def _fetch(self, symbol):
+        """Blocking chain fetch, run in a worker thread."""
+        return self.provider.derivatives.options.chains(symbol=symbol, provider=self.data_provider).to_df()
+
+    async def refresh(self, symbol):
+        """Run the full pipeline for one symbol and publish the result."""
+        loop = asyncio.get_running_loop()
+        timings = {}
+        start = time.perf_counter()
+        snapshot_time = pd.Timestamp.now()
+        try:
+            async with self._fetch_slots:
+                stage = time.perf_counter()
+                timings["fetch_wait"] = stage - start
+                df_options = await asyncio.to_thread(self._fetch, symbol)
+                timings["fetch"] = time.perf_counter() - stage
+
+            stage = time.perf_counter()
+            slices = await asyncio.to_thread(
+                lambda: list(iter_slices(df_options, snapshot_time, self.vol_source))
+            )
+            timings["prepare"] = time.perf_counter() - stage
+
+            stage = time.perf_counter()
+            results = await asyncio.gather(*(
+                loop.run_in_executor(self.executor, fit_slice, *inputs, self.beta, self.method)
+                for inputs in slices
+            ), return_exceptions=True)
+            timings["calibrate"] = time.perf_counter() - stage
+            rows = []
+            for inputs, result in zip(slices, results):
+                if isinstance(result, Exception):
+                    self.fit_errors += 1
+                    logger.warning("SABR fit of %s expiry %s failed: %s", symbol, inputs[0], result)
+                else:
+                    rows.append(result)
+            surface = pd.DataFrame(rows, columns=SURFACE_COLUMNS)
+            if self.smile_cache is not None and not surface.empty:
+                stage = time.perf_counter()
+                await asyncio.to_thread(self.smile_cache.update, symbol, surface, self.beta)
+                timings["smile_grid"] = time.perf_counter() - stage
+            error = None
+        except Exception as e:
+            surface, error = None, e
+        timings["total"] = time.perf_counter() - start
+
+        update = SurfaceUpdate(symbol, snapshot_time, surface, timings, error)
+        if error is None:
+            self.latest[symbol] = update
+        self._publish(update)
+        if self.on_update is not None:
+            try:
+                self.on_update(update)
+            except Exception:
+                self.callback_errors += 1
+                logger.exception("on_update callback failed for %s", symbol)
+        return update
+
+    def _publish(self, update):
+        """Put an update on the queue, dropping the oldest one when it is full."""
+        if self.updates is None:
+            return
+        if self.updates.full():
+            self.updates.get_nowait()
+            self.dropped_updates += 1
+        self.updates.put_nowait(update)
+
+    async def run_once(self):
+        """Refresh every symbol concurrently; returns the updates in completion order."""
+        updates = []
+        for next_done in asyncio.as_completed([self.refresh(symbol) for symbol in self.symbols]):
+            updates.append(await next_done)
+        return updates
+
+    async def run_forever(self, interval=30.0):
+        """Refresh all symbols every interval seconds (measured start to start)."""
+        while True:
+            start = time.perf_counter()
+            await self.run_once()
+            await asyncio.sleep(max(0.0, interval - (time.perf_counter() - start)))
+
+    def metrics(self):
+        """Latest per-stage latencies per symbol as a DataFrame."""
+        return pd.DataFrame({symbol: update.timings for symbol, update in self.latest.items()}).T
@@ -0,0 +1,185 @@
+"""
+Precomputed SABR smile grids for fast pricing.
+
+After a surface is calibrated, SmileGrid evaluates the Hagan vol once on a
+dense grid for every fitted tenor and stores cubic spline coefficients per
+grid interval. The grid is laid out in standardized moneyness
+ln(K/f) / (atm_vol * sqrt(t)), so a one-day expiry gets as many points
+across its smile as a one-year one. Pricing a book is then a vectorized
+coefficient gather and Horner step per option, followed by Black-76,
+instead of a SABR expansion per request. Premiums are floored at intrinsic
+value.
+
+Tenors between fitted expiries interpolate the smile in total variance
+between the neighbouring expiries at the same log-moneyness, which is
+continuous in the tenor and exact on a fitted expiry. Outside the grid
+the vol is held flat.
+
+SmileCache keeps one grid per key (e.g. symbol) and rebuilds it only when
+the parameter version changes: a hash of the fitted parameters by default,
+so a recalibration that leaves the parameters unchanged keeps its grid.
+
+Usage:
+    cache = SmileCache()
+    grid = cache.update("SPY", surface, beta=0.5)
+    prices = grid.price(strikes, tenors, "call", discount)
+"""
+
+import hashlib
+
+import numpy as np
+from scipy.interpolate import CubicSpline
+
+import sabr_vol
+from implied_vol import _is_call, black_price
+
+GRID_POINTS = 801
+# Each tenor's grid spans this many ATM standard deviations either side of the forward...
+STD_WIDTH = 16.0
+# ...but never more than this log-moneyness
+MAX_LOG_MONEYNESS = 1.5
+
+
+def parameter_version(surface, beta):
+    """Hash of a surface's fitted (t, f, alpha, rho, volvol) and beta."""
+    digest = hashlib.sha1(np.float64(beta).tobytes())
+    for column in ("t", "f", "alpha", "rho", "volvol"):
+        digest.update(np.ascontiguousarray(surface[column], dtype=np.float64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+class SmileGrid:
+    """
+    Spline tables of vols over (fitted tenor, standardized moneyness) for
+    one calibrated surface.
+
+    surface is a DataFrame with the columns of sabr_surface.SURFACE_COLUMNS.
+    Row i of the grid covers log-moneyness width[i] * u for u in [-1, 1].
+    """
+
+    def __init__(self, surface, beta, n_points=GRID_POINTS, std_width=STD_WIDTH,
+                 max_log_moneyness=MAX_LOG_MONEYNESS, version=None):
+        surface = surface.dropna(subset=["t", "f", "alpha", "rho", "volvol"])
+        surface = surface[surface["t"] > 0].sort_values("t")
+        if surface.empty:
+            raise ValueError("Cannot build a smile grid from an empty surface")
+        self.version = version or parameter_version(surface, beta)
+        self.beta = beta
+        self.t = surface["t"].to_numpy(np.float64)
+        self.f = surface["f"].to_numpy(np.float64)
+        self.u = np.linspace(-1.0, 1.0, n_points)
+        self._du = self.u[1] - self.u[0]
+
+        t, f = self.t[:, None], self.f[:, None]
+        alpha, rho, volvol = (surface[name].to_numpy(np.float64)[:, None] for name in ("alpha", "rho", "volvol"))
+        atm_vol = sabr_vol.lognormal_vol(f, f, t, alpha, beta, rho, volvol)
+        self.width = np.minimum(std_width * atm_vol * np.sqrt(t), max_log_moneyness).ravel()
+        self.x = self.width[:, None] * self.u
+        self.vols = sabr_vol.lognormal_vol(f * np.exp(self.x), f, t, alpha, beta, rho, volvol)
+        self._vol_coef = _spline_coefficients(self.u, self.vols)
+
+    def forward(self, t):
+        """Forward at tenor t, linear between the fitted expiries and flat outside them."""
+        return np.interp(t, self.t, self.f)
+
+    def _spline(self, row, x):
+        """Vols of grid rows at log-moneyness x, flat outside each row's grid."""
+        u = np.clip(x / self.width[row], -1.0, 1.0)
+        i = np.clip(((u + 1.0) / self._du).astype(np.intp), 0, len(self.u) - 2)
+        c = self._vol_coef[row, i]
+        d = u - self.u[i]
+        return ((c[:, 0] * d + c[:, 1]) * d + c[:, 2]) * d + c[:, 3]
+
+    def _vols(self, x, t):
+        """Vols at flat arrays of log-moneyness and tenor, interpolated in total variance."""
+        if len(self.t) == 1:
+            return self._spline(np.zeros(len(x), dtype=np.intp), x)
+        hi = np.clip(np.searchsorted(self.t, t), 1, len(self.t) - 1)
+        lo = hi - 1
+        t0, t1 = self.t[lo], self.t[hi]
+        weight = np.clip((t - t0) / (t1 - t0), 0.0, 1.0)
+        v0 = self._spline(lo, x)
+        v1 = self._spline(hi, x)
+        inside = (t >= self.t[0]) & (t <= self.t[-1]) & (t > 0)
+        variance = (1 - weight) * v0 ** 2 * t0 + weight * v1 ** 2 * t1
+        flat = np.where(weight >= 0.5, v1, v0)
+        return np.where(inside, np.sqrt(variance / np.where(inside, t, 1.0)), flat)
+
+    def vol(self, k, t):
+        """Lognormal vols (decimals) for arrays of strikes and tenors in years."""
+        k, t = np.broadcast_arrays(np.asarray(k, dtype=np.float64), np.asarray(t, dtype=np.float64))
+        flat_t = t.ravel()
+        x = np.log(k.ravel() / self.forward(flat_t))
+        return self._vols(x, flat_t).reshape(k.shape)
+
+    def price(self, k, t, cp="call", discount=1.0):
+        """
+        Black-76 premiums for arrays of strikes, tenors in years, "call"/"put"
+        (any case) and discount factors, floored at intrinsic value. At or
+        past expiry (t <= 0) the premium is the discounted intrinsic value.
+        """
+        k, t, cp, discount = np.broadcast_arrays(
+            np.asarray(k, dtype=np.float64), np.asarray(t, dtype=np.float64), np.asarray(cp),
+            np.asarray(discount, dtype=np.float64),
+        )
+        shape = k.shape
+        k, t, discount = k.ravel(), t.ravel(), discount.ravel()
+        is_call = _is_call(cp.ravel())
+        f = self.forward(t)
+        live = t > 0
+        call = black_price(k, f, np.where(live, t, 1.0), self._vols(np.log(k / f), t), "call")
+        intrinsic = np.maximum(np.where(is_call, f - k, k - f), 0.0)
+        premium = np.where(live, np.maximum(np.where(is_call, call, call - (f - k)), intrinsic), intrinsic)
+        return (discount * premium).reshape(shape)
+
+
+class SmileCache:
+    """
+    Smile grids per key, rebuilt only when the parameter version changes.
+
+    grid_options are passed to SmileGrid (n_points, std_width,
+    max_log_moneyness).
+    builds counts grid constructions.
+    """
+
+    def __init__(self, **grid_options):
+        self.grid_options = grid_options
+        self.grids = {}
+        self.builds = 0
+
+    def update(self, key, surface, beta, version=None):
+        """
+        Return the grid for key, building it if the surface's parameter
+        version (or the explicit version) differs from the cached one.
+        """
+        version = version or parameter_version(surface, beta)
+        grid = self.grids.get(key)
+        if grid is None or grid.version != version:
+            grid = SmileGrid(surface, beta, version=version, **self.grid_options)
+            self.grids[key] = grid
+            self.builds += 1
+        return grid
+
+    def get(self, key, version=None):
+        """The cached grid for key, or None if missing or not at version."""
+        grid = self.grids.get(key)
+        if grid is None or (version is not None and grid.version != version):
+            return None
+        return grid
+
+    def invalidate(self, key=None):
+        """Drop the grid for key, or every grid."""
+        if key is None:
+            self.grids.clear()
+        else:
+            self.grids.pop(key, None)
+
+    def price(self, key, k, t, cp="call", discount=1.0):
+        """Price off the cached grid for key (KeyError if none was built)."""
+        return self.grids[key].price(k, t, cp, discount)
+
+
+def _spline_coefficients(x, values):
+    """Cubic spline coefficients of each row of values per interval, shape (rows, len(x) - 1, 4)."""
+    # spline.c is (4, intervals, rows)
+    return np.ascontiguousarray(CubicSpline(x, values, axis=1).c.transpose(2, 1, 0))
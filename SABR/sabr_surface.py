@@ -0,0 +1,132 @@
+"""
+Whole-surface SABR calibration.
+
+Groups an OpenBB option chain (the DataFrame from
+obb.derivatives.options.chains(...).to_df()) by expiration and fits the
+Hagan 2002 lognormal SABR model to every expiry slice in parallel on a
+ProcessPoolExecutor, either with pysabr's fit or with the native
+least-squares fitter in sabr_fit.py. An expiry whose fit fails is logged
+and left out of the surface.
+
+Usage:
+    df_options = obb.derivatives.options.chains(symbol="SPY", provider="yfinance").to_df()
+    surface = calibrate_surface(df_options, beta=0.5, max_workers=8)
+"""
+
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pysabr import Hagan2002LognormalSABR
+
+import sabr_fit
+import sabr_vol
+from implied_vol import implied_vol
+from option_chain import OptionChain
+from sabr_forward import parity_forwards
+
+logger = logging.getLogger(__name__)
+
+SURFACE_COLUMNS = ["expiry", "t", "f", "alpha", "rho", "volvol", "rmse"]
+
+
+def slice_inputs(calls, now, f, vol_source="provider", discount=1.0):
+    """
+    Build the fit inputs for one expiry slice.
+
+    calls is the option_chain.ChainSlice of the expiry's calls. Returns
+    (expiry, t, f, strikes, vols) with vols in percent like the single-expiry
+    flow in py_sabr.py, or None when the slice can't be fitted. vol_source
+    "provider" fits the chain's implied_volatility column, "mid" fits
+    Black-76 vols inverted from the call mids.
+    """
+    t = (calls.expiration - now) / pd.Timedelta(days=365)
+    strikes = calls.strike
+    if vol_source == "mid":
+        vols = implied_vol(calls.mid, strikes, f, max(t, 0.0), "call", discount) * 100
+    else:
+        vols = calls.iv * 100
+    valid = (vols > 0) & (strikes > 0)
+    strikes, vols = strikes[valid], np.maximum(vols[valid], 1e-8)
+    if f <= 0 or t <= 0 or len(strikes) == 0:
+        return None
+    return calls.expiration, t, f, strikes, vols
+
+
+def fit_slice(expiry, t, f, strikes, vols, beta, method="pysabr", x0=None):
+    """
+    Fit one expiry slice and return a row of SURFACE_COLUMNS.
+
+    method is "pysabr" for Hagan2002LognormalSABR.fit or "least_squares"
+    for the analytic-Jacobian fitter in sabr_fit.py, which can be
+    warm-started from x0 = (alpha, rho, volvol).
+    """
+    if method == "pysabr":
+        alpha, rho, volvol = Hagan2002LognormalSABR(f=f, t=t, beta=beta).fit(strikes, vols)
+    elif method == "least_squares":
+        (alpha, rho, volvol), _ = sabr_fit.fit(strikes, vols, f, t, beta, x0=x0)
+    else:
+        raise ValueError(f"Unknown fit method: {method}")
+    model_vols = sabr_vol.lognormal_vol(strikes, f, t, alpha, beta, rho, volvol) * 100
+    rmse = float(np.sqrt(np.mean((model_vols - vols) ** 2)))
+    return expiry, t, f, alpha, rho, volvol, rmse
+
+
+def _fit_slice_task(task):
+    """
+    Unpack a (slice inputs, beta, method) task - module level so it pickles.
+    A failed fit returns its exception instead of a row.
+    """
+    inputs, beta, method = task
+    try:
+        return fit_slice(*inputs, beta, method)
+    except (ValueError, np.linalg.LinAlgError) as e:
+        return e
+
+
+def iter_slices(df_options, now=None, vol_source="provider"):
+    """
+    Yield fit inputs for every expiry in the chain that can be fitted.
+
+    Forwards and discount factors for all expiries come from one
+    parity_forwards pass and the call slices are views into one OptionChain.
+    """
+    now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+    chain = OptionChain.from_df(df_options)
+    forwards = parity_forwards(df_options, now=now)
+    for expiration, f, discount in forwards[["expiration", "forward", "discount"]].itertuples(index=False):
+        discount = 1.0 if np.isnan(discount) else discount
+        inputs = slice_inputs(chain.slice("call", expiration), now, float(f), vol_source, discount)
+        if inputs is not None:
+            yield inputs
+
+
+def calibrate_surface(df_options, beta=0.5, max_workers=None, now=None, method="pysabr",
+                      vol_source="provider"):
+    """
+    Calibrate SABR (alpha, rho, volvol) for every expiry of an option chain.
+
+    Slices are fitted on a ProcessPoolExecutor with max_workers processes
+    (None lets the executor pick os.cpu_count()); max_workers=1 fits in the
+    current process. method selects the fitter, see fit_slice, and
+    vol_source the vols it is fitted to, see slice_inputs. Returns a
+    DataFrame with one row per expiry and columns expiry, t, f, alpha, rho,
+    volvol, rmse (rmse in vol percent). Expiries whose fit raises are
+    logged and dropped, so one degenerate slice doesn't lose the surface.
+    """
+    tasks = [(inputs, beta, method) for inputs in iter_slices(df_options, now, vol_source)]
+    if not tasks:
+        return pd.DataFrame(columns=SURFACE_COLUMNS)
+
+    if max_workers == 1:
+        rows = [_fit_slice_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            rows = list(executor.map(_fit_slice_task, tasks))
+    failed = [(inputs[0], row) for (inputs, _, _), row in zip(tasks, rows) if isinstance(row, Exception)]
+    for expiry, error in failed:
+        logger.warning("SABR fit of expiry %s failed: %s", expiry, error)
+    if failed:
+        rows = [row for row in rows if not isinstance(row, Exception)]
+    return pd.DataFrame(rows, columns=SURFACE_COLUMNS)
@@ -0,0 +1,79 @@
+"""
+Vectorized Hagan 2002 SABR vol expansions.
+
+Drop-in replacements for pysabr's hagan_2002_lognormal_sabr.lognormal_vol and
+hagan_2002_normal_sabr.normal_vol that accept NumPy arrays. Strikes, forwards,
+expiries and parameters are broadcast against each other, so a whole surface
+can be evaluated in one call, e.g. strikes of shape (n_expiries, n_strikes)
+with f, t, alpha, rho, volvol of shape (n_expiries, 1).
+"""
+
+import numpy as np
+
+# Same numerical tolerance pysabr uses for the ATM (z -> 0) limit
+EPS = 1e-07
+
+
+def lognormal_vol(k, f, t, alpha, beta, rho, volvol):
+    """
+    Hagan's 2002 SABR lognormal vol expansion over arrays.
+
+    Returns an array with the broadcast shape of the inputs. Non-positive
+    strikes or forwards give a vol of 0, as in pysabr.
+    """
+    k, f, t, alpha, beta, rho, volvol = np.broadcast_arrays(
+        *(np.asarray(x, dtype=np.float64) for x in (k, f, t, alpha, beta, rho, volvol))
+    )
+    valid = (k > 0) & (f > 0)
+    # Dummy values on invalid points keep the logs and powers finite
+    k_ = np.where(valid, k, 1.0)
+    f_ = np.where(valid, f, 1.0)
+
+    logfk = np.log(f_ / k_)
+    fkbeta = (f_ * k_) ** (1 - beta)
+    a = (1 - beta) ** 2 * alpha ** 2 / (24 * fkbeta)
+    b = 0.25 * rho * beta * volvol * alpha / fkbeta ** 0.5
+    c = (2 - 3 * rho ** 2) * volvol ** 2 / 24
+    d = fkbeta ** 0.5
+    v = (1 - beta) ** 2 * logfk ** 2 / 24
+    w = (1 - beta) ** 4 * logfk ** 4 / 1920
+    z = volvol * fkbeta ** 0.5 * logfk / alpha
+
+    vol = alpha * (1 + (a + b + c) * t) / (d * (1 + v + w)) * _z_over_x(rho, z)
+    return np.where(valid, vol, 0.0)
+
+
+def normal_vol(k, f, t, alpha, beta, rho, volvol):
+    """Hagan's 2002 SABR normal vol expansion - formula (B.67a) - over arrays."""
+    k, f, t, alpha, beta, rho, volvol = np.broadcast_arrays(
+        *(np.asarray(x, dtype=np.float64) for x in (k, f, t, alpha, beta, rho, volvol))
+    )
+    f_av = np.sqrt(f * k)
+    A = - beta * (2 - beta) * alpha ** 2 / (24 * f_av ** (2 - 2 * beta))
+    B = rho * alpha * volvol * beta / (4 * f_av ** (1 - beta))
+    C = (2 - 3 * rho ** 2) * volvol ** 2 / 24
+    FMKR = _f_minus_k_ratio(f, k, beta)
+    zeta = volvol * (f - k) / (alpha * f_av ** beta)
+    return alpha * FMKR * _z_over_x(rho, zeta) * (1 + (A + B + C) * t)
+
+
+def _z_over_x(rho, z):
+    """Return z / x(z), masked to its limit of 1 where |z| <= EPS."""
+    atm = np.abs(z) <= EPS
+    # Substitute a harmless z on ATM points so x(z) never divides 0 by 0
+    z_ = np.where(atm, 1.0, z)
+    x = np.log((np.sqrt(1 - 2 * rho * z_ + z_ ** 2) + z_ - rho) / (1 - rho))
+    return np.where(atm, 1.0, z_ / x)
+
+
+def _f_minus_k_ratio(f, k, beta):
+    """Hagan's 2002 f minus k ratio - formula (B.67a) - over arrays."""
+    near_atm = np.abs(f - k) <= EPS
+    lognormal = np.abs(1 - beta) <= EPS
+    # Dummy strike on ATM points keeps both branches finite
+    k_ = np.where(near_atm, f + 1.0, k)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # The unused branch is 0/0 when beta == 1, np.where discards it
+        cev = (1 - beta) * (f - k_) / (f ** (1 - beta) - k_ ** (1 - beta))
+        log = (f - k_) / np.log(f / k_)
+    return np.where(near_atm, k ** beta, np.where(lognormal, log, cev))
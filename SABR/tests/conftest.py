@@ -0,0 +1,8 @@
+import os
+import sys
+
+SABR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The SABR modules are flat scripts next to py_sabr.py; synthetic chains come from the benchmarks
+sys.path.insert(0, SABR_DIR)
+sys.path.insert(0, os.path.join(SABR_DIR, "benchmarks"))
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+import sabr_history
+from chain_store import ChainStore
+from sabr_history import SABRHistory, backfill
+from synthetic import NOW, TRUE_PARAMS, synthetic_chain
+
+
+def _store(tmp_path, days=3):
+    """ChainStore with one synthetic snapshot of 3 expiries per business day."""
+    store = ChainStore(tmp_path / "store")
+    for i, day in enumerate(pd.bdate_range(NOW.normalize(), periods=days)):
+        df_options, _ = synthetic_chain(n_expiries=3, n_strikes=40, now=day + pd.Timedelta(hours=15), seed=i)
+        store.write_chain("SPY", df_options, day + pd.Timedelta(hours=15))
+    return store
+
+
+def _counting_fit(monkeypatch, fail_expiry=None):
+    """Patch fit_slice to count calls and raise for fail_expiry; returns the call list."""
+    calls = []
+    fit_slice = sabr_history.fit_slice
+
+    def fit(expiry, *args, **kwargs):
+        calls.append(expiry)
+        if expiry == fail_expiry:
+            raise np.linalg.LinAlgError("singular")
+        return fit_slice(expiry, *args, **kwargs)
+
+    monkeypatch.setattr(sabr_history, "fit_slice", fit)
+    return calls
+
+
+def test_backfill_keys_rows_by_snapshot_time(tmp_path):
+    store, history = _store(tmp_path), SABRHistory(tmp_path / "history")
+    params = backfill(store, history, "SPY", beta=TRUE_PARAMS["beta"], max_workers=1)
+    assert len(params) == 9
+    assert params["snapshot_time"].is_monotonic_increasing
+    cm = history.constant_maturity("SPY", [30 / 365])
+    assert list(cm.columns[:2]) == ["snapshot_time", "tenor"]
+    assert len(cm) == 3
+
+
+def test_failed_fits_are_counted_and_not_retried(tmp_path, monkeypatch):
+    store, history = _store(tmp_path), SABRHistory(tmp_path / "history")
+    fail_expiry = store.read_chain("SPY", store.latest_snapshot("SPY"))["expiration"].min()
+    calls = _counting_fit(monkeypatch, pd.Timestamp(fail_expiry))
+    params = backfill(store, history, "SPY", beta=TRUE_PARAMS["beta"], max_workers=1)
+
+    log = history.snapshot_log("SPY")
+    assert len(log) == 3
+    assert log["failed"].sum() == 1
+    assert log["fitted"].sum() == len(params) == 8
+
+    n_calls = len(calls)
+    backfill(store, history, "SPY", beta=TRUE_PARAMS["beta"], max_workers=1)
+    assert len(calls) == n_calls
+    backfill(store, history, "SPY", beta=TRUE_PARAMS["beta"], max_workers=1, refit=True)
+    assert len(calls) == 2 * n_calls
+
+
+def test_snapshots_without_fits_are_not_retried(tmp_path, monkeypatch):
+    store, history = _store(tmp_path, days=1), SABRHistory(tmp_path / "history")
+    # A snapshot taken after every expiry of its chain has nothing to fit
+    df_options, _ = synthetic_chain(n_expiries=3, n_strikes=40)
+    store.write_chain("SPY", df_options, NOW + pd.Timedelta(days=400))
+    calls = _counting_fit(monkeypatch)
+    backfill(store, history, "SPY", beta=TRUE_PARAMS["beta"], max_workers=1, daily=False)
+    log = history.snapshot_log("SPY").set_index("snapshot")
+    assert sorted(log["fitted"]) == [0, 3]
+
+    n_calls = len(calls)
+    backfill(store, history, "SPY", beta=TRUE_PARAMS["beta"], max_workers=1, daily=False)
+    assert len(calls) == n_calls
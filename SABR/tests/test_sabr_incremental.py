@@ -0,0 +1,27 @@
+import pandas as pd
+
+from sabr_incremental import IncrementalSABRCalibrator
+from synthetic import NOW, TRUE_PARAMS, synthetic_chain
+
+
+def test_unchanged_quotes_skip_the_refit():
+    calibrator = IncrementalSABRCalibrator(beta=TRUE_PARAMS["beta"])
+    df_options, _ = synthetic_chain(n_expiries=3, n_strikes=40)
+    first = calibrator.update_surface(df_options, now=NOW)
+    second = calibrator.update_surface(df_options, now=NOW + pd.Timedelta(seconds=5))
+
+    assert not first["skipped"].any()
+    assert second["skipped"].all()
+    assert calibrator.stats["fits"] == calibrator.stats["skipped"] == 3
+    assert (second["alpha"] == first["alpha"]).all()
+
+
+def test_expired_expiries_are_forgotten():
+    calibrator = IncrementalSABRCalibrator(beta=TRUE_PARAMS["beta"])
+    df_options, _ = synthetic_chain(n_expiries=3, n_strikes=40)
+    calibrator.update_surface(df_options, now=NOW)
+    first_expiry = min(calibrator.state)
+
+    calibrator.update_surface(df_options, now=first_expiry + pd.Timedelta(hours=1))
+    assert first_expiry not in calibrator.state
+    assert len(calibrator.state) == 2
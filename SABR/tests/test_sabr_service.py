@@ -0,0 +1,134 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from chain_store import StoredResult
+import sabr_service
+from sabr_service import SABRSurfaceService
+from sabr_smile_cache import SmileCache
+from synthetic import TRUE_PARAMS, synthetic_chain
+
+
+class FakeProvider:
+    """obb-shaped provider serving synthetic chains; symbols in fail raise instead."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.calls = []
+        self.derivatives = SimpleNamespace(options=SimpleNamespace(chains=self._chains))
+
+    def _chains(self, symbol, provider):
+        self.calls.append((symbol, provider))
+        if symbol in self.fail:
+            raise ConnectionError(f"no chain for {symbol}")
+        df_options, _ = synthetic_chain(n_expiries=3, n_strikes=40, now=pd.Timestamp.now())
+        return StoredResult(df_options)
+
+
+def _run(provider, symbols, **kwargs):
+    """One run_once of a service fitting on threads; returns (service, updates)."""
+    async def run():
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            async with SABRSurfaceService(provider, symbols, beta=TRUE_PARAMS["beta"], executor=executor,
+                                          **kwargs) as service:
+                return service, await service.run_once()
+
+    return asyncio.run(run())
+
+
+def test_run_once_publishes_a_surface_per_symbol():
+    provider = FakeProvider()
+    service, updates = _run(provider, ["SPY", "QQQ"])
+
+    assert sorted(update.symbol for update in updates) == ["QQQ", "SPY"]
+    assert sorted(symbol for symbol, _ in provider.calls) == ["QQQ", "SPY"]
+    for update in updates:
+        assert update.error is None
+        assert len(update.surface) == 3
+        assert np.allclose(update.surface["rho"], TRUE_PARAMS["rho"], atol=1e-3)
+        assert {"fetch", "prepare", "calibrate", "total"} <= set(update.timings)
+    assert set(service.latest) == {"SPY", "QQQ"}
+    assert service.updates.qsize() == 2
+
+
+def test_failed_fetch_is_reported_without_stopping_other_symbols():
+    service, updates = _run(FakeProvider(fail={"BAD"}), ["SPY", "BAD"])
+    updates = {update.symbol: update for update in updates}
+
+    assert isinstance(updates["BAD"].error, ConnectionError)
+    assert updates["BAD"].surface is None
+    assert updates["SPY"].error is None
+    assert set(service.latest) == {"SPY"}
+
+
+def test_callback_errors_are_isolated():
+    seen = []
+
+    def on_update(update):
+        seen.append(update.symbol)
+        if update.symbol == "SPY":
+            raise RuntimeError("callback bug")
+
+    service, updates = _run(FakeProvider(), ["SPY", "QQQ", "IWM"], on_update=on_update)
+
+    assert len(updates) == 3
+    assert sorted(seen) == ["IWM", "QQQ", "SPY"]
+    assert service.callback_errors == 1
+    assert set(service.latest) == {"SPY", "QQQ", "IWM"}
+
+
+def test_update_queue_is_bounded():
+    service, updates = _run(FakeProvider(), ["SPY", "QQQ", "IWM"], queue_size=2)
+
+    assert service.updates.qsize() == 2
+    assert service.dropped_updates == 1
+    assert service.updates.get_nowait() is updates[1]
+
+    unqueued, updates = _run(FakeProvider(), ["SPY"], queue_size=0)
+    assert len(updates) == 1
+    assert unqueued.updates is None
+
+
+def test_failed_slice_fit_keeps_the_other_expiries(monkeypatch):
+    fit_slice = sabr_service.fit_slice
+    failed = []
+
+    def fit(expiry, *args):
+        if not failed:
+            failed.append(expiry)
+            raise ValueError("degenerate slice")
+        return fit_slice(expiry, *args)
+
+    monkeypatch.setattr(sabr_service, "fit_slice", fit)
+    service, [update] = _run(FakeProvider(), ["SPY"])
+
+    assert update.error is None
+    assert len(update.surface) == 2
+    assert failed[0] not in set(update.surface["expiry"])
+    assert service.fit_errors == 1
+    assert {"fetch_wait", "fetch"} <= set(update.timings)
+
+
+class ThreadRecordingCache(SmileCache):
+    """SmileCache that records the thread each grid is built on."""
+
+    def __init__(self):
+        super().__init__()
+        self.threads = []
+
+    def update(self, key, surface, beta, version=None):
+        self.threads.append(threading.get_ident())
+        return super().update(key, surface, beta, version)
+
+
+def test_smile_grids_are_built_off_the_event_loop():
+    cache = ThreadRecordingCache()
+    service, updates = _run(FakeProvider(), ["SPY", "QQQ"], smile_cache=cache)
+
+    assert set(cache.grids) == {"SPY", "QQQ"}
+    assert threading.get_ident() not in cache.threads
+    assert all("smile_grid" in update.timings for update in updates)
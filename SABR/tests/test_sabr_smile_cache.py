@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+import sabr_vol
+from implied_vol import black_price
+from sabr_smile_cache import SmileGrid
+from synthetic import TRUE_PARAMS as P
+
+TENORS = np.array([1, 7, 30, 365]) / 365
+
+
+def _grid():
+    surface = pd.DataFrame({"t": TENORS, "f": 500.0, "alpha": P["alpha"], "rho": P["rho"], "volvol": P["volvol"]})
+    return SmileGrid(surface, P["beta"])
+
+
+def _exact(k, t, cp):
+    vols = sabr_vol.lognormal_vol(k, 500.0, t, P["alpha"], P["beta"], P["rho"], P["volvol"])
+    return black_price(k, 500.0, t, vols, cp)
+
+
+def test_prices_match_hagan_on_short_and_long_expiries():
+    grid = _grid()
+    k = np.linspace(400, 600, 401)
+    cp = np.where(k < 500, "put", "call")
+    for t in TENORS:
+        prices, exact = grid.price(k, t, cp), _exact(k, t, cp)
+        assert np.all(prices >= 0)
+        assert np.max(np.abs(prices - exact) / np.maximum(exact, 1e-2)) < 1e-6
+
+
+def test_prices_are_floored_at_intrinsic():
+    grid = _grid()
+    k = np.linspace(400, 600, 401)
+    assert np.all(grid.price(k, 1 / 365, "call") >= np.maximum(500.0 - k, 0.0))
+    assert np.all(grid.price(k, 1 / 365, "put") >= np.maximum(k - 500.0, 0.0))
+
+
+def test_option_type_is_case_insensitive():
+    grid = _grid()
+    k, t = np.array([480.0, 520.0]), 7 / 365
+    assert np.allclose(grid.price(k, t, ["CALL", "Put"]), [grid.price(480.0, t, "call"), grid.price(520.0, t, "put")])
+
+
+def test_expired_options_price_at_discounted_intrinsic():
+    grid = _grid()
+    k = np.array([490.0, 500.0, 510.0])
+    assert np.allclose(grid.price(k, 0.0, "call", 0.99), [9.9, 0.0, 0.0])
+    assert np.allclose(grid.price(k, -1 / 365, "PUT"), [0.0, 0.0, 10.0])
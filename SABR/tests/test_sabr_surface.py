@@ -0,0 +1,24 @@
+import numpy as np
+
+import sabr_surface
+from sabr_surface import calibrate_surface
+from synthetic import NOW, TRUE_PARAMS, synthetic_chain
+
+
+def test_failed_slice_is_dropped_from_the_surface(monkeypatch, caplog):
+    df_options, _ = synthetic_chain(n_expiries=3, n_strikes=40)
+    bad_expiry = df_options["expiration"].min()
+    fit_slice = sabr_surface.fit_slice
+
+    def fit(expiry, *args, **kwargs):
+        if expiry == bad_expiry:
+            raise np.linalg.LinAlgError("singular")
+        return fit_slice(expiry, *args, **kwargs)
+
+    monkeypatch.setattr(sabr_surface, "fit_slice", fit)
+    surface = calibrate_surface(df_options, beta=TRUE_PARAMS["beta"], max_workers=1, now=NOW,
+                                method="least_squares")
+
+    assert len(surface) == 2
+    assert bad_expiry not in set(surface["expiry"])
+    assert "singular" in caplog.text